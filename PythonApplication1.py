@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 import sys
+import logging
+import os
+import threading
+import time
 from PyQt6.QtWidgets import (
     QApplication,
-    QListWidget,
+    QListView,
     QSpinBox,
     QWidget,
     QPushButton,
@@ -11,12 +15,41 @@ from PyQt6.QtWidgets import (
     QFileDialog,
     QLabel,
     QScrollArea,
-    QHBoxLayout
+    QHBoxLayout,
+    QProgressBar
 )
-import csv
-import socket
+from PyQt6.QtCore import Qt, QThread, QThreadPool, QTimer, pyqtSignal
+import metricas
+from catalogo import Catalogo
+from busqueda import BuscadorIncremental
+from modelo_resultados import ROL_FILA, ModeloResultados
+from cache_catalogo import CacheCatalogo, recordar_ultimo, ultimo_catalogo
+from carga_catalogo import CargadorCatalogo
+from cola_impresion import COMPLETADO, ERROR, REINTENTANDO, ColaImpresion
+from diario_impresion import DiarioImpresion, leer_rangos, reanudar, texto_rangos
+from impresoras import PlanificadorImpresion, RegistroImpresoras
+
+SEARCH_DELAY_MS = 150  # Pausa entre teclas antes de buscar
+RESULTADOS_POR_PAGINA = 200  # Resultados por búsqueda; al llegar al final de la lista se piden más
+STATS_INTERVAL_MS = 1000  # Cada cuánto se actualiza el panel de estadísticas
+
+# Tiempos que muestra el panel de estadísticas (ver metricas.py)
+STATS_TIMINGS = [
+    ('busqueda.interfaz', 'Búsqueda (hasta mostrar)'),
+    ('busqueda', 'Búsqueda (índice)'),
+    ('catalogo.carga', 'Carga de catálogo'),
+    ('zpl.generar', 'Generación ZPL'),
+    ('impresora.conexion', 'Conexión a impresora'),
+    ('impresora.envio', 'Envío a impresora'),
+    ('impresora.trabajo', 'Trabajo de impresión'),
+]
+
 
 class MainWindow(QWidget):
+    print_job_changed = pyqtSignal(object)
+    search_finished = pyqtSignal(int, str, object, int)
+    batch_finished = pyqtSignal(object, object, str)
+
     def __init__(self):
         # Constructor de la ventana principal
         super().__init__()
@@ -26,22 +59,58 @@ class MainWindow(QWidget):
 
         # Botones y campos de entrada
         self.import_button = QPushButton('Examinar...')
+        self.transformer_button = QPushButton('Transformar Excel a CSV...')
+        self.cancel_load_button = QPushButton('Cancelar carga')
+        self.cancel_load_button.hide()
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText('Buscar ID de Producto')
         self.search_button = QPushButton('Buscar')
         self.clear_button = QPushButton('Limpiar')
 
+        # Búsqueda mientras se escribe: espera una pausa breve entre teclas
+        # y corre en un único hilo aparte para no bloquear la ventana
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(1)
+        self.search_generation = 0
+        self.shown_generation = 0
+        self.search_cancel = threading.Event()
+        self.search_started = 0.0
+        self.search_text = ''
+        self.search_limit = RESULTADOS_POR_PAGINA
+
+        # Las órdenes de un archivo se leen y se encolan en otro hilo: con
+        # muchas órdenes, leerlas y anotarlas en el diario bloquearía la ventana
+        self.batch_pool = QThreadPool(self)
+        self.batch_pool.setMaxThreadCount(1)
+
         # Layout de búsqueda horizontal
         search_layout = QHBoxLayout()
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(self.search_button)
         search_layout.addWidget(self.clear_button)
 
+        # Progreso de la carga del catálogo
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximum(100)
+        self.load_progress.hide()
+        self.load_status_label = QLabel('')
+
+        load_layout = QHBoxLayout()
+        load_layout.addWidget(self.load_progress)
+        load_layout.addWidget(self.cancel_load_button)
+
         # Área de resultados
         self.result_label = QLabel('Resultados de la búsqueda:')
-        self.results_area = QListWidget()
-        self.results_area.itemClicked.connect(self.item_selected)
-        self.results_area.setWordWrap(True)
+        # La vista sólo pide al modelo las filas visibles; con tamaños
+        # uniformes no necesita medir todos los resultados
+        self.results_model = ModeloResultados(self, pedir_mas=self.load_more_results)
+        self.results_area = QListView()
+        self.results_area.setModel(self.results_model)
+        self.results_area.setUniformItemSizes(True)
+        self.results_area.clicked.connect(self.item_selected)
 
         # Configuración del área de desplazamiento
         self.scroll_inner = QWidget()
@@ -80,12 +149,43 @@ class MainWindow(QWidget):
         quantity_layout.addWidget(self.quantity_label)
         quantity_layout.addWidget(self.quantity_spinbox)
 
-        # Botón de impresión
+        # Botón de impresión y estado de los trabajos enviados
         self.print_button = QPushButton('Imprimir')
+        self.batch_print_button = QPushButton('Imprimir órdenes...')
+        self.print_status_label = QLabel('')
+        self.print_status_label.setWordWrap(True)
+
+        # Reimpresión de algunas etiquetas de la cantidad y reanudación de
+        # los pedidos que quedaron sin terminar al cerrarse la aplicación
+        self.reprint_input = QLineEdit()
+        self.reprint_input.setPlaceholderText('Etiquetas a reimprimir, ej: 3-5, 9')
+        self.reprint_button = QPushButton('Reimprimir')
+        self.resume_button = QPushButton('Reanudar impresiones interrumpidas')
+        self.resume_button.hide()
+
+        reprint_layout = QHBoxLayout()
+        reprint_layout.addWidget(self.reprint_input)
+        reprint_layout.addWidget(self.reprint_button)
+
+        # Panel de estadísticas: tiempos recientes y contadores de metricas.py
+        self.stats_button = QPushButton('Estadísticas')
+        self.stats_button.setCheckable(True)
+        self.export_metrics_button = QPushButton('Exportar métricas...')
+        self.stats_label = QLabel('')
+        self.stats_label.hide()
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setInterval(STATS_INTERVAL_MS)
+
+        stats_layout = QHBoxLayout()
+        stats_layout.addWidget(self.stats_button)
+        stats_layout.addWidget(self.export_metrics_button)
 
         # Layout principal
         main_layout = QVBoxLayout(self)
         main_layout.addWidget(self.import_button)
+        main_layout.addWidget(self.transformer_button)
+        main_layout.addLayout(load_layout)
+        main_layout.addWidget(self.load_status_label)
         main_layout.addLayout(search_layout)
         main_layout.addWidget(self.result_label)
         main_layout.addWidget(self.scroll_area)
@@ -95,82 +195,267 @@ class MainWindow(QWidget):
         main_layout.addWidget(self.quantity_label)
         main_layout.addWidget(self.quantity_spinbox)
         main_layout.addWidget(self.print_button)
+        main_layout.addWidget(self.batch_print_button)
+        main_layout.addLayout(reprint_layout)
+        main_layout.addWidget(self.resume_button)
+        main_layout.addWidget(self.print_status_label)
+        main_layout.addLayout(stats_layout)
+        main_layout.addWidget(self.stats_label)
 
         # Conexiones de señales
         self.import_button.clicked.connect(self.open_file_dialog)
+        self.transformer_button.clicked.connect(self.open_transformer)
+        self.cancel_load_button.clicked.connect(self.cancel_load)
         self.search_button.clicked.connect(self.perform_search)
         self.clear_button.clicked.connect(self.clear_search_and_results)
         self.search_input.returnPressed.connect(self.perform_search)
+        self.search_input.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_timer.timeout.connect(self.live_search)
+        self.search_finished.connect(self.on_search_finished)
         self.print_button.clicked.connect(self.handle_print)
+        self.batch_print_button.clicked.connect(self.handle_batch_print)
+        self.batch_finished.connect(self.on_batch_finished)
+        self.reprint_button.clicked.connect(self.handle_reprint)
+        self.resume_button.clicked.connect(self.resume_interrupted)
+        self.print_job_changed.connect(self.on_print_job_changed)
+        self.stats_button.toggled.connect(self.toggle_stats)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.export_metrics_button.clicked.connect(self.export_metrics)
 
         # Variables de datos
-        self.csv_data = []
+        self.catalogo = Catalogo()
+        self.searcher = BuscadorIncremental(self.catalogo)
+        self.catalog_cache = CacheCatalogo()
         self.selected_product = None
+        self.load_thread = None
+        self.loader = None
+        # Cargas reemplazadas por otra que pueden seguir corriendo: (hilo, cargador)
+        self.discarded_loads = []
+        self.transformer_window = None
+        # Los hilos de impresión avisan cambios de estado mediante una señal,
+        # con una copia del estado: el trabajo sigue cambiando en su hilo
+        self.print_queue = ColaImpresion(
+            al_cambiar_estado=lambda trabajo: self.print_job_changed.emit(trabajo.instantanea())
+        )
+        # Sin diario se imprime igual, pero sin poder reanudar
+        try:
+            self.print_journal = DiarioImpresion()
+        except OSError as e:
+            print(f"No se pudo abrir el diario de impresión: {str(e)}")
+            self.print_journal = None
+        self.print_scheduler = PlanificadorImpresion(
+            self.print_queue, RegistroImpresoras.desde_config(), diario=self.print_journal
+        )
+        if self.print_journal is not None and self.print_journal.interrumpidos():
+            self.resume_button.show()
+
+        # El último catálogo usado se vuelve a abrir en segundo plano, con la
+        # ventana ya en pantalla
+        QTimer.singleShot(0, self.restore_last_catalog)
+
+    def restore_last_catalog(self):
+        # Salvo que ya se haya empezado a abrir otro catálogo
+        if self.loader is not None or self.catalogo:
+            return
+        file_path = ultimo_catalogo()
+        if file_path:
+            self.load_catalog(file_path)
+            self.load_status_label.setText('Abriendo el último catálogo usado...')
 
     def open_file_dialog(self):
-        # Abre diálogo para seleccionar archivo CSV
+        # Abre diálogo para seleccionar el catálogo: CSV o el Excel exportado de Odoo
         file_path, _ = QFileDialog.getOpenFileName(
             self,
-            "Seleccionar archivo CSV",
+            "Seleccionar catálogo",
             "",
-            "Archivos CSV (*.csv);;Todos los archivos (*)"
+            "Catálogos (*.csv *.xlsx *.xlsm *.cat);;Archivos CSV (*.csv);;Archivos Excel (*.xlsx *.xlsm);;Todos los archivos (*)"
         )
 
         if file_path:
+            self.load_catalog(file_path)
+
+    def load_catalog(self, file_path):
+        # Carga el archivo en un hilo aparte; las búsquedas usan las filas ya leídas
+        self.discard_load()
+        self.cancel_search()
+        self.catalogo = Catalogo()
+        self.searcher = BuscadorIncremental(self.catalogo)
+        self.selected_product = None
+        self.results_model.limpiar()
+
+        self.load_thread = QThread(self)
+        self.loader = CargadorCatalogo(file_path, self.catalogo, self.catalog_cache)
+        self.loader.moveToThread(self.load_thread)
+        self.load_thread.started.connect(self.loader.ejecutar)
+        self.loader.progreso.connect(self.on_load_progress)
+        self.loader.terminado.connect(self.on_load_finished)
+        self.loader.error.connect(self.on_load_error)
+        # quit() directo desde el hilo de carga: closeEvent espera el hilo
+        # sin atender eventos, así que un quit encolado no llegaría nunca
+        self.loader.terminado.connect(self.load_thread.quit, Qt.ConnectionType.DirectConnection)
+        self.loader.error.connect(self.load_thread.quit, Qt.ConnectionType.DirectConnection)
+        self.load_thread.finished.connect(self.loader.deleteLater)
+        self.load_thread.finished.connect(self.load_thread.deleteLater)
+
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setValue(0)
+        self.load_progress.show()
+        self.cancel_load_button.show()
+        self.load_status_label.setText('Cargando catálogo...')
+        self.load_thread.start()
+
+    def cancel_load(self):
+        # Pide detener la carga en curso; las filas ya leídas se conservan
+        if self.loader is not None:
+            self.loader.cancelar()
+
+    def discard_load(self):
+        # Detiene la carga en curso sin esperar sus avisos (se va a reemplazar)
+        if self.loader is not None:
+            self.loader.progreso.disconnect(self.on_load_progress)
+            self.loader.terminado.disconnect(self.on_load_finished)
+            self.loader.error.disconnect(self.on_load_error)
+            self.loader.cancelar()
+            # Se conservan hasta que el hilo termine, para esperarlo al cerrar
+            self.discarded_loads.append((self.load_thread, self.loader))
+            self.load_thread.finished.connect(self.on_discarded_load_finished)
+            self.load_thread = None
+            self.loader = None
+
+    def on_discarded_load_finished(self):
+        # El hilo de una carga descartada terminó; deleteLater lo libera
+        hilo = self.sender()
+        self.discarded_loads = [(h, cargador) for h, cargador in self.discarded_loads if h is not hilo]
+
+    def on_load_progress(self, filas, porcentaje):
+        # Sin porcentaje conocido (Excel sin dimensiones) la barra sólo indica actividad
+        if porcentaje < 0:
+            self.load_progress.setRange(0, 0)
+        else:
+            self.load_progress.setRange(0, 100)
+            self.load_progress.setValue(porcentaje)
+        self.load_status_label.setText(f'Cargando catálogo... {filas} registros')
+
+    def closeEvent(self, event):
+        # Espera a que los hilos de carga terminen antes de cerrar, también
+        # los de cargas descartadas que todavía no vieron la cancelación
+        if self.load_thread is not None:
+            self.loader.cancelar()
+            self.load_thread.wait()
+        for hilo, _ in self.discarded_loads:
+            hilo.wait()
+        self.cancel_search()
+        self.search_pool.waitForDone()
+        self.batch_pool.waitForDone()
+        self.print_queue.detener(tiempo=5)
+        if self.print_journal is not None:
+            self.print_journal.cerrar()
+        if self.transformer_window is not None:
+            self.transformer_window.close()
+        super().closeEvent(event)
+
+    def on_load_finished(self, filas, cancelado):
+        file_path = self.loader.ruta
+        self.load_thread = None
+        self.loader = None
+        self.load_progress.hide()
+        self.cancel_load_button.hide()
+        if cancelado:
+            mensaje = f"Carga cancelada: {filas} registros disponibles."
+        else:
+            mensaje = f"Catálogo leído con {filas} registros."
+            # Se vuelve a abrir al iniciar la aplicación
             try:
-                with open(file_path, 'r', encoding='utf-8') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    self.csv_data = list(reader)
-                print(f"Archivo CSV leído con {len(self.csv_data)} registros.")
-            except FileNotFoundError:
-                print(f"Error: No se pudo encontrar el archivo en la ruta: {file_path}")
-            except UnicodeDecodeError:
-                print(f"Error: El archivo no está en la codificación UTF-8 esperada")
-            except Exception as e:
-                print(f"Error al leer el archivo CSV: {str(e)}")
+                recordar_ultimo(file_path)
+            except OSError as e:
+                print(f"No se pudo recordar el último catálogo: {str(e)}")
+        self.load_status_label.setText(mensaje)
+        print(mensaje)
+
+    def on_load_error(self, mensaje):
+        self.load_thread = None
+        self.loader = None
+        self.load_progress.hide()
+        self.cancel_load_button.hide()
+        self.load_status_label.setText(mensaje)
+        print(mensaje)
+
+    def live_search(self):
+        # Búsqueda mientras se escribe (tras la pausa de search_timer)
+        if self.search_input.text():
+            self.perform_search()
+        else:
+            self.cancel_search()
+            self.results_model.limpiar()
+
+    def cancel_search(self):
+        # Descarta la búsqueda en curso: su resultado ya no se mostrará
+        self.search_cancel.set()
+        self.search_generation += 1
 
     def perform_search(self):
-        # Realiza búsqueda en los datos del CSV
+        # Realiza búsqueda en los datos del CSV en segundo plano
+        self.search_timer.stop()
         text = self.search_input.text()
-        if not self.csv_data:
-            self.results_area.addItem('Por favor, importa un archivo CSV primero.')
+        if not self.catalogo:
+            self.results_model.mostrar_mensaje('Por favor, importa un archivo CSV primero.')
             return
 
-        results = []
-        for row in self.csv_data:
-            if text.lower() in row.get('id_producto', '').lower():
-                results.append(f"ID: {row.get('id_producto', 'N/A')}, Code: {row.get('code_128', 'N/A')}, Nombre: {row.get('nombre', 'N/A')}")
+        self.start_search(text, RESULTADOS_POR_PAGINA)
+
+    def load_more_results(self):
+        # La lista llegó al final: se repite la búsqueda mostrada con una página más.
+        # Si ya hay otra búsqueda esperando la pausa o en curso, no se pide la
+        # página: start_search la cancelaría y esa búsqueda reemplazará la lista
+        if (self.search_timer.isActive() or self.search_input.text() != self.search_text
+                or self.search_generation != self.shown_generation):
+            return
+        self.start_search(self.search_text, self.search_limit + RESULTADOS_POR_PAGINA)
+
+    def start_search(self, text, limite):
+        self.cancel_search()
+        cancelado = threading.Event()
+        self.search_cancel = cancelado
+        generation = self.search_generation
+        searcher = self.searcher
+        self.search_started = time.perf_counter()
+
+        def buscar():
+            results = searcher.buscar(text, limite, cancelado=cancelado.is_set)
+            if results is not None:
+                self.search_finished.emit(generation, text, results, limite)
 
-        self.results_area.clear()
-        if results:
-            for result in results:
-                self.results_area.addItem(result)
+        self.search_pool.start(buscar)
+
+    def on_search_finished(self, generation, text, results, limite):
+        # Sólo se muestra el resultado de la última búsqueda lanzada
+        if generation != self.search_generation:
+            return
+        metricas.registrar('busqueda.interfaz', time.perf_counter() - self.search_started)
+        self.shown_generation = generation
+        hay_mas = len(results) >= limite
+        ampliar = limite > RESULTADOS_POR_PAGINA and text == self.search_text
+        self.search_text, self.search_limit = text, limite
+        if ampliar:
+            self.results_model.ampliar(results, hay_mas)
+        elif results:
+            self.results_model.mostrar(self.catalogo, results, hay_mas)
         else:
-            self.results_area.addItem(f'No se encontraron coincidencias para: "{text}"')
+            self.results_model.mostrar_mensaje(f'No se encontraron coincidencias para: "{text}"')
 
     def clear_search_and_results(self):
         # Limpia el campo de búsqueda y resultados
         self.search_input.clear()
-        self.results_area.clear()
+        self.cancel_search()
+        self.results_model.limpiar()
         self.selected_product = None
 
-    def item_selected(self, item):
-        # Procesa el elemento seleccionado de la lista
-        texto_item = item.text()
-        partes = texto_item.split(', ')
-        seleccion = {}
-        
-        for parte in partes:
-            clave_valor = parte.split(': ')
-            if len(clave_valor) == 2:
-                seleccion[clave_valor[0].strip()] = clave_valor[1].strip()
-
-        if 'ID' in seleccion:
-            self.selected_product = {
-                'id_producto': seleccion['ID'],
-                'code_128': seleccion['Code'],
-                'nombre': seleccion['Nombre']
-            }
+    def item_selected(self, index):
+        # Procesa el elemento seleccionado de la lista: el modelo guarda la fila del catálogo
+        indice = index.data(ROL_FILA)
+
+        if indice is not None:
+            self.selected_product = self.catalogo.fila(indice)
             print(f"Producto seleccionado: {self.selected_product}")
         else:
             self.selected_product = None
@@ -187,44 +472,178 @@ class MainWindow(QWidget):
 
             print("--- Generando etiquetas ZPL ---")
             try:
-                printer_ip = "10.10.2.34"
-                printer_port = 9100
-
-                # Convertir caracteres especiales a Latin-1 para la impresora
-                nombre_producto_print = nombre_producto.encode('latin1', errors='replace').decode('latin1')
-                op_description_print = op_description.encode('latin1', errors='replace').decode('latin1')
-                sgc_version_print = sgc_version.encode('latin1', errors='replace').decode('latin1')
-
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                    sock.connect((printer_ip, printer_port))
-                    for i in range(1, quantity + 1):
-                        zpl_label = f"""^XA
-                        ^FO115,35^A0N,18,18^FD{nombre_producto_print}^FS
-                        ^FO115,60^BCN,75,Y,N,N^FD{id_producto}^FS
-                        ^FO115,168^A0N,20,20^FD{op_description_print}^FS
-                        ^FO115,188^A0N,18,18^FD{i}/{quantity}^FS
-                        ^FO370,60^A0R,18,18^FD{sgc_version_print}^FS
-                        ^PQ1,1,1,Y^XZ"""
-
-                        print(f"--- Enviando etiqueta {i}/{quantity} ---")
-                        print(zpl_label)
-                        sock.sendall(zpl_label.encode('latin1'))
-                    print(f"Se enviaron {quantity} etiquetas a la impresora!")
-
-            except ConnectionRefusedError:
-                self.results_area.addItem(f"Error: No se pudo conectar a la impresora en {printer_ip}:{printer_port}. Asegúrate de que la impresora está encendida y conectada a la red.")
+                # El planificador reparte las etiquetas entre las impresoras de
+                # impresoras_config.py; el estado llega por print_job_changed
+                self.print_scheduler.imprimir(
+                    nombre_producto, id_producto, op_description, sgc_version, quantity
+                )
+
+            except Exception as e:
+                self.print_status_label.setText(f"Error al generar las etiquetas: {str(e)}")
+        else:
+            self.print_status_label.setText('Por favor, busca y selecciona un producto primero.')
+
+    def handle_reprint(self):
+        # Reimprime algunas etiquetas (numeradas sobre la cantidad) del producto seleccionado
+        if not self.selected_product:
+            self.print_status_label.setText('Por favor, busca y selecciona un producto primero.')
+            return
+        quantity = self.quantity_spinbox.value()
+        try:
+            rangos = leer_rangos(self.reprint_input.text(), quantity)
+            self.print_scheduler.imprimir(
+                self.selected_product.get('nombre', 'N/A'), self.selected_product.get('id_producto', 'N/A'),
+                self.op_description_input.text(), self.sgc_version_input.text(), quantity, rangos=rangos,
+            )
+        except (OSError, ValueError) as e:
+            self.print_status_label.setText(f"Error: {str(e)}")
+            return
+        self.print_status_label.setText(f"Reimprimiendo las etiquetas {texto_rangos(rangos)} de {quantity}.")
+
+    def resume_interrupted(self):
+        # Imprime lo que les faltaba a los pedidos que quedaron sin terminar
+        mensajes = []
+        for numero, datos, faltantes in self.print_journal.interrumpidos():
+            try:
+                reanudar(self.print_journal, self.print_scheduler, numero)
+            except ValueError as e:
+                mensajes.append(f"No se pudo reanudar {datos['id_producto']}: {str(e)}")
+                continue
+            if faltantes:
+                mensajes.append(f"{datos['id_producto']} OP {datos['op']}: etiquetas {texto_rangos(faltantes)} de {datos['cantidad']}")
+        self.resume_button.hide()
+        mensaje = "Reanudando: " + '; '.join(mensajes) if mensajes else "No quedaban etiquetas por imprimir."
+        self.print_status_label.setText(mensaje)
+        print(mensaje)
+
+    def handle_batch_print(self):
+        # Imprime todas las órdenes de un archivo (id_producto, op, sgc, cantidad)
+        if not self.catalogo:
+            self.print_status_label.setText('Por favor, importa un archivo CSV primero.')
+            return
+
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Seleccionar archivo de órdenes",
+            "",
+            "Órdenes (*.csv *.xlsx);;Todos los archivos (*)"
+        )
+        if not file_path:
+            return
+
+        catalogo = self.catalogo
+        scheduler = self.print_scheduler
+
+        def procesar():
+            try:
+                import ordenes_trabajo
+
+                resueltas, errores = ordenes_trabajo.resolver(ordenes_trabajo.leer_ordenes(file_path), catalogo)
+                ordenes_trabajo.imprimir(resueltas, scheduler)
             except Exception as e:
-                self.results_area.addItem(f"Error al enviar a la impresora: {str(e)}")
+                self.batch_finished.emit(None, None, str(e))
+                return
+            self.batch_finished.emit(resueltas, errores, '')
+
+        self.batch_print_button.setEnabled(False)
+        self.print_status_label.setText(f"Procesando las órdenes de {os.path.basename(file_path)}...")
+        self.batch_pool.start(procesar)
+
+    def on_batch_finished(self, resueltas, errores, error):
+        self.batch_print_button.setEnabled(True)
+        if error:
+            self.print_status_label.setText(f"Error al procesar las órdenes: {error}")
+            return
+
+        for linea in errores:
+            print(linea)
+        etiquetas = sum(cantidad for _, _, cantidad in resueltas)
+        mensaje = f"Se enviaron {len(resueltas)} órdenes ({etiquetas} etiquetas) a impresión."
+        if errores:
+            mensaje += f" {len(errores)} líneas con errores: " + '; '.join(errores[:3])
+        self.print_status_label.setText(mensaje)
+
+    def toggle_stats(self, visible):
+        # El panel sólo se actualiza mientras está visible
+        self.stats_label.setVisible(visible)
+        if visible:
+            self.update_stats()
+            self.stats_timer.start()
         else:
-            self.results_area.addItem('Por favor, busca y selecciona un producto primero.')
+            self.stats_timer.stop()
+
+    def update_stats(self):
+        # Muestra los tiempos recientes (últimas mediciones) y los contadores
+        resumen = metricas.METRICAS.resumen()
+        lineas = []
+        for nombre, titulo in STATS_TIMINGS:
+            tiempo = resumen['tiempos'].get(nombre)
+            if tiempo is not None:
+                recientes = tiempo['recientes']
+                lineas.append(
+                    f"{titulo}: p50 {recientes['p50_ms']:.2f} ms, p95 {recientes['p95_ms']:.2f} ms, "
+                    f"último {recientes['ultimo_ms']:.2f} ms ({tiempo['cantidad']})"
+                )
+        contadores = resumen['contadores']
+        lineas.append(
+            f"Etiquetas enviadas: {contadores.get('impresora.etiquetas', 0)}, "
+            f"bytes: {contadores.get('impresora.bytes', 0)}, "
+            f"conexiones: {contadores.get('impresora.conexiones', 0)}, "
+            f"reintentos: {contadores.get('impresora.reintentos', 0)}, "
+            f"fallos: {contadores.get('impresora.fallos', 0)}"
+        )
+        self.stats_label.setText('\n'.join(lineas))
+
+    def export_metrics(self):
+        # Guarda todas las métricas (contadores e histogramas) en un JSON
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Exportar métricas",
+            "metricas.json",
+            "Archivos JSON (*.json);;Todos los archivos (*)"
+        )
+        if not file_path:
+            return
+        try:
+            metricas.METRICAS.exportar(file_path)
+            self.print_status_label.setText(f"Métricas guardadas en {file_path}")
+        except OSError as e:
+            self.print_status_label.setText(f"No se pudieron guardar las métricas: {str(e)}")
+
+    def on_print_job_changed(self, trabajo):
+        # Muestra el estado de un trabajo de impresión (un EstadoTrabajo; se ejecuta
+        # en el hilo de la interfaz)
+        host, puerto = trabajo.impresora
+        if trabajo.estado == COMPLETADO:
+            mensaje = f"Se enviaron {trabajo.etiquetas} etiquetas a la impresora! ({trabajo.descripcion})"
+        elif trabajo.estado == ERROR:
+            if isinstance(trabajo.error, ConnectionRefusedError):
+                mensaje = f"Error: No se pudo conectar a la impresora en {host}:{puerto}. Asegúrate de que la impresora está encendida y conectada a la red."
+            else:
+                mensaje = f"Error al enviar a la impresora: {str(trabajo.error)}"
+            mensaje += f" ({trabajo.etiquetas_enviadas}/{trabajo.etiquetas} etiquetas enviadas, {trabajo.descripcion})"
+        elif trabajo.estado == REINTENTANDO:
+            mensaje = f"Reintentando envío ({trabajo.intentos}) a {host}:{puerto}: {str(trabajo.error)}"
+        else:
+            mensaje = f"Trabajo {trabajo.id} ({trabajo.descripcion}): {trabajo.estado} {trabajo.enviadas}/{trabajo.partes}"
+        self.print_status_label.setText(mensaje)
+        print(mensaje)
 
     def open_transformer(self):
-        # Crear y mostrar la ventana del transformador
+        # Crear y mostrar la ventana del transformador; el CSV que guarda se
+        # carga como catálogo
         if self.transformer_window is None:
+            # Se importa recién al usarla: no demora el arranque
+            from transformador_hojas_bd import TransformadorWindow
+
             self.transformer_window = TransformadorWindow()
+            self.transformer_window.csv_saved.connect(self.load_catalog)
         self.transformer_window.show()
+        self.transformer_window.raise_()
 
 if __name__ == '__main__':
+    # ETIQUETAS_LOG=DEBUG muestra el ZPL generado en la consola
+    logging.basicConfig(level=os.environ.get('ETIQUETAS_LOG', 'INFO'))
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
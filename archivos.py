@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Escritura de archivos sin que quede visible una versión a medio escribir."""
+import os
+import tempfile
+
+
+def escribir_atomico(ruta, escribir, modo='wb', **opciones):
+    """Reemplaza ruta de una vez con lo que escribe escribir(archivo).
+
+    escribir recibe un temporal del mismo directorio abierto con ``modo``
+    y ``opciones`` (encoding, newline...). El temporal se sincroniza con el
+    disco y reemplaza a ruta; si escribir lanza una excepción se borra y
+    ruta no cambia. Devuelve lo que devolvió escribir.
+    """
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, modo, **opciones) as archivo:
+            resultado = escribir(archivo)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    return resultado
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks del sistema de etiquetas.
+
+Se ejecutan desde la raíz del repositorio, por ejemplo:
+    python -m benchmarks.bench_catalogo
+"""
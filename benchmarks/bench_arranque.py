@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Tiempo de arranque de la aplicación, en procesos nuevos.
+
+Cada medición lanza un intérprete nuevo que importa PythonApplication1,
+abre la ventana (con QT_QPA_PLATFORM=offscreen si no se indica otra
+plataforma) y anota, desde el lanzamiento del proceso:
+
+    importación   fin de la importación de PythonApplication1
+    pintado       primer evento de pintado de la ventana
+    buscable      catálogo completo disponible para buscar
+
+"sin catálogo" arranca sin un catálogo anterior; "restaurado" vuelve a
+abrir el último catálogo usado, un CSV de ``filas`` productos que ya está
+en la caché. Se usa un HOME temporal para no tocar la caché del usuario.
+
+Uso: python -m benchmarks.bench_arranque [filas]
+"""
+import csv
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from catalogo import COLUMNAS
+from benchmarks.sinteticos import generar_filas
+
+FILAS = 100_000
+REPETICIONES = 5
+TIEMPO_MAXIMO = 30  # Segundos máximos de cada arranque
+MARCAS = ('importacion', 'pintado', 'buscable')
+
+
+def hijo(modo, ruta):
+    # Corre en el proceso medido; ARRANQUE_INICIO es la hora del lanzamiento
+    inicio = float(os.environ['ARRANQUE_INICIO'])
+    marcas = {}
+    from PyQt6.QtCore import QEvent, QObject, QTimer
+    from PyQt6.QtWidgets import QApplication
+    import PythonApplication1
+
+    marcas['importacion'] = time.time() - inicio
+    app = QApplication([])
+    ventana = PythonApplication1.MainWindow()
+
+    class Pintado(QObject):
+        def eventFilter(self, objeto, evento):
+            if evento.type() == QEvent.Type.Paint and 'pintado' not in marcas:
+                marcas['pintado'] = time.time() - inicio
+                if modo == 'vacio':
+                    QTimer.singleShot(0, app.quit)
+            return False
+
+    filtro = Pintado()
+    ventana.installEventFilter(filtro)
+    terminado = ventana.on_load_finished
+    hilos = []
+
+    def al_terminar(filas, cancelado):
+        hilos.append(ventana.load_thread)
+        terminado(filas, cancelado)
+        marcas['buscable'] = time.time() - inicio
+        app.quit()
+
+    # Se reemplaza antes de que la ventana conecte la señal de su cargador
+    ventana.on_load_finished = al_terminar
+    if modo == 'abrir':
+        ventana.load_catalog(ruta)
+    ventana.show()
+    QTimer.singleShot(TIEMPO_MAXIMO * 1000, app.quit)
+    app.exec()
+    # El aviso para terminar el hilo de carga quedó en la cola de eventos
+    for hilo in hilos:
+        try:
+            hilo.quit()
+            hilo.wait()
+        except RuntimeError:
+            pass  # Ya se destruyó
+    ventana.close()
+    print(json.dumps(marcas))
+
+
+def arrancar(modo, home, ruta=''):
+    entorno = dict(os.environ, HOME=home, USERPROFILE=home)
+    entorno.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    entorno['ARRANQUE_INICIO'] = repr(time.time())
+    salida = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_arranque', '--hijo', modo, ruta],
+        env=entorno, capture_output=True, text=True, timeout=TIEMPO_MAXIMO + 10, check=True,
+    ).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def mostrar(escenario, mediciones):
+    columnas = []
+    for marca in MARCAS:
+        valores = [medicion[marca] for medicion in mediciones if marca in medicion]
+        columnas.append(f"{statistics.median(valores) * 1000:>12.0f}" if valores else f"{'-':>12}")
+    print(f"{escenario:>13} {' '.join(columnas)}")
+
+
+def main(filas):
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'productos.csv')
+        with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+            escritor = csv.DictWriter(archivo, COLUMNAS)
+            escritor.writeheader()
+            escritor.writerows(generar_filas(filas))
+
+        vacio = os.path.join(directorio, 'vacio')
+        usado = os.path.join(directorio, 'usado')
+        os.makedirs(vacio)
+        os.makedirs(usado)
+        # Primera apertura: guarda el catálogo en la caché y lo recuerda como último
+        arrancar('abrir', usado, ruta)
+
+        print(f"{filas} productos, mediana de {REPETICIONES} arranques (ms desde el lanzamiento)")
+        print(f"{'escenario':>13} {'importación':>12} {'pintado':>12} {'buscable':>12}")
+        mostrar('sin catálogo', [arrancar('vacio', vacio) for _ in range(REPETICIONES)])
+        mostrar('restaurado', [arrancar('restaurar', usado) for _ in range(REPETICIONES)])
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--hijo']:
+        hijo(sys.argv[2], sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else FILAS)
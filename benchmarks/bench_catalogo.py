@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Compara la búsqueda indexada de Catalogo con el recorrido lineal original.
+
+La última columna mide consultas con un error de tipeo (búsqueda aproximada).
+
+Uso: python -m benchmarks.bench_catalogo [filas ...]
+"""
+import sys
+import time
+
+from catalogo import Catalogo
+from benchmarks.sinteticos import con_errores, consultas, generar_filas
+
+TAMANOS = (10_000, 100_000, 1_000_000)
+CONSULTAS = 200
+
+
+def busqueda_lineal(filas, text):
+    # Copia del recorrido que hacía MainWindow.perform_search
+    results = []
+    for row in filas:
+        if text.lower() in row.get('id_producto', '').lower():
+            results.append(row)
+    return results
+
+
+def medir(funcion, textos):
+    inicio = time.perf_counter()
+    for texto in textos:
+        funcion(texto)
+    return (time.perf_counter() - inicio) / len(textos) * 1000
+
+
+def main(tamanos):
+    print(f"{'filas':>10} {'índice (s)':>11} {'lineal (ms)':>12} {'índice (ms)':>12} {'top-50 (ms)':>12} {'aprox. (ms)':>12}")
+    for tamano in tamanos:
+        filas = list(generar_filas(tamano))
+        textos = consultas(CONSULTAS, filas)
+
+        inicio = time.perf_counter()
+        catalogo = Catalogo(filas)  # Incluye ordenar(), que arma el arreglo por prefijo de ID
+        construccion = time.perf_counter() - inicio
+
+        lineal = medir(lambda t: busqueda_lineal(filas, t), textos[:20])
+        indexada = medir(catalogo.buscar, textos)
+        top = medir(lambda t: catalogo.buscar(t, limite=50), textos)
+        aproximada = medir(lambda t: catalogo.buscar(t, limite=50), con_errores(textos))
+        print(f"{tamano:>10} {construccion:>11.2f} {lineal:>12.3f} {indexada:>12.3f} {top:>12.3f} {aproximada:>12.3f}")
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or TAMANOS)
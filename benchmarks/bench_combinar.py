@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Mide combinar_catalogos sobre CSV sintéticos, en un proceso y en paralelo.
+
+Los productos se reparten en ARCHIVOS archivos que se solapan en un 20%
+(productos repetidos en dos depósitos), así que la salida tiene menos
+productos que filas leídas.
+
+Uso: python -m benchmarks.bench_combinar [filas ...]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+from catalogo import COLUMNAS
+from combinar_catalogos import combinar, escribir
+from benchmarks.sinteticos import generar_filas
+
+TAMANOS = (1_000_000,)
+ARCHIVOS = 4
+SOLAPAMIENTO = 0.2
+
+
+def escribir_archivos(directorio, cantidad):
+    # Cada archivo toma un tramo de productos que comparte un 20% con el siguiente
+    filas = list(generar_filas(int(cantidad / (1 + SOLAPAMIENTO))))
+    paso = len(filas) // ARCHIVOS
+    por_archivo = cantidad // ARCHIVOS
+    rutas = []
+    for n in range(ARCHIVOS):
+        ruta = os.path.join(directorio, f'deposito{n + 1}.csv')
+        tramo = [filas[i % len(filas)] for i in range(n * paso, n * paso + por_archivo)]
+        with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+            escritor = csv.DictWriter(archivo, COLUMNAS)
+            escritor.writeheader()
+            escritor.writerows(tramo)
+        rutas.append(ruta)
+    return rutas
+
+
+def main(tamanos):
+    print(f"{'filas':>10} {'procesos':>9} {'productos':>10} {'lectura (s)':>12} {'filas/s':>10} {'CSV (s)':>8} {'.cat (s)':>9}")
+    for tamano in tamanos:
+        with tempfile.TemporaryDirectory() as directorio:
+            rutas = escribir_archivos(directorio, tamano)
+            for procesos in (1, None):
+                inicio = time.perf_counter()
+                productos, leidas, _ = combinar(rutas, procesos=procesos)
+                lectura = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                escribir(productos, os.path.join(directorio, 'combinado.csv'))
+                salida_csv = time.perf_counter() - inicio
+                inicio = time.perf_counter()
+                escribir(productos, os.path.join(directorio, 'combinado.cat'))
+                salida_cat = time.perf_counter() - inicio
+
+                print(f"{leidas:>10} {'sin pool' if procesos == 1 else os.cpu_count():>9} {len(productos):>10} {lectura:>12.2f} "
+                      f"{leidas / lectura:>10.0f} {salida_csv:>8.2f} {salida_cat:>9.2f}")
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or TAMANOS)
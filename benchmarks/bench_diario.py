@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Costo del diario de impresión.
+
+Imprime los mismos pedidos contra una impresora simulada sin diario y con
+diario (en un directorio temporal) e informa:
+
+    etq/s        etiquetas impresas por segundo, con pedidos seguidos
+    p50/p95      latencia de cada pedido (ms)
+    escrituras   escrituras sincronizadas del diario (fsync) por pedido
+
+Además mide cuántas llamadas a DiarioImpresion.enviadas() por segundo
+admite el diario, sin impresora, y cuánto tarda en abrir un diario con
+muchos pedidos.
+
+Uso: python -m benchmarks.bench_diario [cantidad ...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_impresion import percentil
+from benchmarks.bench_zpl import ID_PRODUCTO, NOMBRE, OP, SGC
+from cola_impresion import ColaImpresion
+from diario_impresion import DiarioImpresion
+from impresora_simulada import ImpresoraSimulada
+from impresoras import TIPO_PRODUCTO, PlanificadorImpresion, RegistroImpresoras
+
+CANTIDADES = (1, 100, 10000)
+ETIQUETAS_POR_CANTIDAD = 20000  # Etiquetas a imprimir por cantidad (como mínimo 20 pedidos)
+PEDIDOS_MINIMOS = 20
+LLAMADAS = 200000  # Llamadas a enviadas() de la medición sin impresora
+PEDIDOS_DIARIO = 5000  # Pedidos del diario que se vuelve a abrir
+
+
+class DiarioContado(DiarioImpresion):
+    # Cuenta las escrituras sincronizadas con el disco
+    escrituras = 0
+
+    def _escribir(self, registros):
+        if registros:
+            self.escrituras += 1
+        super()._escribir(registros)
+
+
+def medir(impresora, cantidad, diario):
+    pedidos = max(PEDIDOS_MINIMOS, ETIQUETAS_POR_CANTIDAD // cantidad)
+    cola = ColaImpresion(espera_reintento=0.01)
+    registro = RegistroImpresoras.desde_config([
+        {'nombre': 'simulada', 'host': impresora.direccion[0], 'puerto': impresora.direccion[1]},
+    ])
+    planificador = PlanificadorImpresion(cola, registro, diario=diario)
+    latencias = []
+    inicio = time.perf_counter()
+    for _ in range(pedidos):
+        objetivo = impresora.etiquetas + cantidad
+        comienzo = time.perf_counter()
+        planificador.imprimir(NOMBRE, ID_PRODUCTO, OP, SGC, cantidad)
+        planificador.esperar()
+        impresora.esperar(objetivo)
+        latencias.append(time.perf_counter() - comienzo)
+    total = time.perf_counter() - inicio
+    cola.detener()
+    if diario is not None:
+        diario.cerrar()
+    return {
+        'etiquetas/s': pedidos * cantidad / total,
+        'p50': percentil(latencias, 50),
+        'p95': percentil(latencias, 95),
+        'escrituras': diario.escrituras / pedidos if diario is not None else 0.0,
+    }
+
+
+def medir_registro(directorio):
+    # enviadas() sólo acumula en memoria: su costo es el de cada bloque enviado
+    diario = DiarioImpresion(os.path.join(directorio, 'llamadas.log'))
+    datos = {'nombre': NOMBRE, 'id_producto': ID_PRODUCTO, 'op': OP, 'sgc': SGC, 'cantidad': LLAMADAS,
+             'tipo': TIPO_PRODUCTO}
+    numero = diario.nuevo_pedido(datos, [(1, LLAMADAS)])
+    inicio = time.perf_counter()
+    for hasta in range(1, LLAMADAS + 1):
+        diario.enviadas(numero, 1, hasta)
+    llamadas = LLAMADAS / (time.perf_counter() - inicio)
+    diario.cerrar()
+
+    ruta = os.path.join(directorio, 'pedidos.log')
+    diario = DiarioImpresion(ruta)
+    for _ in range(PEDIDOS_DIARIO):
+        numero = diario.nuevo_pedido(datos, [(1, 1000)])
+        diario.enviadas(numero, 1, 1000)
+        diario.terminar(numero)
+    diario.cerrar()
+    aperturas = []
+    for _ in range(5):
+        inicio = time.perf_counter()
+        DiarioImpresion(ruta).cerrar()
+        aperturas.append(time.perf_counter() - inicio)
+    return llamadas, statistics.median(aperturas), os.path.getsize(ruta)
+
+
+def main(cantidades):
+    with tempfile.TemporaryDirectory() as directorio:
+        print(f"{'diario':>6} {'cantidad':>8} {'etq/s':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} {'escrituras':>10}")
+        with ImpresoraSimulada(puerto=0) as impresora:
+            for cantidad in cantidades:
+                for nombre in ('no', 'sí'):
+                    diario = None if nombre == 'no' else DiarioContado(os.path.join(directorio, f'{cantidad}.log'))
+                    r = medir(impresora, cantidad, diario)
+                    print(f"{nombre:>6} {cantidad:>8} {r['etiquetas/s']:>10,.0f} {r['p50'] * 1000:>9.2f} "
+                          f"{r['p95'] * 1000:>9.2f} {r['escrituras']:>10.2f}")
+
+        llamadas, apertura, tamano = medir_registro(directorio)
+        print(f"\nenviadas(): {llamadas:,.0f} llamadas/s")
+        print(f"Apertura de un diario de {PEDIDOS_DIARIO} pedidos ({tamano / 1024:.0f} KB): {apertura * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or CANTIDADES)
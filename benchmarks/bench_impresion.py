@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Rendimiento de punta a punta del camino de impresión contra una impresora simulada.
+
+Cada pedido recorre el mismo camino que MainWindow.handle_print
+(PlanificadorImpresion.imprimir -> zpl -> ColaImpresion) y termina cuando
+impresora_simulada contó todas sus etiquetas. Para cada escenario de
+impresora y cada cantidad de etiquetas se informa:
+
+    etq/s        etiquetas impresas por segundo, con pedidos seguidos
+    bytes/etq    bytes recibidos por la impresora por etiqueta
+    p50/p95/p99  latencia de cada pedido (ms), con la conexión ya abierta
+    conexión     costo de abrir la conexión (ms): latencia con una cola
+                 nueva por pedido menos la latencia con la conexión abierta
+    perdidas     etiquetas que la impresora no recibió (cortes de conexión)
+    repetidas    etiquetas que recibió de más: lo que estaba sin confirmar
+                 cuando se cortó la conexión y se volvió a enviar
+
+Uso: python -m benchmarks.bench_impresion [cantidad ...]
+"""
+import statistics
+import sys
+import time
+
+from benchmarks.bench_zpl import ID_PRODUCTO, NOMBRE, OP, SGC
+from cola_impresion import ColaImpresion
+from impresora_simulada import ImpresoraSimulada
+from impresoras import PlanificadorImpresion, RegistroImpresoras
+
+CANTIDADES = (1, 10, 100, 1000, 10000)
+ETIQUETAS_POR_CANTIDAD = 20000  # Etiquetas a imprimir por cantidad (como mínimo 20 pedidos)
+PEDIDOS_MINIMOS = 20
+PEDIDOS_SIN_CONEXION = 10  # Pedidos con una conexión nueva cada uno
+ESPERA_PERDIDAS = 1.0  # Segundos que se espera a las etiquetas tras enviarlas todas
+
+# Parámetros de ImpresoraSimulada de cada escenario
+ESCENARIOS = {
+    'local': {},
+    'red lenta': {'ancho_banda': 1024 * 1024, 'latencia': 0.005},
+    'con cortes': {'fallos': 0.2, 'semilla': 1},
+}
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def imprimir(impresora, planificador, cantidad):
+    # Devuelve la latencia del pedido y las etiquetas que no llegaron y las repetidas
+    objetivo = impresora.etiquetas + cantidad
+    inicio = time.perf_counter()
+    planificador.imprimir(NOMBRE, ID_PRODUCTO, OP, SGC, cantidad)
+    planificador.esperar()
+    if not impresora.esperar(objetivo, ESPERA_PERDIDAS):
+        return time.perf_counter() - inicio, objetivo - impresora.etiquetas, 0
+    # Con la confirmación al final del trabajo ya llegó todo lo enviado
+    return time.perf_counter() - inicio, 0, impresora.etiquetas - objetivo
+
+
+def nuevo_planificador(impresora):
+    cola = ColaImpresion(espera_reintento=0.01)
+    registro = RegistroImpresoras.desde_config([
+        {'nombre': 'simulada', 'host': impresora.direccion[0], 'puerto': impresora.direccion[1]},
+    ])
+    return cola, PlanificadorImpresion(cola, registro)
+
+
+def medir(impresora, cantidad):
+    pedidos = max(PEDIDOS_MINIMOS, ETIQUETAS_POR_CANTIDAD // cantidad)
+    cola, planificador = nuevo_planificador(impresora)
+    imprimir(impresora, planificador, cantidad)  # Abre la conexión
+    impresora.reiniciar()
+
+    inicio = time.perf_counter()
+    latencias = []
+    perdidas = 0
+    repetidas = 0
+    for _ in range(pedidos):
+        latencia, faltantes, sobrantes = imprimir(impresora, planificador, cantidad)
+        latencias.append(latencia)
+        perdidas += faltantes
+        repetidas += sobrantes
+    total = time.perf_counter() - inicio
+    bytes_por_etiqueta = impresora.bytes_recibidos / max(1, impresora.etiquetas)
+    cola.detener()
+
+    # Con una cola nueva por pedido cada uno abre su conexión
+    sin_conexion = []
+    for _ in range(PEDIDOS_SIN_CONEXION):
+        cola, planificador = nuevo_planificador(impresora)
+        sin_conexion.append(imprimir(impresora, planificador, cantidad)[0])
+        cola.detener()
+
+    return {
+        'etiquetas/s': (pedidos * cantidad - perdidas) / total,
+        'bytes/etiqueta': bytes_por_etiqueta,
+        'p50': percentil(latencias, 50),
+        'p95': percentil(latencias, 95),
+        'p99': percentil(latencias, 99),
+        'conexion': statistics.median(sin_conexion) - statistics.median(latencias),
+        'perdidas': perdidas,
+        'repetidas': repetidas,
+    }
+
+
+def main(cantidades):
+    print(f"{'escenario':>11} {'cantidad':>8} {'etq/s':>10} {'bytes/etq':>10} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+          f"{'p99 (ms)':>9} {'conexión':>9} {'perdidas':>9} {'repetidas':>9}")
+    for escenario, parametros in ESCENARIOS.items():
+        with ImpresoraSimulada(puerto=0, **parametros) as impresora:
+            for cantidad in cantidades:
+                r = medir(impresora, cantidad)
+                print(f"{escenario:>11} {cantidad:>8} {r['etiquetas/s']:>10,.0f} {r['bytes/etiqueta']:>10.1f} "
+                      f"{r['p50'] * 1000:>9.2f} {r['p95'] * 1000:>9.2f} {r['p99'] * 1000:>9.2f} "
+                      f"{r['conexion'] * 1000:>9.2f} {r['perdidas']:>9} {r['repetidas']:>9}")
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or CANTIDADES)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Compara la memoria de list(csv.DictReader) con el Catalogo por columnas.
+
+Uso: python -m benchmarks.bench_memoria [filas ...]
+"""
+import csv
+import gc
+import io
+import sys
+import tracemalloc
+
+from catalogo import COLUMNAS, Catalogo
+from benchmarks.sinteticos import generar_filas
+
+TAMANOS = (100_000, 500_000)
+
+
+def csv_sintetico(cantidad):
+    salida = io.StringIO()
+    escritor = csv.DictWriter(salida, fieldnames=COLUMNAS)
+    escritor.writeheader()
+    escritor.writerows(generar_filas(cantidad))
+    return salida.getvalue()
+
+
+def memoria(construir, contenido):
+    gc.collect()
+    tracemalloc.start()
+    objeto = construir(csv.DictReader(io.StringIO(contenido)))
+    usada, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objeto, usada / 2**20
+
+
+def memoria_indices(catalogo):
+    # Tamaño de los índices de trigramas, para separarlo del de las columnas
+    total = 0
+    for ngramas in (catalogo._ngramas, catalogo._ngramas_id):
+        total += sys.getsizeof(ngramas) + sum(sys.getsizeof(lista) for lista in ngramas.values())
+    return total / 2**20
+
+
+def main(tamanos):
+    print(f"{'filas':>10} {'dicts (MB)':>11} {'columnas (MB)':>14} {'con índices (MB)':>17}")
+    for tamano in tamanos:
+        contenido = csv_sintetico(tamano)
+        filas, dicts = memoria(list, contenido)
+        del filas
+        catalogo, completo = memoria(Catalogo, contenido)
+        columnas = completo - memoria_indices(catalogo)
+        del catalogo
+        print(f"{tamano:>10} {dicts:>11.1f} {columnas:>14.1f} {completo:>17.1f}")
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or TAMANOS)
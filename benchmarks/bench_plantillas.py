@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Etiquetas generadas por segundo, sin enviarlas a ninguna impresora.
+
+Compara el armado original (f-string y codificación Latin-1 por etiqueta)
+con las plantillas compiladas de zpl, en modo individual y por lote. Con
+"en caché" el producto ya fue preparado por una orden anterior; "sin
+caché" lo prepara en cada orden, como al imprimir productos distintos.
+
+Uso: python -m benchmarks.bench_plantillas [cantidad]
+"""
+import sys
+import time
+
+import zpl
+from benchmarks.bench_zpl import ID_PRODUCTO, NOMBRE, OP, SGC
+
+REPETICIONES = 5
+ORDENES = 200  # Órdenes de pocas etiquetas para medir la preparación
+
+
+def original(nombre, id_producto, op, sgc, cantidad):
+    # Copia del armado de zpl.etiquetas antes de las plantillas compiladas
+    partes = []
+    for i in range(1, cantidad + 1):
+        campos = (
+            f"^FO115,35^A0N,18,18^FD{zpl.texto_impresora(nombre)}^FS\n"
+            f"^FO115,60^BCN,75,Y,N,N^FD{zpl.texto_impresora(id_producto)}^FS\n"
+            f"^FO115,168^A0N,20,20^FD{zpl.texto_impresora(op)}^FS\n"
+            f"^FO115,188^A0N,18,18^FD{i}/{cantidad}^FS\n"
+            f"^FO370,60^A0R,18,18^FD{zpl.texto_impresora(sgc)}^FS\n"
+        )
+        partes.append(f"^XA\n{campos}^PQ1,1,1,Y^XZ\n".encode('latin1'))
+    return partes
+
+
+MODOS = {
+    'original': original,
+    'individual': zpl.etiquetas,
+    'lote': zpl.lote,
+}
+
+
+def mejor_tiempo(funcion):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main(cantidad):
+    por_orden = max(1, cantidad // ORDENES)
+    print(f"{cantidad} etiquetas por orden; sin caché: {ORDENES} órdenes de {por_orden} etiquetas")
+    print(f"{'modo':>11} {'etq/s en caché':>15} {'etq/s sin caché':>16} {'bytes/etq':>10}")
+    for nombre_modo, generar in MODOS.items():
+        zpl.preparar.cache_clear()
+        generar(NOMBRE, ID_PRODUCTO, OP, SGC, cantidad)
+        en_cache = mejor_tiempo(lambda: generar(NOMBRE, ID_PRODUCTO, OP, SGC, cantidad))
+
+        # Un nombre distinto por orden: cada una prepara su producto
+        productos = [f"{NOMBRE} {n}" for n in range(ORDENES)]
+
+        def sin_cache():
+            zpl.preparar.cache_clear()
+            for producto in productos:
+                generar(producto, ID_PRODUCTO, OP, SGC, por_orden)
+
+        sin_preparar = mejor_tiempo(sin_cache)
+        enviados = sum(len(parte) for parte in generar(NOMBRE, ID_PRODUCTO, OP, SGC, cantidad))
+        print(f"{nombre_modo:>11} {cantidad / en_cache:>15,.0f} {ORDENES * por_orden / sin_preparar:>16,.0f} "
+              f"{enviados / cantidad:>10.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
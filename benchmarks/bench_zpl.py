@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Bytes enviados y tiempo de envío por cada 1000 etiquetas.
+
+Compara el envío original (una etiqueta formateada y un sendall por
+iteración), el modo individual de zpl.etiquetas y el modo por lote
+(^DF/^XF) contra un receptor TCP local.
+
+Uso: python -m benchmarks.bench_zpl [cantidad]
+"""
+import socket
+import sys
+import threading
+import time
+
+import zpl
+
+NOMBRE = 'Válvula de latón niño 1/2"'
+ID_PRODUCTO = 'VL-0012345'
+OP = 'OP-2024/0915'
+SGC = 'V1.3'
+
+
+class Receptor:
+    # Servidor que sólo cuenta los bytes que recibe
+    def __init__(self):
+        self.servidor = socket.create_server(('127.0.0.1', 0))
+        self.direccion = self.servidor.getsockname()
+        self.recibidos = 0
+        self.recibidos_base = 0  # Bytes recibidos antes de la medición actual
+        self.condicion = threading.Condition()
+        threading.Thread(target=self._aceptar, daemon=True).start()
+
+    def _aceptar(self):
+        while True:
+            conexion, _ = self.servidor.accept()
+            threading.Thread(target=self._leer, args=(conexion,), daemon=True).start()
+
+    def _leer(self, conexion):
+        with conexion:
+            while True:
+                datos = conexion.recv(65536)
+                if not datos:
+                    return
+                with self.condicion:
+                    self.recibidos += len(datos)
+                    self.condicion.notify_all()
+
+    def esperar(self, total):
+        with self.condicion:
+            self.condicion.wait_for(lambda: self.recibidos >= total, timeout=30)
+
+
+def original(cantidad):
+    # Copia del bucle que tenía MainWindow.handle_print, sin los print()
+    nombre_producto_print = NOMBRE.encode('latin1', errors='replace').decode('latin1')
+    for i in range(1, cantidad + 1):
+        zpl_label = f"""^XA
+                        ^FO115,35^A0N,18,18^FD{nombre_producto_print}^FS
+                        ^FO115,60^BCN,75,Y,N,N^FD{ID_PRODUCTO}^FS
+                        ^FO115,168^A0N,20,20^FD{OP}^FS
+                        ^FO115,188^A0N,18,18^FD{i}/{cantidad}^FS
+                        ^FO370,60^A0R,18,18^FD{SGC}^FS
+                        ^PQ1,1,1,Y^XZ"""
+        yield zpl_label.encode('latin1')
+
+
+MODOS = {
+    'original': original,
+    'individual': lambda cantidad: zpl.etiquetas(NOMBRE, ID_PRODUCTO, OP, SGC, cantidad),
+    'lote': lambda cantidad: zpl.lote(NOMBRE, ID_PRODUCTO, OP, SGC, cantidad),
+}
+
+
+def medir(receptor, generar, cantidad):
+    inicio = time.perf_counter()
+    enviados = 0
+    llamadas = 0
+    with socket.create_connection(receptor.direccion) as sock:
+        for parte in generar(cantidad):
+            sock.sendall(parte)
+            enviados += len(parte)
+            llamadas += 1
+        receptor.esperar(receptor.recibidos_base + enviados)
+    return enviados, llamadas, time.perf_counter() - inicio
+
+
+def main(cantidad):
+    receptor = Receptor()
+    print(f"{cantidad} etiquetas")
+    print(f"{'modo':>11} {'bytes':>9} {'bytes/etq':>10} {'sendall':>8} {'tiempo (ms)':>12}")
+    for nombre, generar in MODOS.items():
+        receptor.recibidos_base = receptor.recibidos
+        enviados, llamadas, tiempo = medir(receptor, generar, cantidad)
+        print(f"{nombre:>11} {enviados:>9} {enviados / cantidad:>10.1f} {llamadas:>8} {tiempo * 1000:>12.2f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
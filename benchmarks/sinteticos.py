@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Generación de catálogos sintéticos para los benchmarks."""
+import random
+
+_PALABRAS = [
+    'tornillo', 'tuerca', 'arandela', 'perno', 'cable', 'conector', 'válvula',
+    'bomba', 'filtro', 'sensor', 'motor', 'correa', 'rodamiento', 'junta',
+    'manguera', 'tubo', 'codo', 'brida', 'niño', 'acero', 'latón', 'plástico',
+    'inoxidable', 'galvanizado', 'hexagonal', 'cónico', 'pequeño', 'grande',
+]
+
+
+def generar_filas(cantidad, semilla=1234):
+    """Genera filas con el formato id_producto, code_128, nombre"""
+    aleatorio = random.Random(semilla)
+    for i in range(cantidad):
+        id_producto = f"{aleatorio.choice('ABCDEFGHKMPRST')}{aleatorio.choice('ABCDEFGHKMPRST')}-{i:07d}"
+        nombre = ' '.join(aleatorio.choice(_PALABRAS) for _ in range(aleatorio.randint(2, 5)))
+        yield {
+            'id_producto': id_producto,
+            'code_128': id_producto,
+            'nombre': f"{nombre.capitalize()} {aleatorio.randint(1, 500)}mm",
+        }
+
+
+def consultas(cantidad, filas, semilla=99):
+    """Elige consultas representativas (subcadenas de IDs y nombres)"""
+    aleatorio = random.Random(semilla)
+    resultado = []
+    for _ in range(cantidad):
+        fila = filas[aleatorio.randrange(len(filas))]
+        texto = fila['id_producto'] if aleatorio.random() < 0.6 else fila['nombre']
+        inicio = aleatorio.randrange(max(1, len(texto) - 6))
+        resultado.append(texto[inicio:inicio + aleatorio.randint(3, 7)])
+    return resultado
+
+
+def con_errores(textos, semilla=7):
+    """Copia de textos con dos letras vecinas intercambiadas (error de tipeo)"""
+    aleatorio = random.Random(semilla)
+    resultado = []
+    for texto in textos:
+        if len(texto) < 5:
+            continue
+        i = aleatorio.randrange(1, len(texto) - 2)
+        resultado.append(texto[:i] + texto[i + 1] + texto[i] + texto[i + 2:])
+    return resultado
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Búsqueda incremental con caché de consultas recientes."""
+import threading
+import time
+from collections import OrderedDict
+
+import metricas
+from catalogo import normalizar
+
+TAMANO_CACHE = 64  # Consultas recientes que se recuerdan
+
+
+class BuscadorIncremental:
+    """Búsquedas sobre un Catalogo que reutilizan resultados anteriores.
+
+    Los resultados de las últimas ``tamano_cache`` consultas se guardan en
+    una caché LRU. Si una consulta nueva contiene a una ya resuelta (por
+    ejemplo al seguir escribiendo), sólo se verifican los resultados de
+    esa consulta en lugar de todo el catálogo. La caché se descarta cuando
+    el catálogo crece, por ejemplo durante una carga en segundo plano.
+
+    Con ``limite`` sólo se piden los primeros resultados; una lista cortada
+    por el límite no sirve de base para otras consultas, pero sí responde
+    las que piden como mucho la misma cantidad.
+    """
+
+    def __init__(self, catalogo, tamano_cache=TAMANO_CACHE):
+        self.catalogo = catalogo
+        self.tamano_cache = tamano_cache
+        self._cache = OrderedDict()
+        self._filas_catalogo = len(catalogo)
+        self._bloqueo = threading.Lock()
+
+    def _base(self, consulta):
+        # Resultados completos más cortos entre las consultas guardadas contenidas en esta
+        base = None
+        for anterior, (resultados, limite) in self._cache.items():
+            completos = limite is None or len(resultados) < limite
+            if completos and anterior and anterior in consulta and (base is None or len(resultados) < len(base)):
+                base = resultados
+        return base
+
+    def buscar(self, texto, limite=None, cancelado=None):
+        """Devuelve los índices de fila que coinciden, o None si se canceló"""
+        consulta = ' '.join(normalizar(texto).split())
+        with self._bloqueo:
+            if len(self.catalogo) != self._filas_catalogo:
+                self._cache.clear()
+                self._filas_catalogo = len(self.catalogo)
+            guardado = self._cache.get(consulta)
+            if guardado is not None:
+                resultados, limite_guardado = guardado
+                if limite_guardado is None or len(resultados) < limite_guardado or (
+                        limite is not None and limite <= limite_guardado):
+                    self._cache.move_to_end(consulta)
+                    metricas.contar('busqueda.cache')
+                    return resultados if limite is None else resultados[:limite]
+            base = self._base(consulta)
+            filas_catalogo = self._filas_catalogo
+
+        inicio = time.perf_counter()
+        resultados = self.catalogo.buscar(consulta, limite, dentro=base, cancelado=cancelado)
+        if resultados is None:
+            metricas.contar('busqueda.canceladas')
+            return None
+        metricas.registrar('busqueda', time.perf_counter() - inicio)
+
+        with self._bloqueo:
+            # Si el catálogo creció durante la búsqueda el resultado no se guarda
+            if filas_catalogo == self._filas_catalogo == len(self.catalogo):
+                self._cache[consulta] = (resultados, limite)
+                if len(self._cache) > self.tamano_cache:
+                    self._cache.popitem(last=False)
+        return resultados
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Caché en disco de catálogos ya interpretados e indexados."""
+import csv
+import hashlib
+import os
+
+import metricas
+from archivos import escribir_atomico
+from catalogo import Catalogo
+
+DIRECTORIO_CACHE = os.path.join(os.path.expanduser('~'), '.sistema-etiquetas', 'cache')
+ARCHIVO_ULTIMO = os.path.join(os.path.expanduser('~'), '.sistema-etiquetas', 'ultimo_catalogo.txt')
+TAMANO_MAXIMO = 512 * 2**20  # Bytes que puede ocupar el directorio de caché
+EXTENSION = '.cat'
+EXTENSIONES_EXCEL = ('.xlsx', '.xlsm')  # Exportaciones de Odoo que se leen sin pasar a CSV
+
+
+def _resumen(texto):
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=10).hexdigest()
+
+
+def es_excel(ruta):
+    return os.path.splitext(ruta)[1].lower() in EXTENSIONES_EXCEL
+
+
+def es_binario(ruta):
+    # Catálogo ya escrito con Catalogo.escribir (por ejemplo, por combinar_catalogos)
+    return ruta.lower().endswith(EXTENSION)
+
+
+def _leer(ruta, catalogo):
+    # Agrega a un catálogo vacío los productos de un CSV, de un Excel
+    # exportado de Odoo o de un catálogo en formato binario
+    if es_binario(ruta):
+        with open(ruta, 'rb') as archivo:
+            catalogo.cargar_binario(archivo)
+    elif es_excel(ruta):
+        from transformador_hojas_bd import filas_excel
+        catalogo.agregar(filas_excel(ruta))
+    else:
+        with open(ruta, 'r', encoding='utf-8', newline='') as csvfile:
+            catalogo.agregar(csv.DictReader(csvfile))
+    catalogo.ordenar()
+
+
+def huella(ruta):
+    """Calcula la huella de un archivo de origen: tamaño, fecha y contenido"""
+    estado = os.stat(ruta)
+    contenido = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(2**20), b''):
+            contenido.update(bloque)
+    return f'{estado.st_size}:{estado.st_mtime_ns}:{contenido.hexdigest()}'
+
+
+def cargar_catalogo(ruta, cache=None):
+    """Carga un CSV o Excel de productos, usando la caché si el archivo no cambió.
+
+    Es la versión sin interfaz (y sin hilos) de carga_catalogo.CargadorCatalogo.
+    """
+    catalogo = Catalogo()
+    with metricas.medir('catalogo.carga'):
+        if cache is None or es_binario(ruta):
+            _leer(ruta, catalogo)
+            return catalogo
+        huella_origen = huella(ruta)
+        if cache.cargar(ruta, catalogo, huella_origen):
+            metricas.contar('catalogo.cache')
+            return catalogo
+        _leer(ruta, catalogo)
+    try:
+        cache.guardar(ruta, catalogo, huella_origen)
+    except OSError as e:
+        print(f"No se pudo guardar la caché del catálogo: {str(e)}")
+    return catalogo
+
+
+def recordar_ultimo(ruta, archivo=ARCHIVO_ULTIMO):
+    """Anota ruta como el último catálogo abierto (ver ultimo_catalogo)"""
+    os.makedirs(os.path.dirname(archivo), exist_ok=True)
+    with open(archivo, 'w', encoding='utf-8') as salida:
+        salida.write(os.path.abspath(ruta))
+
+
+def ultimo_catalogo(archivo=ARCHIVO_ULTIMO):
+    """Ruta del último catálogo abierto, o None si no hay uno o ya no existe"""
+    try:
+        with open(archivo, 'r', encoding='utf-8') as entrada:
+            ruta = entrada.read().strip()
+    except OSError:
+        return None
+    return ruta if ruta and os.path.isfile(ruta) else None
+
+
+class CacheCatalogo:
+    """Guarda catálogos en formato binario, uno por archivo de origen.
+
+    El nombre de cada entrada combina la ruta absoluta del origen con su
+    huella (tamaño, fecha de modificación y resumen del contenido), así que
+    un CSV o XLSX modificado nunca reutiliza una entrada vieja; al guardar
+    se borran las entradas anteriores de la misma ruta. El directorio se
+    limita a ``tamano_maximo`` bytes descartando las entradas usadas hace
+    más tiempo.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_CACHE, tamano_maximo=TAMANO_MAXIMO):
+        self.directorio = directorio
+        self.tamano_maximo = tamano_maximo
+
+    def _prefijo(self, ruta):
+        return _resumen(os.path.abspath(ruta)) + '-'
+
+    def _entrada(self, ruta, huella_origen):
+        return os.path.join(self.directorio, self._prefijo(ruta) + _resumen(huella_origen) + EXTENSION)
+
+    def cargar(self, ruta, catalogo, huella_origen=None):
+        """Carga la entrada de ruta en un catálogo vacío.
+
+        Devuelve False si no hay una entrada vigente para el archivo.
+        """
+        if huella_origen is None:
+            huella_origen = huella(ruta)
+        entrada = self._entrada(ruta, huella_origen)
+        try:
+            with open(entrada, 'rb') as archivo:
+                catalogo.cargar_binario(archivo)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"Caché de catálogo dañada, se descarta: {str(e)}")
+            self._borrar(entrada)
+            return False
+        # La fecha de modificación de la entrada marca su último uso
+        os.utime(entrada)
+        return True
+
+    def obtener(self, ruta):
+        """Devuelve el catálogo guardado para ruta, o None si no hay uno vigente"""
+        catalogo = Catalogo()
+        return catalogo if self.cargar(ruta, catalogo) else None
+
+    def guardar(self, ruta, catalogo, huella_origen=None):
+        """Guarda el catálogo interpretado a partir del archivo en ruta"""
+        if huella_origen is None:
+            huella_origen = huella(ruta)
+        os.makedirs(self.directorio, exist_ok=True)
+        entrada = self._entrada(ruta, huella_origen)
+
+        # Escritura atómica: una entrada a medio escribir nunca queda visible
+        escribir_atomico(entrada, catalogo.escribir)
+
+        prefijo = self._prefijo(ruta)
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith(prefijo) and os.path.join(self.directorio, nombre) != entrada:
+                self._borrar(os.path.join(self.directorio, nombre))
+        self.recortar()
+
+    def recortar(self):
+        """Descarta las entradas menos usadas hasta respetar el tamaño máximo"""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(EXTENSION):
+                ruta = os.path.join(self.directorio, nombre)
+                estado = os.stat(ruta)
+                entradas.append((estado.st_mtime_ns, estado.st_size, ruta))
+        entradas.sort()
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, ruta in entradas:
+            if total <= self.tamano_maximo:
+                break
+            self._borrar(ruta)
+            total -= tamano
+
+    @staticmethod
+    def _borrar(ruta):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Carga de catálogos CSV o Excel en segundo plano."""
+import csv
+import io
+import os
+from itertools import islice
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+import metricas
+from cache_catalogo import es_binario, es_excel, huella
+
+TAMANO_BLOQUE = 5000  # Filas indexadas por cada toma del candado del catálogo
+
+
+class CargadorCatalogo(QObject):
+    """Lee un CSV por bloques y lo agrega a un Catalogo desde un QThread.
+
+    También acepta el Excel exportado de Odoo, con las mismas columnas que
+    usa el transformador (ver transformador_hojas_bd.filas_excel), sin
+    pasar por un CSV intermedio, y los catálogos en formato binario (.cat)
+    que escribe combinar_catalogos. Cada bloque se indexa apenas se lee, de
+    modo que la interfaz puede buscar sobre las filas ya cargadas mientras
+    el resto sigue llegando. Si se indica una CacheCatalogo y el archivo no
+    cambió desde la última carga, el catálogo se toma de la caché sin
+    interpretar el archivo.
+    """
+
+    progreso = pyqtSignal(int, int)    # filas cargadas, porcentaje del archivo (-1 si no se sabe)
+    terminado = pyqtSignal(int, bool)  # filas cargadas, si se canceló
+    error = pyqtSignal(str)
+
+    def __init__(self, ruta, catalogo, cache=None, tamano_bloque=TAMANO_BLOQUE):
+        super().__init__()
+        self.ruta = ruta
+        self.catalogo = catalogo
+        self.cache = cache
+        self.tamano_bloque = tamano_bloque
+        self._cancelado = False
+        self._porcentaje = -1
+
+    def cancelar(self):
+        """Pide detener la carga al terminar el bloque actual"""
+        self._cancelado = True
+
+    def ejecutar(self):
+        with metricas.medir('catalogo.carga'):
+            self._ejecutar()
+
+    def _ejecutar(self):
+        try:
+            if es_binario(self.ruta):
+                # Ya está indexado: se carga igual que una entrada de la caché
+                with open(self.ruta, 'rb') as archivo:
+                    self.catalogo.cargar_binario(archivo)
+                self.progreso.emit(len(self.catalogo), 100)
+                self.terminado.emit(len(self.catalogo), False)
+                return
+
+            huella_origen = None
+            if self.cache is not None:
+                huella_origen = huella(self.ruta)
+                if self.cache.cargar(self.ruta, self.catalogo, huella_origen):
+                    metricas.contar('catalogo.cache')
+                    self.progreso.emit(len(self.catalogo), 100)
+                    self.terminado.emit(len(self.catalogo), False)
+                    return
+
+            if es_excel(self.ruta):
+                from transformador_hojas_bd import filas_excel
+
+                filas = filas_excel(self.ruta, self._avance_excel)
+                try:
+                    self._leer(filas, lambda: self._porcentaje)
+                finally:
+                    filas.close()
+            else:
+                tamano = os.path.getsize(self.ruta) or 1
+                with open(self.ruta, 'rb') as archivo:
+                    texto = io.TextIOWrapper(archivo, encoding='utf-8', newline='')
+                    self._leer(csv.DictReader(texto), lambda: min(100, archivo.tell() * 100 // tamano))
+            # Mientras se cargaba, la búsqueda por prefijo de ID recorría las filas
+            self.catalogo.ordenar()
+            if self.cache is not None and not self._cancelado:
+                self._guardar_cache(huella_origen)
+            self.terminado.emit(len(self.catalogo), self._cancelado)
+        except FileNotFoundError:
+            self.error.emit(f"Error: No se pudo encontrar el archivo en la ruta: {self.ruta}")
+        except UnicodeDecodeError:
+            self.error.emit("Error: El archivo no está en la codificación UTF-8 esperada")
+        except Exception as e:
+            self.error.emit(f"Error al leer el archivo {'Excel' if es_excel(self.ruta) else 'CSV'}: {str(e)}")
+
+    def _leer(self, filas, porcentaje):
+        while not self._cancelado:
+            bloque = list(islice(filas, self.tamano_bloque))
+            if not bloque:
+                break
+            self.catalogo.agregar(bloque)
+            self.progreso.emit(len(self.catalogo), porcentaje())
+
+    def _avance_excel(self, filas, porcentaje):
+        self._porcentaje = porcentaje
+
+    def _guardar_cache(self, huella_origen):
+        # Un fallo al escribir la caché no invalida la carga
+        try:
+            self.cache.guardar(self.ruta, self.catalogo, huella_origen)
+        except OSError as e:
+            print(f"No se pudo guardar la caché del catálogo: {str(e)}")
@@ -0,0 +1,630 @@
+# -*- coding: utf-8 -*-
+"""Catálogo de productos en memoria con índices de búsqueda."""
+import heapq
+import mmap
+import struct
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+COLUMNAS = ('id_producto', 'code_128', 'nombre')
+
+_FIRMA = b'CATETQ03'  # Formato binario de escribir()/cargar_binario()
+_CABECERA = struct.Struct('<8sBBI')
+_LARGO_SECCION = struct.Struct('<Q')
+
+TAMANO_NGRAMA = 3
+_SEPARADOR = b'\x1f'  # Separa id_producto, code_128 y nombre dentro de una clave
+
+# Niveles de relevancia de cada palabra buscada (menor es mejor). code_128
+# usa los mismos niveles que id_producto. Una palabra encontrada con errores
+# de tipeo vale APROXIMADO más la cantidad de errores menos uno.
+(EXACTO_ID, PREFIJO_ID, CONTIENE_ID, PREFIJO_NOMBRE, PALABRA_NOMBRE,
+ CONTIENE_NOMBRE, APROXIMADO) = range(7)
+
+POCOS_RESULTADOS = 5  # Con menos resultados exactos se buscan también los aproximados
+RESULTADOS_APROXIMADOS = 50  # Sin límite, resultados con errores que se agregan como máximo
+MAXIMO_CANDIDATOS = 2000  # Filas que se verifican como máximo en la búsqueda aproximada
+MAXIMO_APARICIONES = 100000  # Apariciones de trigramas que se cuentan como máximo al buscar aproximados
+TIEMPO_APROXIMADOS = 0.02  # Segundos que puede durar como máximo la búsqueda aproximada
+
+
+def normalizar(texto):
+    """Pasa texto a minúsculas y le quita acentos y diéresis ("Ñandú" -> "nandu")"""
+    texto = texto.casefold()
+    if texto.isascii():
+        return texto
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if not unicodedata.combining(c))
+
+
+def _ngramas(texto):
+    return {texto[i:i + TAMANO_NGRAMA] for i in range(len(texto) - TAMANO_NGRAMA + 1)}
+
+
+def _tolerancia(palabra):
+    # Errores de tipeo que se admiten según el largo de la palabra buscada.
+    # Los códigos (con dígitos o guiones) no se corrigen: a un error de
+    # distancia suele haber otro código que existe
+    if len(palabra) < 4 or not palabra.isalpha():
+        return 0
+    return 1 if len(palabra) < 9 else 2
+
+
+def _nivel(clave, largo_id, largo_code, token):
+    # Nivel de token dentro de una clave "id\x1fcode\x1fnombre", o None
+    posicion = clave.find(token)
+    if posicion < 0:
+        return None
+    inicio_nombre = largo_id + largo_code + 2
+    if posicion < inicio_nombre:
+        largo = len(token)
+        if posicion == 0 and largo == largo_id:
+            return EXACTO_ID
+        if largo_code and clave.startswith(token, largo_id + 1):
+            return EXACTO_ID if largo == largo_code else PREFIJO_ID
+        return PREFIJO_ID if posicion == 0 else CONTIENE_ID
+    if posicion == inicio_nombre:
+        return PREFIJO_NOMBRE
+    while posicion >= 0:
+        if not clave[posicion - 1:posicion].isalnum():
+            return PALABRA_NOMBRE
+        posicion = clave.find(token, posicion + 1)
+    return CONTIENE_NOMBRE
+
+
+def _distancia_prefijo(consulta, palabra, maximo):
+    # Menor distancia de edición (con transposiciones) entre consulta y algún
+    # prefijo de palabra; si es mayor que maximo devuelve maximo + 1
+    palabra = palabra[:len(consulta) + maximo]
+    anterior2 = None
+    anterior = list(range(len(consulta) + 1))
+    mejor = anterior[-1]
+    for i, c in enumerate(palabra, 1):
+        actual = [i]
+        for j, q in enumerate(consulta, 1):
+            valor = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (c != q))
+            if i > 1 and j > 1 and c == consulta[j - 2] and palabra[i - 2] == q:
+                valor = min(valor, anterior2[j - 2] + 1)
+            actual.append(valor)
+        if min(actual) > maximo:
+            break
+        mejor = min(mejor, actual[-1])
+        anterior2, anterior = anterior, actual
+    return min(mejor, maximo + 1)
+
+
+def _aplanar(ngramas):
+    # Un índice de trigramas se guarda en cuatro arreglos: texto de los
+    # trigramas, límites de cada trigrama, listas concatenadas y sus límites
+    trigramas = bytearray()
+    limites_trigramas = array('Q', [0])
+    listas = array('I')
+    limites_listas = array('Q', [0])
+    for ngrama, lista in ngramas.items():
+        trigramas += ngrama.encode('utf-8')
+        limites_trigramas.append(len(trigramas))
+        listas.extend(lista)
+        limites_listas.append(len(listas))
+    return [trigramas, limites_trigramas, listas, limites_listas]
+
+
+def _desaplanar(trigramas, limites_trigramas, listas, limites_listas):
+    ngramas = {}
+    for i in range(len(limites_trigramas) - 1):
+        ngrama = trigramas[limites_trigramas[i]:limites_trigramas[i + 1]].decode('utf-8')
+        ngramas[ngrama] = listas[limites_listas[i]:limites_listas[i + 1]]
+    return ngramas
+
+
+class Catalogo:
+    """Productos del CSV guardados por columnas, con índices de búsqueda.
+
+    Los valores de todas las columnas viven en una única tabla de cadenas
+    UTF-8 (``bytearray``) y cada columna guarda sólo arreglos de inicio y
+    longitud; si code_128 coincide con id_producto se reutiliza el mismo
+    tramo. Las claves de búsqueda (las tres columnas normalizadas, ver
+    normalizar()) se guardan igual en una segunda tabla; code_128 queda
+    vacío en la clave cuando coincide con id_producto.
+
+    Para buscar se mantiene un arreglo de filas ordenado por id_producto
+    normalizado (búsqueda por prefijo), un índice de trigramas sobre las
+    tres columnas (búsqueda por subcadena y aproximada) y otro sólo sobre
+    id_producto y code_128, que separa las filas más relevantes sin
+    revisar las que coinciden en el nombre. Las búsquedas devuelven
+    índices de fila ordenados por relevancia.
+
+    Se puede agregar filas desde un hilo de carga mientras la interfaz
+    busca: cada llamada a agregar() y buscar() toma el mismo candado. Las
+    filas agregadas después del último ordenar() se buscan por prefijo
+    recorriéndolas, así que quien carga el catálogo llama a ordenar() al
+    terminar.
+    """
+
+    def __init__(self, filas=None):
+        self._texto = bytearray()
+        self._inicio = {columna: array('Q') for columna in COLUMNAS}
+        self._largo = {columna: array('I') for columna in COLUMNAS}
+        self._claves = bytearray()
+        self._inicio_clave = array('Q', [0])
+        self._largo_id = array('I')
+        self._largo_code = array('I')
+        self._ngramas = {}
+        self._ngramas_id = {}
+        self._codes_distintos = 0  # Filas con code_128 distinto de id_producto
+        self._orden_id = array('I')
+        self._bloqueo = threading.Lock()
+        if filas is not None:
+            self.agregar(filas)
+            self.ordenar()
+
+    def __len__(self):
+        return len(self._largo_id)
+
+    def valor(self, indice, columna):
+        """Devuelve el valor de una columna para la fila indicada"""
+        inicio = self._inicio[columna][indice]
+        return self._texto[inicio:inicio + self._largo[columna][indice]].decode('utf-8')
+
+    def fila(self, indice):
+        """Devuelve la fila indicada como diccionario"""
+        return {columna: self.valor(indice, columna) for columna in COLUMNAS}
+
+    def _guardar(self, columna, texto, reutilizar=None):
+        if reutilizar is not None:
+            inicio, largo = reutilizar
+        else:
+            datos = texto.encode('utf-8')
+            inicio, largo = len(self._texto), len(datos)
+            self._texto += datos
+        self._inicio[columna].append(inicio)
+        self._largo[columna].append(largo)
+        return inicio, largo
+
+    def agregar(self, filas):
+        """Agrega filas (diccionarios) al catálogo e indexa su contenido"""
+        with self._bloqueo:
+            self._agregar(filas)
+
+    def _agregar(self, filas):
+        ngramas = self._ngramas
+        ngramas_id = self._ngramas_id
+        for fila in filas:
+            indice = len(self._largo_id)
+            id_producto = fila.get('id_producto') or ''
+            code_128 = fila.get('code_128') or ''
+            nombre = fila.get('nombre') or ''
+
+            tramo_id = self._guardar('id_producto', id_producto)
+            self._guardar('code_128', code_128, tramo_id if code_128 == id_producto else None)
+            self._guardar('nombre', nombre)
+
+            id_normal = normalizar(id_producto)
+            code_normal = normalizar(code_128)
+            if code_normal == id_normal:
+                code_normal = ''
+            elif code_normal:
+                self._codes_distintos += 1
+            nombre_normal = normalizar(nombre)
+            id_bytes = id_normal.encode('utf-8')
+            code_bytes = code_normal.encode('utf-8')
+            self._claves += id_bytes + _SEPARADOR + code_bytes + _SEPARADOR + nombre_normal.encode('utf-8')
+            self._inicio_clave.append(len(self._claves))
+            self._largo_id.append(len(id_bytes))
+            self._largo_code.append(len(code_bytes))
+
+            en_id = _ngramas(id_normal) | _ngramas(code_normal)
+            for ngrama in en_id | _ngramas(nombre_normal):
+                lista = ngramas.get(ngrama)
+                if lista is None:
+                    lista = ngramas[ngrama] = array('I')
+                lista.append(indice)
+            for ngrama in en_id:
+                lista = ngramas_id.get(ngrama)
+                if lista is None:
+                    lista = ngramas_id[ngrama] = array('I')
+                lista.append(indice)
+
+    def _secciones(self):
+        # Arreglos que componen el catálogo, en el orden del formato binario
+        return [
+            self._texto,
+            *(self._inicio[columna] for columna in COLUMNAS),
+            *(self._largo[columna] for columna in COLUMNAS),
+            self._claves,
+            self._inicio_clave,
+            self._largo_id,
+            self._largo_code,
+            self._orden_id,
+        ]
+
+    def _asignar_secciones(self, secciones):
+        self._texto = secciones[0]
+        self._inicio = dict(zip(COLUMNAS, secciones[1:4]))
+        self._largo = dict(zip(COLUMNAS, secciones[4:7]))
+        self._claves, self._inicio_clave, self._largo_id, self._largo_code, self._orden_id = secciones[7:12]
+
+    def escribir(self, archivo):
+        """Escribe el catálogo y sus índices en un archivo binario abierto"""
+        with self._bloqueo:
+            if len(self._orden_id) != len(self):
+                self._ordenar()
+            secciones = self._secciones() + _aplanar(self._ngramas) + _aplanar(self._ngramas_id)
+            archivo.write(_CABECERA.pack(_FIRMA, array('I').itemsize, array('Q').itemsize, len(secciones)))
+            for seccion in secciones:
+                archivo.write(_LARGO_SECCION.pack(memoryview(seccion).nbytes))
+                archivo.write(seccion)
+
+    def cargar_binario(self, archivo):
+        """Carga en un catálogo vacío lo escrito por escribir().
+
+        El archivo se proyecta en memoria (mmap) y cada sección se copia
+        directamente a su arreglo, sin volver a interpretar el CSV. Si el
+        archivo no es válido se lanza ValueError y el catálogo no cambia.
+        """
+        with self._bloqueo, mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as proyeccion:
+            datos = memoryview(proyeccion)
+            try:
+                firma, tamano_i, tamano_q, cantidad = _CABECERA.unpack_from(datos)
+                if (firma, tamano_i, tamano_q) != (_FIRMA, array('I').itemsize, array('Q').itemsize):
+                    raise ValueError('Formato de catálogo no válido')
+
+                secciones = [
+                    bytearray(),
+                    *(array('Q') for _ in COLUMNAS),
+                    *(array('I') for _ in COLUMNAS),
+                    bytearray(), array('Q'), array('I'), array('I'), array('I'),
+                    bytearray(), array('Q'), array('I'), array('Q'),
+                    bytearray(), array('Q'), array('I'), array('Q'),
+                ]
+                if cantidad != len(secciones):
+                    raise ValueError('Formato de catálogo no válido')
+
+                posicion = _CABECERA.size
+                for seccion in secciones:
+                    (largo,) = _LARGO_SECCION.unpack_from(datos, posicion)
+                    posicion += _LARGO_SECCION.size
+                    if posicion + largo > len(datos):
+                        raise ValueError('Archivo de catálogo incompleto')
+                    if isinstance(seccion, bytearray):
+                        seccion += datos[posicion:posicion + largo]
+                    else:
+                        seccion.frombytes(datos[posicion:posicion + largo])
+                    posicion += largo
+
+                ngramas = _desaplanar(*secciones[-8:-4])
+                ngramas_id = _desaplanar(*secciones[-4:])
+            except struct.error as e:
+                raise ValueError(f'Archivo de catálogo incompleto: {str(e)}')
+            finally:
+                datos.release()
+            self._asignar_secciones(secciones[:-8])
+            self._ngramas = ngramas
+            self._ngramas_id = ngramas_id
+            self._codes_distintos = len(self._largo_code) - self._largo_code.count(0)
+
+    def _clave_id(self, indice):
+        inicio = self._inicio_clave[indice]
+        return self._claves[inicio:inicio + self._largo_id[indice]]
+
+    def _clave(self, indice):
+        return self._claves[self._inicio_clave[indice]:self._inicio_clave[indice + 1]]
+
+    def _ordenar(self):
+        # Filas ordenadas por id_producto normalizado para búsqueda por prefijo
+        self._orden_id = array('I', sorted(range(len(self)), key=self._clave_id))
+
+    def ordenar(self):
+        """Ordena las filas agregadas para la búsqueda por prefijo de ID.
+
+        El orden se calcula sin tomar el candado: las búsquedas no esperan.
+        """
+        with self._bloqueo:
+            cantidad = len(self)
+            if len(self._orden_id) == cantidad:
+                return
+        # Las claves de filas ya agregadas no cambian
+        orden = array('I', sorted(range(cantidad), key=self._clave_id))
+        with self._bloqueo:
+            if len(orden) > len(self._orden_id):
+                self._orden_id = orden
+
+    def _buscar_posicion(self, consulta, despues):
+        # Búsqueda binaria sobre el orden por id_producto comparando sólo
+        # los primeros len(consulta) bytes de cada clave
+        orden = self._orden_id
+        largo = len(consulta)
+        bajo, alto = 0, len(orden)
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            clave = self._clave_id(orden[medio])[:largo]
+            if clave < consulta or (despues and clave == consulta):
+                bajo = medio + 1
+            else:
+                alto = medio
+        return bajo
+
+    def _prefijo_id(self, consulta):
+        inicio = self._buscar_posicion(consulta, False)
+        fin = self._buscar_posicion(consulta, True)
+        encontrados = self._orden_id[inicio:fin]
+        if len(self._orden_id) < len(self):
+            encontrados.extend(self._prefijo_sin_ordenar(consulta))
+        return encontrados
+
+    def _es_prefijo_id(self, consulta):
+        inicio = self._buscar_posicion(consulta, False)
+        if inicio < len(self._orden_id) and self._clave_id(self._orden_id[inicio]).startswith(consulta):
+            return True
+        return next(self._prefijo_sin_ordenar(consulta), None) is not None
+
+    def _prefijo_sin_ordenar(self, consulta):
+        # Filas posteriores al último ordenar() cuyo ID empieza con consulta
+        if not consulta:
+            yield from range(len(self._orden_id), len(self))
+            return
+        claves = self._claves
+        limites = self._inicio_clave
+        posicion = claves.find(consulta, limites[len(self._orden_id)])
+        while posicion >= 0:
+            indice = bisect_right(limites, posicion) - 1
+            if posicion == limites[indice]:
+                yield indice
+            posicion = claves.find(consulta, limites[indice + 1])
+
+    def _puntaje(self, indice, tokens, frase):
+        # Suma de los niveles de cada palabra de la consulta, o None si falta
+        # alguna; a igual suma se prefieren las filas con la frase completa
+        clave = self._claves[self._inicio_clave[indice]:self._inicio_clave[indice + 1]]
+        largo_id = self._largo_id[indice]
+        largo_code = self._largo_code[indice]
+        puntaje = 0
+        for token in tokens:
+            n = _nivel(clave, largo_id, largo_code, token)
+            if n is None:
+                return None
+            puntaje += n
+        return 2 * puntaje + (frase is not None and frase not in clave)
+
+    def _puntaje_aproximado(self, indice, palabras, tokens, tolerancias, distancias, frase):
+        # Como _puntaje, pero una palabra que no aparece tal cual puede
+        # coincidir con el comienzo de una palabra de la fila con errores.
+        # distancias guarda, por palabra buscada, las ya calculadas: los
+        # nombres del catálogo repiten mucho vocabulario
+        clave = self._clave(indice)
+        largo_id = self._largo_id[indice]
+        largo_code = self._largo_code[indice]
+        campos = None
+        puntaje = 0
+        for palabra, token, tolerancia, calculadas in zip(palabras, tokens, tolerancias, distancias):
+            n = _nivel(clave, largo_id, largo_code, token)
+            if n is None:
+                if not tolerancia:
+                    return None
+                if campos is None:
+                    id_normal, code_normal, nombre_normal = clave.decode('utf-8').split('\x1f', 2)
+                    campos = [c for c in (id_normal, code_normal) if c] + nombre_normal.split()
+                distancia = tolerancia + 1
+                for campo in campos:
+                    d = calculadas.get(campo)
+                    if d is None:
+                        d = calculadas[campo] = _distancia_prefijo(palabra, campo, tolerancia)
+                    distancia = min(distancia, d)
+                if distancia > tolerancia:
+                    return None
+                n = APROXIMADO + distancia - 1
+            puntaje += n
+        return 2 * puntaje + (frase is not None and frase not in clave)
+
+    def _candidatos(self, texto, ngramas=None):
+        # La lista de trigramas más corta de la consulta contiene a todas
+        # las filas que pueden coincidir; el resto se descarta al verificar
+        ngramas = self._ngramas if ngramas is None else ngramas
+        listas = []
+        for ngrama in _ngramas(texto):
+            lista = ngramas.get(ngrama)
+            if lista is None:
+                return ()
+            listas.append(lista)
+        return min(listas, key=len)
+
+    def _recorrer(self, consulta):
+        # Recorre la tabla de claves saltando de coincidencia en coincidencia
+        claves = self._claves
+        limites = self._inicio_clave
+        posicion = claves.find(consulta)
+        while posicion >= 0:
+            indice = bisect_right(limites, posicion) - 1
+            yield indice
+            posicion = claves.find(consulta, limites[indice + 1])
+
+    def _verificar(self, candidatos, tokens, frase, cancelado, excluir=(), hasta=None):
+        # Candidatos que coinciden, como (puntaje, índice). Con hasta =
+        # (puntaje, cantidad) se deja de recorrer al encontrar esa cantidad
+        # con ese puntaje: quien llama sabe que ninguna fila posterior tiene
+        # uno menor y el orden de fila desempata
+        puntaje = self._puntaje
+        encontrados = []
+        piso, cantidad = hasta or (None, 0)
+        revisados = 0
+        for indice in candidatos:
+            if indice not in excluir:
+                p = puntaje(indice, tokens, frase)
+                if p is not None:
+                    encontrados.append((p, indice))
+                    if p == piso:
+                        cantidad -= 1
+                        if not cantidad:
+                            break
+            if cancelado is not None:
+                revisados += 1
+                if not revisados & 0xFFF and cancelado():
+                    return None
+        return encontrados
+
+    def _primeros(self, palabra, token, limite, prefijos, cancelado):
+        # Una sola palabra con límite. Las filas donde aparece en id_producto
+        # o code_128 (hasta CONTIENE_ID) salen del índice de esas columnas;
+        # las demás valen al menos PREFIJO_NOMBRE, así que se recorren sólo
+        # hasta completar el límite con ese nivel. Con los prefijos de ID ya
+        # encontrados (prefijos), lo mismo vale para las de CONTIENE_ID
+        tokens = [token]
+        if prefijos is None:
+            en_id = []
+            hasta = None
+        else:
+            en_id = [(2 * (self._largo_id[indice] != len(token)), indice) for indice in prefijos]
+            hasta = (2 * CONTIENE_ID, limite - len(en_id))
+        verificados = self._verificar(
+            self._candidatos(palabra, self._ngramas_id), tokens, None, cancelado,
+            excluir={indice for _, indice in en_id}, hasta=hasta)
+        if verificados is None:
+            return None
+        en_id += [(p, indice) for p, indice in verificados if p <= 2 * CONTIENE_ID]
+        faltan = limite - len(en_id)
+        if faltan <= 0:
+            return en_id
+        # Si un trigrama de la palabra sólo aparece en filas que lo tienen en
+        # id_producto o code_128 (típico de los códigos), las filas con la
+        # palabra en el nombre ya se verificaron
+        trigramas = _ngramas(palabra)
+        if any(len(self._ngramas.get(t, ())) == len(self._ngramas_id.get(t, ())) for t in trigramas):
+            return en_id + [(p, indice) for p, indice in verificados if p > 2 * CONTIENE_ID]
+        resto = self._verificar(
+            self._candidatos(palabra), tokens, None, cancelado,
+            excluir={indice for _, indice in en_id}, hasta=(2 * PREFIJO_NOMBRE, faltan))
+        return None if resto is None else en_id + resto
+
+    def _aproximados(self, palabras, tokens, frase, excluir, cancelado):
+        # Filas que coinciden admitiendo errores de tipeo, como (puntaje, índice)
+        tolerancias = [_tolerancia(palabra) for palabra in palabras]
+        if not any(tolerancias):
+            return []
+
+        # Con k errores una palabra pierde a lo sumo 3k de sus trigramas, así
+        # que una fila que coincide comparte al menos len(trigramas) - 3k con
+        # ella. Se filtra con la palabra de la consulta que deja menos filas.
+        filtro = None
+        for palabra, tolerancia in zip(palabras, tolerancias):
+            trigramas = _ngramas(palabra)
+            minimo = len(trigramas) - TAMANO_NGRAMA * tolerancia
+            if minimo < 1:
+                continue
+            listas = [self._ngramas.get(ngrama, ()) for ngrama in trigramas]
+            total = sum(map(len, listas))
+            if filtro is None or total < filtro[0]:
+                filtro = (total, listas, minimo)
+        if filtro is None:
+            return []
+
+        total, listas, minimo = filtro
+        if total > MAXIMO_APARICIONES:
+            # Palabras tan comunes se buscan sólo en las primeras filas del
+            # catálogo: las listas están ordenadas por fila
+            corte = len(self) * MAXIMO_APARICIONES // total
+            listas = [lista[:bisect_left(lista, corte)] for lista in listas]
+        conteo = Counter()
+        for lista in listas:
+            conteo.update(lista)
+        candidatos = [indice for indice, n in conteo.items() if n >= minimo and indice not in excluir]
+        if len(candidatos) > MAXIMO_CANDIDATOS:
+            candidatos = heapq.nlargest(MAXIMO_CANDIDATOS, candidatos, key=conteo.__getitem__)
+
+        puntaje = self._puntaje_aproximado
+        distancias = [{} for _ in palabras]
+        encontrados = []
+        vence = time.perf_counter() + TIEMPO_APROXIMADOS
+        for revisados, indice in enumerate(candidatos, 1):
+            p = puntaje(indice, palabras, tokens, tolerancias, distancias, frase)
+            if p is not None:
+                encontrados.append((p, indice))
+            if not revisados & 0x3F:
+                if cancelado is not None and cancelado():
+                    return None
+                if time.perf_counter() > vence:
+                    break
+        return encontrados
+
+    def buscar_id(self, id_producto):
+        """Índice de la fila con ese id_producto exacto (sin distinguir mayúsculas ni acentos), o None"""
+        consulta = normalizar(id_producto).encode('utf-8')
+        with self._bloqueo:
+            for indice in self._prefijo_id(consulta):
+                if self._largo_id[indice] == len(consulta):
+                    return indice
+        return None
+
+    def buscar(self, texto, limite=None, dentro=None, cancelado=None):
+        """Busca texto en id_producto, code_128 y nombre.
+
+        No distingue mayúsculas ni acentos. Cada palabra del texto debe
+        aparecer en alguna columna; la relevancia de una fila suma la de sus
+        palabras (ID o code exacto, prefijo de ID, ID que contiene la
+        palabra, prefijo de nombre, palabra del nombre y nombre que la
+        contiene). Si hay menos de POCOS_RESULTADOS resultados se agregan,
+        hasta completar ``limite`` (o RESULTADOS_APROXIMADOS sin límite),
+        filas donde las palabras de 4 letras o más aparecen con uno o dos
+        errores de tipeo. Devuelve los índices de fila ordenados por
+        relevancia.
+
+        ``dentro`` limita la búsqueda exacta a esos índices de fila, por
+        ejemplo los resultados de una consulta contenida en texto.
+        ``cancelado`` es una función que se consulta durante la búsqueda; si
+        devuelve True la búsqueda se abandona y se devuelve None.
+        """
+        with self._bloqueo:
+            return self._buscar(normalizar(texto), limite, dentro, cancelado)
+
+    def _buscar(self, texto, limite, dentro, cancelado):
+        palabras = texto.split()
+        if not palabras:
+            total = len(self)
+            return list(range(total if limite is None else min(limite, total)))
+        tokens = [palabra.encode('utf-8') for palabra in palabras]
+        frase = b' '.join(tokens) if len(tokens) > 1 else None
+
+        largas = [palabra for palabra in palabras if len(palabra) >= TAMANO_NGRAMA]
+        una_con_limite = len(tokens) == 1 and limite is not None and dentro is None
+        prefijos = None
+        if una_con_limite and not self._codes_distintos:
+            # Sin code_128 propios, los prefijos de ID son los niveles
+            # EXACTO_ID y PREFIJO_ID: si llenan el límite no hace falta más
+            prefijos = self._prefijo_id(tokens[0])
+            if len(prefijos) >= limite:
+                largo = len(tokens[0])
+                return heapq.nsmallest(limite, prefijos, key=lambda i: (self._largo_id[i] != largo, i))
+
+        if una_con_limite and largas:
+            encontrados = self._primeros(palabras[0], tokens[0], limite, prefijos, cancelado)
+            if encontrados is None:
+                return None
+        else:
+            if largas:
+                candidatos = min((self._candidatos(palabra) for palabra in largas), key=len)
+                if dentro is not None and len(dentro) < len(candidatos):
+                    candidatos = dentro
+            elif dentro is not None:
+                candidatos = dentro
+            else:
+                candidatos = self._recorrer(max(tokens, key=len))
+            encontrados = self._verificar(candidatos, tokens, frase, cancelado)
+            if encontrados is None:
+                return None
+
+        faltantes = (RESULTADOS_APROXIMADOS if limite is None else limite) - len(encontrados)
+        # Si la consulta es el comienzo de un ID existente no es un error de tipeo
+        if faltantes > 0 and len(encontrados) < POCOS_RESULTADOS and not (
+                len(tokens) == 1 and self._es_prefijo_id(tokens[0])):
+            aproximados = self._aproximados(
+                palabras, tokens, frase, {indice for _, indice in encontrados}, cancelado)
+            if aproximados is None:
+                return None
+            encontrados += heapq.nsmallest(faltantes, aproximados)
+
+        if limite is not None:
+            encontrados = heapq.nsmallest(limite, encontrados)
+        else:
+            encontrados.sort()
+        return [indice for _, indice in encontrados]
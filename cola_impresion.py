@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""Cola de impresión con conexiones persistentes a impresoras ZPL."""
+import itertools
+import queue
+import select
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import metricas
+
+# Estados de un trabajo de impresión
+PENDIENTE = 'pendiente'
+ENVIANDO = 'enviando'
+REINTENTANDO = 'reintentando'
+COMPLETADO = 'completado'
+ERROR = 'error'
+
+REINTENTOS = 3
+ESPERA_REINTENTO = 1.0  # Segundos antes del primer reintento; se duplica en cada uno
+INACTIVIDAD_MAXIMA = 30.0  # Segundos sin trabajos tras los que se libera la conexión
+TIEMPO_ESPERA = 10.0  # Segundos máximos para conectar, enviar o recibir la confirmación
+CONFIRMACION_BYTES = 256 * 1024  # Bytes enviados tras los que se pide confirmación a la impresora
+CONSULTA_ESTADO = b'~HS'  # Estado del host de las Zebra: responde tres líneas <STX>...<ETX>
+LINEAS_ESTADO = 3
+
+_ids = itertools.count(1)
+
+# Copia del estado de un trabajo en un momento dado (ver TrabajoImpresion.instantanea)
+EstadoTrabajo = namedtuple(
+    'EstadoTrabajo', 'id descripcion impresora estado enviadas partes etiquetas etiquetas_enviadas intentos error'
+)
+
+
+class TrabajoImpresion:
+    """Etiquetas ZPL para enviar a una impresora.
+
+    ``partes`` es una lista de bloques de bytes que se envían en orden;
+    ``enviadas`` cuenta los bloques ya escritos en la conexión y
+    ``etiquetas_enviadas`` las etiquetas de esos bloques. ``conteos``
+    indica cuántas etiquetas imprime cada bloque (por omisión, una por
+    bloque).
+
+    Con ``confirmar`` (por omisión) se pide a la impresora su estado (~HS)
+    cada CONFIRMACION_BYTES y al final: la respuesta llega después de que
+    la impresora recibió lo anterior, y recién entonces esos bloques pasan
+    a ``confirmadas`` y ``etiquetas_confirmadas``. Si la conexión falla, el
+    reintento sigue desde el primer bloque sin confirmar: lo que quedó en
+    vuelo puede imprimirse dos veces en lugar de saltearse. Sin
+    ``confirmar``, o si la impresora nunca respondió ~HS (ver
+    ConexionImpresora.confirmar), un bloque cuenta como confirmado apenas
+    se escribe en la conexión.
+
+    Con ``reintentar_rechazo`` en False una conexión rechazada termina el
+    trabajo en error sin reintentos, para que quien lo envió pueda pasarlo
+    a otra impresora de inmediato. ``solicitud`` guarda los datos del pedido
+    del que forma parte el trabajo (ver PlanificadorImpresion).
+
+    Con ``formato`` en True, partes[0] guarda en la impresora un formato
+    (^DF) que usan las demás partes: se envía en la misma escritura que
+    partes[1] y, si el trabajo sigue en una conexión nueva, se vuelve a
+    enviar antes, por si la impresora se reinició.
+    """
+
+    def __init__(self, impresora, partes, descripcion='', conteos=None, reintentar_rechazo=True, solicitud=None,
+                 formato=False, confirmar=True):
+        self.id = next(_ids)
+        self.impresora = impresora  # (host, puerto)
+        self.partes = partes
+        self.descripcion = descripcion
+        self.conteos = [1] * len(partes) if conteos is None else conteos
+        self.etiquetas = sum(self.conteos)
+        self.reintentar_rechazo = reintentar_rechazo
+        self.solicitud = solicitud
+        self.formato = formato
+        self.confirmar = confirmar
+        self.estado = PENDIENTE
+        self.enviadas = 0
+        self.etiquetas_enviadas = 0
+        self.confirmadas = 0
+        self.etiquetas_confirmadas = 0
+        self.intentos = 0
+        self.error = None
+        self.creado = time.perf_counter()
+        self.terminado = threading.Event()
+
+    def esperar(self, tiempo=None):
+        """Espera a que el trabajo se complete o falle"""
+        return self.terminado.wait(tiempo)
+
+    def instantanea(self):
+        """EstadoTrabajo con el estado actual, que no cambia aunque el trabajo avance"""
+        return EstadoTrabajo(
+            self.id, self.descripcion, self.impresora, self.estado, self.enviadas, len(self.partes),
+            self.etiquetas, self.etiquetas_enviadas, self.intentos, self.error,
+        )
+
+    def __repr__(self):
+        return f"TrabajoImpresion({self.id}, {self.descripcion!r}, {self.estado}, {self.enviadas}/{len(self.partes)})"
+
+
+class ConexionImpresora:
+    """Conexión TCP reutilizable con una impresora (puerto 9100)"""
+
+    def __init__(self, host, puerto, tiempo_espera=TIEMPO_ESPERA):
+        self.host = host
+        self.puerto = puerto
+        self.tiempo_espera = tiempo_espera
+        self.responde_estado = None  # Si la impresora responde ~HS; None hasta saberlo
+        self._sock = None
+
+    def _conectar(self):
+        with metricas.medir('impresora.conexion'):
+            sock = socket.create_connection((self.host, self.puerto), timeout=self.tiempo_espera)
+        metricas.contar('impresora.conexiones')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+
+    def _sigue_abierta(self):
+        # La impresora pudo cerrar la conexión mientras estaba inactiva: si el
+        # socket es legible sin datos pendientes, el otro extremo la cerró
+        try:
+            legibles, _, _ = select.select([self._sock], [], [], 0)
+            if legibles and not self._sock.recv(1, socket.MSG_PEEK):
+                return False
+        except OSError:
+            return False
+        return True
+
+    def enviar(self, datos, inicio=b'', reconectar=True):
+        """Envía datos, conectando o reconectando cuando haga falta.
+
+        Si se abre una conexión nueva, antes de datos se envía inicio. Con
+        ``reconectar`` en False una conexión cerrada por la impresora lanza
+        ConnectionResetError en lugar de abrirse otra.
+        """
+        if self._sock is not None and not self._sigue_abierta():
+            self.cerrar()
+            if not reconectar:
+                raise ConnectionResetError("la impresora cerró la conexión")
+        if self._sock is None:
+            self._conectar()
+            datos = inicio + datos
+        try:
+            with metricas.medir('impresora.envio'):
+                self._sock.sendall(datos)
+        except OSError:
+            self.cerrar()
+            raise
+
+    def confirmar(self):
+        """Pide el estado a la impresora (~HS) y espera su respuesta.
+
+        La impresora atiende la consulta después de recibir lo enviado antes
+        por esta conexión, así que la respuesta confirma que lo tiene.
+        Devuelve False si la impresora nunca respondió ~HS y esta vez
+        tampoco responde en ``tiempo_espera``: no admite la consulta y no
+        se le vuelve a pedir. Si ya había respondido, la falta de respuesta
+        es un error de conexión.
+        """
+        respuesta = b''
+        try:
+            with metricas.medir('impresora.confirmacion'):
+                self._sock.sendall(CONSULTA_ESTADO)
+                while respuesta.count(b'\x03') < LINEAS_ESTADO:
+                    datos = self._sock.recv(1024)
+                    if not datos:
+                        raise ConnectionResetError("la impresora cerró la conexión sin responder ~HS")
+                    respuesta += datos
+        except socket.timeout:
+            if self.responde_estado is None and not respuesta:
+                self.responde_estado = False
+                return False
+            self.cerrar()
+            raise
+        except OSError:
+            self.cerrar()
+            raise
+        self.responde_estado = True
+        return True
+
+    def cerrar(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+
+class _Trabajador(threading.Thread):
+    # Hilo que atiende la cola de una impresora con su propia conexión
+
+    def __init__(self, cola_impresion, impresora):
+        super().__init__(name=f'impresora-{impresora[0]}:{impresora[1]}', daemon=True)
+        self.cola_impresion = cola_impresion
+        self.conexion = ConexionImpresora(*impresora, tiempo_espera=cola_impresion.tiempo_espera)
+        self.trabajos = queue.Queue()
+
+    def run(self):
+        while True:
+            try:
+                trabajo = self.trabajos.get(timeout=self.cola_impresion.inactividad_maxima)
+            except queue.Empty:
+                self.conexion.cerrar()
+                continue
+            if trabajo is None:
+                self.conexion.cerrar()
+                return
+            self.procesar(trabajo)
+
+    def procesar(self, trabajo):
+        cola = self.cola_impresion
+        cola._notificar(trabajo, ENVIANDO)
+        while True:
+            try:
+                sin_confirmar = 0  # Bytes escritos desde la última confirmación
+                while trabajo.enviadas < len(trabajo.partes):
+                    juntas = 1
+                    parte = trabajo.partes[trabajo.enviadas]
+                    if trabajo.formato and not trabajo.enviadas and len(trabajo.partes) > 1:
+                        # El formato (^DF) va en la misma escritura que el primer bloque que lo usa
+                        juntas = 2
+                        parte += trabajo.partes[1]
+                    # En una conexión nueva la impresora pudo perder el formato
+                    inicio = trabajo.partes[0] if trabajo.formato and trabajo.enviadas else b''
+                    # Con bloques sin confirmar no se reconecta: los de la conexión cerrada se repiten
+                    self.conexion.enviar(parte, inicio, reconectar=trabajo.enviadas == trabajo.confirmadas)
+                    metricas.contar('impresora.bytes', len(parte))
+                    trabajo.etiquetas_enviadas += sum(trabajo.conteos[trabajo.enviadas:trabajo.enviadas + juntas])
+                    trabajo.enviadas += juntas
+                    sin_confirmar += len(parte)
+                    confirmar = trabajo.confirmar and self.conexion.responde_estado is not False
+                    if confirmar and (sin_confirmar >= cola.confirmacion_bytes
+                                      or trabajo.enviadas == len(trabajo.partes)):
+                        if not self.conexion.confirmar():
+                            metricas.contar('impresora.sin_confirmacion')
+                            print(f"La impresora {self.conexion.host}:{self.conexion.puerto} no responde ~HS: "
+                                  f"se imprime sin confirmar la recepción")
+                        sin_confirmar = 0
+                    if not confirmar or not sin_confirmar:
+                        self._confirmadas(trabajo)
+                metricas.registrar('impresora.trabajo', time.perf_counter() - trabajo.creado)
+                cola._notificar(trabajo, COMPLETADO)
+                return
+            except OSError as e:
+                # Lo escrito sin confirmar pudo perderse con la conexión: se vuelve a enviar
+                metricas.contar('impresora.repetidas', trabajo.etiquetas_enviadas - trabajo.etiquetas_confirmadas)
+                trabajo.enviadas = trabajo.confirmadas
+                trabajo.etiquetas_enviadas = trabajo.etiquetas_confirmadas
+                trabajo.intentos += 1
+                trabajo.error = e
+                rechazada = isinstance(e, ConnectionRefusedError) and not trabajo.reintentar_rechazo
+                if rechazada or trabajo.intentos > cola.reintentos:
+                    metricas.contar('impresora.fallos')
+                    cola._notificar(trabajo, ERROR)
+                    return
+                metricas.contar('impresora.reintentos')
+                cola._notificar(trabajo, REINTENTANDO)
+                time.sleep(cola.espera_reintento * 2 ** (trabajo.intentos - 1))
+
+    def _confirmadas(self, trabajo):
+        cola = self.cola_impresion
+        metricas.contar('impresora.etiquetas', trabajo.etiquetas_enviadas - trabajo.etiquetas_confirmadas)
+        trabajo.confirmadas = trabajo.enviadas
+        trabajo.etiquetas_confirmadas = trabajo.etiquetas_enviadas
+        if cola.al_confirmar is not None:
+            cola.al_confirmar(trabajo)
+
+
+class ColaImpresion:
+    """Envía trabajos de impresión en segundo plano.
+
+    Cada impresora tiene un hilo con su cola de trabajos y una conexión
+    persistente que se reabre si la impresora la cierra y se libera tras
+    ``inactividad_maxima`` segundos sin trabajos. Los errores de red se
+    reintentan con espera creciente. ``al_cambiar_estado`` se llama desde
+    el hilo de la impresora con el trabajo cada vez que cambia su estado, y
+    ``al_confirmar`` cada vez que la impresora confirma haber recibido más
+    de sus bloques (ver TrabajoImpresion).
+    """
+
+    def __init__(self, al_cambiar_estado=None, reintentos=REINTENTOS,
+                 espera_reintento=ESPERA_REINTENTO, inactividad_maxima=INACTIVIDAD_MAXIMA,
+                 tiempo_espera=TIEMPO_ESPERA, al_confirmar=None, confirmacion_bytes=CONFIRMACION_BYTES):
+        self.al_cambiar_estado = al_cambiar_estado
+        self.al_confirmar = al_confirmar
+        self.confirmacion_bytes = confirmacion_bytes
+        self.reintentos = reintentos
+        self.espera_reintento = espera_reintento
+        self.inactividad_maxima = inactividad_maxima
+        self.tiempo_espera = tiempo_espera
+        self._trabajadores = {}
+        self._bloqueo = threading.Lock()
+
+    def enviar(self, trabajo):
+        """Encola un trabajo y lo devuelve sin esperar a que se imprima"""
+        with self._bloqueo:
+            trabajador = self._trabajadores.get(trabajo.impresora)
+            if trabajador is None:
+                trabajador = self._trabajadores[trabajo.impresora] = _Trabajador(self, trabajo.impresora)
+                trabajador.start()
+        self._notificar(trabajo, PENDIENTE)
+        trabajador.trabajos.put(trabajo)
+        return trabajo
+
+    def detener(self, tiempo=None):
+        """Termina los hilos después de enviar los trabajos ya encolados"""
+        with self._bloqueo:
+            trabajadores = list(self._trabajadores.values())
+            self._trabajadores.clear()
+        for trabajador in trabajadores:
+            trabajador.trabajos.put(None)
+        for trabajador in trabajadores:
+            trabajador.join(tiempo)
+
+    def _notificar(self, trabajo, estado):
+        trabajo.estado = estado
+        if self.al_cambiar_estado is not None:
+            try:
+                self.al_cambiar_estado(trabajo)
+            except Exception as e:
+                print(f"Error al notificar el estado del trabajo {trabajo.id}: {str(e)}")
+        if estado in (COMPLETADO, ERROR):
+            trabajo.terminado.set()
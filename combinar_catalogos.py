@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Combina varios catálogos de productos (por ejemplo, uno por depósito) en uno.
+
+Uso:
+    python combinar_catalogos.py deposito1.xlsx deposito2.csv --salida productos.csv
+    python combinar_catalogos.py deposito*.csv --salida productos.cat --politica ultimo
+
+Los archivos se leen en paralelo, uno por proceso; de los Excel se lee
+cada hoja por separado con las columnas del transformador. Los CSV pueden
+tener sus columnas en cualquier orden y con nombres alternativos (ver
+COLUMNAS_PRODUCTO). Los productos se identifican por id_producto sin
+distinguir mayúsculas ni acentos; la política indica qué hacer cuando un
+mismo producto aparece con datos distintos:
+
+    primero    se conserva el primero, en el orden de los archivos
+    ultimo     se conserva el último
+    completar  se conserva el primero, completando sus campos vacíos
+    error      no se escribe la salida si hay conflictos
+
+Una salida con extensión .cat se escribe en el formato binario de la caché
+de catálogos, que la aplicación abre sin volver a interpretarlo.
+"""
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from archivos import escribir_atomico
+from cache_catalogo import EXTENSION, es_excel
+from catalogo import COLUMNAS, Catalogo, normalizar
+
+POLITICAS = ('primero', 'ultimo', 'completar', 'error')
+CONFLICTOS_MOSTRADOS = 20  # Conflictos que se listan en la consola
+
+# Encabezados (normalizados) que se aceptan para cada columna de un CSV
+COLUMNAS_PRODUCTO = {
+    'id_producto': ('id_producto', 'id', 'producto', 'codigo', 'referencia', 'referencia interna', 'default_code'),
+    'code_128': ('code_128', 'code128', 'codigo de barras', 'codigo_barras', 'barcode'),
+    'nombre': ('nombre', 'name', 'descripcion'),
+}
+
+
+def _columnas(encabezados, ruta):
+    # Relaciona cada columna del producto con su posición en el CSV
+    normalizados = [normalizar(encabezado.strip()) for encabezado in encabezados]
+    posiciones = {}
+    for columna, alias in COLUMNAS_PRODUCTO.items():
+        for i, encabezado in enumerate(normalizados):
+            if encabezado in alias:
+                posiciones[columna] = i
+                break
+    if 'id_producto' not in posiciones:
+        raise ValueError(f"{ruta}: falta la columna id_producto")
+    return posiciones
+
+
+def fuentes(rutas):
+    """Unidades de lectura (ruta, hoja): una por CSV y una por hoja de cada Excel"""
+    resultado = []
+    for ruta in rutas:
+        if es_excel(ruta):
+            from openpyxl import load_workbook
+
+            libro = load_workbook(ruta, read_only=True)
+            try:
+                resultado.extend((ruta, hoja) for hoja in libro.sheetnames)
+            finally:
+                libro.close()
+        else:
+            resultado.append((ruta, None))
+    return resultado
+
+
+def _nombre_fuente(fuente):
+    ruta, hoja = fuente
+    return os.path.basename(ruta) if hoja is None else f"{os.path.basename(ruta)}[{hoja}]"
+
+
+def leer_fuente(fuente):
+    """Lee una fuente como lista de tuplas (id_producto, code_128, nombre).
+
+    Corre en los procesos de lectura: se devuelven tuplas y no
+    diccionarios porque se transfieren más rápido entre procesos. Un
+    code_128 vacío toma el valor de id_producto.
+    """
+    ruta, hoja = fuente
+    if hoja is not None:
+        from transformador_hojas_bd import filas_excel
+
+        return [(fila['id_producto'].strip(), fila['code_128'].strip(), fila['nombre'].strip())
+                for fila in filas_excel(ruta, hoja=hoja)]
+
+    productos = []
+    with open(ruta, 'r', encoding='utf-8-sig', newline='') as archivo:
+        lector = csv.reader(archivo)
+        posiciones = _columnas(next(lector, []), ruta)
+        # Las columnas que falten se leen de una posición que nunca existe
+        i_id, i_code, i_nombre = (posiciones.get(columna, sys.maxsize) for columna in COLUMNAS)
+        for fila in lector:
+            largo = len(fila)
+            id_producto = fila[i_id].strip() if i_id < largo else ''
+            code_128 = fila[i_code].strip() if i_code < largo else ''
+            nombre = fila[i_nombre].strip() if i_nombre < largo else ''
+            productos.append((id_producto, code_128 or id_producto, nombre))
+    return productos
+
+
+def _combinar(lista, lecturas, politica):
+    productos = {}
+    origen = {}
+    conflictos = []
+    leidas = 0
+    for n, filas in enumerate(lecturas):
+        leidas += len(filas)
+        for fila in filas:
+            if not fila[0]:
+                continue
+            clave = normalizar(fila[0])
+            anterior = productos.get(clave)
+            if anterior is None:
+                productos[clave] = fila
+                origen[clave] = n
+            elif anterior != fila:
+                conflictos.append((fila[0], _nombre_fuente(lista[origen[clave]]), _nombre_fuente(lista[n])))
+                if politica == 'ultimo':
+                    productos[clave] = fila
+                    origen[clave] = n
+                elif politica == 'completar':
+                    productos[clave] = tuple(actual or nuevo for actual, nuevo in zip(anterior, fila))
+    return list(productos.values()), leidas, conflictos
+
+
+def combinar(rutas, politica='primero', procesos=None):
+    """Lee y combina los productos de varios archivos CSV o Excel.
+
+    Devuelve (productos, leidas, conflictos): productos es una lista de
+    tuplas (id_producto, code_128, nombre) sin repetidos, en el orden en
+    que aparece cada uno por primera vez; leidas es la cantidad de filas
+    leídas y conflictos una lista de (id_producto, fuente, otra fuente)
+    por cada fila repetida con datos distintos. ``procesos`` limita los
+    procesos de lectura (por omisión, uno por núcleo); con 1 no se crean
+    procesos.
+    """
+    if politica not in POLITICAS:
+        raise ValueError(f"Política de conflictos desconocida: {politica}")
+    lista = fuentes(rutas)
+    if procesos == 1 or len(lista) <= 1:
+        return _combinar(lista, map(leer_fuente, lista), politica)
+    # map entrega las lecturas en orden: se combinan mientras llegan las demás
+    with ProcessPoolExecutor(max_workers=procesos) as procesos_lectura:
+        return _combinar(lista, procesos_lectura.map(leer_fuente, lista), politica)
+
+
+def escribir(productos, destino):
+    """Escribe los productos en un CSV o, si destino termina en .cat, en formato binario.
+
+    destino se reemplaza de una vez: si la escritura falla, el catálogo
+    anterior queda como estaba.
+    """
+    if destino.lower().endswith(EXTENSION):
+        catalogo = Catalogo(dict(zip(COLUMNAS, producto)) for producto in productos)
+        escribir_atomico(destino, catalogo.escribir)
+        return
+
+    def escribir_csv(archivo):
+        escritor = csv.writer(archivo)
+        escritor.writerow(COLUMNAS)
+        escritor.writerows(productos)
+
+    escribir_atomico(destino, escribir_csv, 'w', encoding='utf-8', newline='')
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Combina catálogos de productos de varios archivos.')
+    parser.add_argument('archivos', nargs='+', help='Archivos CSV o Excel de productos')
+    parser.add_argument('--salida', required=True, help='CSV a escribir, o archivo .cat con el formato binario de la aplicación')
+    parser.add_argument('--politica', choices=POLITICAS, default='primero',
+                        help='Qué hacer con un producto repetido con datos distintos (por omisión, primero)')
+    parser.add_argument('--procesos', type=int, help='Procesos de lectura (por omisión, uno por núcleo)')
+    args = parser.parse_args(argumentos)
+
+    try:
+        productos, leidas, conflictos = combinar(args.archivos, args.politica, args.procesos)
+    except (OSError, ValueError) as e:
+        print(f"Error al leer los catálogos: {str(e)}")
+        return 1
+
+    for id_producto, anterior, nueva in conflictos[:CONFLICTOS_MOSTRADOS]:
+        print(f"Conflicto: '{id_producto}' tiene datos distintos en {anterior} y {nueva}")
+    if len(conflictos) > CONFLICTOS_MOSTRADOS:
+        print(f"... y {len(conflictos) - CONFLICTOS_MOSTRADOS} conflictos más")
+    print(f"{len(productos)} productos a partir de {leidas} filas, {len(conflictos)} conflictos.")
+    if conflictos and args.politica == 'error':
+        print("No se escribió la salida por los conflictos.")
+        return 1
+
+    try:
+        escribir(productos, args.salida)
+    except OSError as e:
+        print(f"No se pudo escribir {args.salida}: {str(e)}")
+        return 1
+    print(f"Catálogo combinado escrito en {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
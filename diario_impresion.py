@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""Diario de los pedidos de impresión, para reanudarlos o reimprimirlos.
+
+Uso:
+    python diario_impresion.py listar
+    python diario_impresion.py reanudar [pedido ...]
+    python diario_impresion.py reimprimir 12 "3-5, 40"
+
+El diario es un archivo de sólo agregado con un registro JSON por línea:
+cada pedido (producto, OP, SGC, cantidad y etiquetas a imprimir), las
+etiquetas de cada tramo que la impresora confirmó haber recibido (ver
+cola_impresion.TrabajoImpresion) y el fin del pedido. Los pedidos sin
+fin quedaron interrumpidos (la aplicación se cerró, se cortó la conexión
+o la impresora no respondió) y se reanudan desde la primera etiqueta sin
+confirmar, que pudo haberse impreso: ante la duda se repite.
+
+El registro de un pedido se escribe y sincroniza con el disco antes de
+enviar la primera etiqueta; el avance se acumula en memoria y un hilo lo
+escribe y sincroniza cada ``intervalo`` segundos, con una línea por
+tramo, así que su costo no depende de las etiquetas por minuto. Si el
+proceso termina de golpe se pierde a lo sumo el último intervalo de
+avance, y esas etiquetas se vuelven a imprimir al reanudar.
+"""
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+from archivos import escribir_atomico
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+ARCHIVO_DIARIO = os.path.join(os.path.expanduser('~'), '.sistema-etiquetas', 'diario_impresion.log')
+INTERVALO = 0.5  # Segundos entre escrituras del avance
+TAMANO_COMPACTAR = 4 * 2**20  # Bytes a partir de los que el diario se compacta al abrirlo
+PEDIDOS_TERMINADOS = 500  # Pedidos terminados que se conservan al compactar, para reimprimirlos
+DATOS_PEDIDO = ('nombre', 'id_producto', 'op', 'sgc', 'cantidad', 'tipo')
+
+
+def leer_rangos(texto, cantidad):
+    """Convierte "3-5, 9" en [(3, 5), (9, 9)]; los números van de 1 a cantidad"""
+    rangos = []
+    for parte in texto.replace(';', ',').split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        desde, _, hasta = parte.partition('-')
+        try:
+            desde = int(desde)
+            hasta = int(hasta) if hasta.strip() else desde
+        except ValueError:
+            raise ValueError(f"Rango de etiquetas no válido: '{parte}'") from None
+        if not 1 <= desde <= hasta <= cantidad:
+            raise ValueError(f"Rango de etiquetas fuera de 1-{cantidad}: '{parte}'")
+        rangos.append((desde, hasta))
+    if not rangos:
+        raise ValueError("No se indicaron etiquetas")
+    return unir(rangos)
+
+
+def texto_rangos(rangos):
+    """Convierte [(3, 5), (9, 9)] en "3-5, 9" """
+    return ', '.join(str(desde) if desde == hasta else f"{desde}-{hasta}" for desde, hasta in rangos)
+
+
+def unir(rangos):
+    """Ordena los rangos (desde, hasta) y junta los que se tocan o se solapan"""
+    unidos = []
+    for desde, hasta in sorted(rangos):
+        if unidos and desde <= unidos[-1][1] + 1:
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], hasta))
+        else:
+            unidos.append((desde, hasta))
+    return unidos
+
+
+def restar(rangos, quitados):
+    """Las etiquetas de rangos que no están en quitados, como rangos"""
+    resultado = []
+    quitados = unir(quitados)
+    for desde, hasta in unir(rangos):
+        for inicio, fin in quitados:
+            if fin < desde or inicio > hasta:
+                continue
+            if inicio > desde:
+                resultado.append((desde, inicio - 1))
+            desde = fin + 1
+            if desde > hasta:
+                break
+        if desde <= hasta:
+            resultado.append((desde, hasta))
+    return resultado
+
+
+class DiarioEnUso(OSError):
+    """Otro proceso tiene abierto el mismo diario"""
+
+
+def _bloquear(archivo):
+    # Bloqueo exclusivo sobre un archivo aparte, porque el diario se
+    # reemplaza al compactarlo. Lo libera el sistema si el proceso termina
+    descriptor = os.open(archivo + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.name == 'nt':
+            msvcrt.locking(descriptor, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(descriptor)
+        raise DiarioEnUso(
+            f"El diario {archivo} está abierto en otro proceso (la aplicación, el servicio o "
+            f"diario_impresion.py); ciérrelo o use otro archivo con --diario") from None
+    return descriptor
+
+
+def _desbloquear(descriptor):
+    try:
+        if os.name == 'nt':
+            msvcrt.locking(descriptor, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(descriptor)
+
+
+class DiarioImpresion:
+    """Diario de pedidos de impresión guardado en ``archivo``.
+
+    Lo usa un solo proceso a la vez: al abrirlo se toma un bloqueo
+    exclusivo (``archivo``.lock) y, si otro proceso lo tiene, se lanza
+    DiarioEnUso. Así dos procesos no reparten los mismos números de
+    pedido ni reanudan dos veces el mismo pedido. Al abrirlo se leen los
+    pedidos anteriores; los que no terminaron se obtienen con
+    interrumpidos().
+    """
+
+    def __init__(self, archivo=ARCHIVO_DIARIO, intervalo=INTERVALO):
+        self.archivo = archivo
+        self.intervalo = intervalo
+        self._pedidos = {}
+        self._sesion = set()  # Pedidos creados o reanudados por este proceso
+        self._avance = {}  # (pedido, desde) -> hasta, aún sin escribir
+        self._terminados = []  # Pedidos terminados, aún sin escribir
+        self._bloqueo = threading.Lock()
+        self._escritura = threading.Lock()
+        self._hay_avance = threading.Condition(self._bloqueo)
+        self._cerrado = False
+
+        os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+        self._bloqueo_archivo = _bloquear(archivo)
+        try:
+            self._leer()
+            if os.path.exists(archivo) and os.path.getsize(archivo) > TAMANO_COMPACTAR:
+                self._compactar()
+            self._salida = open(archivo, 'ab')
+        except BaseException:
+            _desbloquear(self._bloqueo_archivo)
+            raise
+        self._siguiente = max(self._pedidos, default=0) + 1
+        self._hilo = threading.Thread(target=self._escribir_periodicamente, name='diario-impresion', daemon=True)
+        self._hilo.start()
+        # Si el programa termina sin cerrar el diario, el avance igual se escribe
+        atexit.register(self.sincronizar)
+
+    def _leer(self):
+        try:
+            archivo = open(self.archivo, 'rb')
+        except FileNotFoundError:
+            return
+        with archivo:
+            for linea in archivo:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    continue  # Línea a medio escribir al cortarse la luz
+                self._aplicar(registro)
+
+    def _aplicar(self, registro):
+        numero = registro['pedido']
+        if registro['registro'] == 'pedido':
+            self._pedidos[numero] = {
+                'datos': registro['datos'],
+                'rangos': [tuple(rango) for rango in registro['rangos']],
+                'hora': registro.get('hora'),
+                'reimpresion_de': registro.get('reimpresion_de'),
+                'enviadas': {},
+                'terminado': False,
+            }
+            return
+        pedido = self._pedidos.get(numero)
+        if pedido is None:
+            return
+        if registro['registro'] == 'enviadas':
+            desde = registro['desde']
+            pedido['enviadas'][desde] = max(pedido['enviadas'].get(desde, 0), registro['hasta'])
+        elif registro['registro'] == 'fin':
+            pedido['terminado'] = True
+
+    def _registros(self, numero, pedido):
+        # Registros que reproducen el estado actual de un pedido
+        registros = [{
+            'registro': 'pedido', 'pedido': numero, 'hora': pedido['hora'], 'datos': pedido['datos'],
+            'rangos': pedido['rangos'], 'reimpresion_de': pedido['reimpresion_de'],
+        }]
+        registros += [
+            {'registro': 'enviadas', 'pedido': numero, 'desde': desde, 'hasta': hasta}
+            for desde, hasta in unir(pedido['enviadas'].items())
+        ]
+        if pedido['terminado']:
+            registros.append({'registro': 'fin', 'pedido': numero})
+        return registros
+
+    def _compactar(self):
+        # Reescribe el diario con los interrumpidos y los últimos terminados
+        terminados = [numero for numero, pedido in self._pedidos.items() if pedido['terminado']]
+        for numero in terminados[:-PEDIDOS_TERMINADOS]:
+            del self._pedidos[numero]
+
+        def escribir(salida):
+            for numero, pedido in self._pedidos.items():
+                for registro in self._registros(numero, pedido):
+                    salida.write(json.dumps(registro, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        escribir_atomico(self.archivo, escribir)
+
+    def _escribir(self, registros):
+        # Agrega los registros y los sincroniza con el disco
+        if not registros:
+            return
+        datos = b''.join(json.dumps(registro, ensure_ascii=False).encode('utf-8') + b'\n' for registro in registros)
+        with self._escritura:
+            self._salida.write(datos)
+            self._salida.flush()
+            os.fsync(self._salida.fileno())
+
+    def _pendientes(self):
+        # Toma el avance acumulado (con self._bloqueo tomado)
+        registros = [
+            {'registro': 'enviadas', 'pedido': numero, 'desde': desde, 'hasta': hasta}
+            for (numero, desde), hasta in self._avance.items()
+        ]
+        registros += [{'registro': 'fin', 'pedido': numero} for numero in self._terminados]
+        self._avance = {}
+        self._terminados = []
+        return registros
+
+    def _escribir_periodicamente(self):
+        while True:
+            with self._hay_avance:
+                self._hay_avance.wait_for(lambda: self._avance or self._terminados or self._cerrado)
+                if self._cerrado:
+                    return
+            time.sleep(self.intervalo)  # Junta el avance de todo el intervalo en una escritura
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Escribe ya el avance acumulado"""
+        with self._bloqueo:
+            registros = self._pendientes()
+        try:
+            self._escribir(registros)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo escribir el diario de impresión: {str(e)}")
+
+    def nuevo_pedido(self, datos, rangos, reimpresion_de=None):
+        """Registra un pedido antes de imprimirlo y devuelve su número.
+
+        datos tiene nombre, id_producto, op, sgc, cantidad y tipo; rangos
+        son las etiquetas (desde, hasta) a imprimir.
+        """
+        with self._bloqueo:
+            numero = self._siguiente
+            self._siguiente += 1
+            pedido = {
+                'datos': {clave: datos[clave] for clave in DATOS_PEDIDO},
+                'rangos': unir(rangos),
+                'hora': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'reimpresion_de': reimpresion_de,
+                'enviadas': {},
+                'terminado': False,
+            }
+            self._pedidos[numero] = pedido
+            self._sesion.add(numero)
+            registro = self._registros(numero, pedido)[0]
+        self._escribir([registro])
+        return numero
+
+    def reanudar(self, numero):
+        """Marca un pedido interrumpido como retomado por este proceso"""
+        with self._bloqueo:
+            self._sesion.add(numero)
+
+    def enviadas(self, numero, desde, hasta):
+        """Anota que la impresora confirmó las etiquetas desde..hasta del pedido.
+
+        desde es el comienzo del tramo: llamadas sucesivas del mismo tramo
+        sólo amplían hasta. Se escribe en la próxima sincronización.
+        """
+        with self._bloqueo:
+            pedido = self._pedidos[numero]
+            if hasta > pedido['enviadas'].get(desde, 0):
+                pedido['enviadas'][desde] = hasta
+                self._avance[(numero, desde)] = hasta
+                self._hay_avance.notify()
+
+    def terminar(self, numero):
+        """Anota que se entregaron todas las etiquetas del pedido"""
+        with self._bloqueo:
+            self._pedidos[numero]['terminado'] = True
+            self._terminados.append(numero)
+            self._hay_avance.notify()
+
+    def pedido(self, numero):
+        """Datos del pedido (nombre, id_producto, op, sgc, cantidad, tipo), o None"""
+        with self._bloqueo:
+            pedido = self._pedidos.get(numero)
+            return None if pedido is None else dict(pedido['datos'])
+
+    def faltantes(self, numero):
+        """Rangos del pedido que todavía no se entregaron"""
+        with self._bloqueo:
+            pedido = self._pedidos[numero]
+            return restar(pedido['rangos'], pedido['enviadas'].items())
+
+    def interrumpidos(self):
+        """Pedidos de ejecuciones anteriores sin terminar, como (número, datos, faltantes)"""
+        with self._bloqueo:
+            numeros = [
+                numero for numero, pedido in self._pedidos.items()
+                if not pedido['terminado'] and numero not in self._sesion
+            ]
+        return [(numero, self.pedido(numero), self.faltantes(numero)) for numero in numeros]
+
+    def recientes(self, cantidad=20):
+        """Últimos pedidos como (número, datos, hora, terminado, faltantes)"""
+        with self._bloqueo:
+            numeros = list(self._pedidos)[-cantidad:]
+            resumen = [(numero, dict(self._pedidos[numero]['datos']), self._pedidos[numero]['hora'],
+                        self._pedidos[numero]['terminado']) for numero in numeros]
+        return [(numero, datos, hora, terminado, self.faltantes(numero)) for numero, datos, hora, terminado in resumen]
+
+    def cerrar(self):
+        """Escribe el avance pendiente y cierra el archivo"""
+        with self._bloqueo:
+            self._cerrado = True
+            self._hay_avance.notify()
+        self._hilo.join()
+        atexit.unregister(self.sincronizar)
+        self.sincronizar()
+        with self._escritura:
+            self._salida.close()
+        _desbloquear(self._bloqueo_archivo)
+
+
+def reanudar(diario, planificador, numero):
+    """Imprime las etiquetas que le faltan a un pedido interrumpido.
+
+    Devuelve los trabajos creados (ninguno si ya no le faltaba nada).
+    """
+    datos = diario.pedido(numero)
+    if datos is None:
+        raise ValueError(f"No hay un pedido {numero} en el diario")
+    faltantes = diario.faltantes(numero)
+    diario.reanudar(numero)
+    if not faltantes:
+        diario.terminar(numero)
+        return []
+    return planificador.imprimir(
+        datos['nombre'], datos['id_producto'], datos['op'], datos['sgc'], datos['cantidad'], datos['tipo'],
+        rangos=faltantes, pedido=numero,
+    )
+
+
+def reimprimir(diario, planificador, numero, rangos):
+    """Vuelve a imprimir etiquetas de un pedido anterior como un pedido nuevo"""
+    datos = diario.pedido(numero)
+    if datos is None:
+        raise ValueError(f"No hay un pedido {numero} en el diario")
+    return planificador.imprimir(
+        datos['nombre'], datos['id_producto'], datos['op'], datos['sgc'], datos['cantidad'], datos['tipo'],
+        rangos=rangos, reimpresion_de=numero,
+    )
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Consulta el diario de impresión, reanuda pedidos o reimprime etiquetas.')
+    parser.add_argument('--diario', default=ARCHIVO_DIARIO, help=f'Archivo del diario (por omisión, {ARCHIVO_DIARIO})')
+    acciones = parser.add_subparsers(dest='accion', required=True)
+    listar = acciones.add_parser('listar', help='Muestra los últimos pedidos y lo que les falta')
+    listar.add_argument('--cantidad', type=int, default=20, help='Pedidos a mostrar (por omisión, 20)')
+    reanudar_parser = acciones.add_parser('reanudar', help='Imprime lo que falta de los pedidos interrumpidos')
+    reanudar_parser.add_argument('pedidos', nargs='*', type=int, help='Números de pedido (por omisión, todos los interrumpidos)')
+    reimprimir_parser = acciones.add_parser('reimprimir', help='Vuelve a imprimir etiquetas de un pedido')
+    reimprimir_parser.add_argument('pedido', type=int, help='Número de pedido')
+    reimprimir_parser.add_argument('etiquetas', help='Etiquetas a reimprimir, por ejemplo "3-5, 40"')
+    args = parser.parse_args(argumentos)
+
+    try:
+        diario = DiarioImpresion(args.diario)
+    except OSError as e:
+        print(f"No se pudo abrir el diario: {str(e)}")
+        return 1
+    try:
+        if args.accion == 'listar':
+            for numero, datos, hora, terminado, faltantes in diario.recientes(args.cantidad):
+                estado = 'completo' if terminado else f"faltan {texto_rangos(faltantes) or 'ninguna'}"
+                print(f"{numero:>6} {hora} {datos['id_producto']} OP {datos['op']} x{datos['cantidad']}: {estado}")
+            return 0
+        return _imprimir(diario, args)
+    finally:
+        diario.cerrar()
+
+
+def _imprimir(diario, args):
+    from cola_impresion import ColaImpresion
+    from impresoras import PlanificadorImpresion, RegistroImpresoras
+    from imprimir_ordenes import mostrar_estado
+
+    cola = ColaImpresion(al_cambiar_estado=mostrar_estado)
+    planificador = PlanificadorImpresion(cola, RegistroImpresoras.desde_config(), diario=diario)
+    try:
+        if args.accion == 'reanudar':
+            numeros = args.pedidos or [numero for numero, _, _ in diario.interrumpidos()]
+            if not numeros:
+                print("No hay pedidos interrumpidos.")
+            for numero in numeros:
+                trabajos = reanudar(diario, planificador, numero)
+                print(f"Pedido {numero}: {sum(trabajo.etiquetas for trabajo in trabajos)} etiquetas por reanudar")
+        else:
+            datos = diario.pedido(args.pedido)
+            if datos is None:
+                print(f"No hay un pedido {args.pedido} en el diario")
+                return 1
+            reimprimir(diario, planificador, args.pedido, leer_rangos(args.etiquetas, datos['cantidad']))
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+    finally:
+        planificador.esperar()
+        cola.detener()
+    return 1 if planificador.fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
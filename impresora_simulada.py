@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Impresora ZPL simulada para pruebas y mediciones sin una Zebra real.
+
+Uso:
+    python impresora_simulada.py
+    python impresora_simulada.py --puerto 9101 --ancho-banda 100 --latencia 20 --fallos 0.05
+
+Escucha en el puerto RAW (9100 por omisión), recibe ZPL de cualquier
+cantidad de conexiones y cuenta las etiquetas de cada bloque ^XA...^XZ:
+los bloques con ^DF sólo guardan un formato y no imprimen, y ^PQ indica
+cuántas copias imprime un bloque. Responde la consulta de estado ~HS
+como una Zebra, después de contar lo recibido antes de ella (salvo con
+--sin-estado, como una impresora que no la admite). Se pueden
+simular una red o impresora lenta (ancho de banda), una demora al empezar
+cada conexión y cortes de conexión al azar; un bloque cortado a la mitad
+no se imprime.
+"""
+import argparse
+import random
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+
+PUERTO = 9100
+TAMANO_LECTURA = 65536
+
+_CANTIDAD = re.compile(rb'\^PQ(\d+)')
+# Respuesta a ~HS: tres líneas <STX>...<ETX>, sin papel agotado, pausa ni cabezal abierto
+ESTADO = (b'\x02030,0,0,1245,000,0,0,0,000,0,0,0\x03\r\n'
+          b'\x02001,0,0,0,1,2,6,0,00000000,1,000\x03\r\n'
+          b'\x021234,0\x03\r\n')
+
+
+class ContadorZPL:
+    """Separa los bloques ^XA...^XZ de un flujo de bytes a medida que llegan"""
+
+    def __init__(self):
+        self._pendiente = b''
+        self._final = b''
+
+    def alimentar(self, datos):
+        """Devuelve (etiquetas, formatos, consultas ~HS) de lo completado con datos"""
+        # ~HS se atiende apenas llega; puede venir partido entre dos lecturas
+        consultas = (self._final + datos).count(b'~HS')
+        self._final = (self._final + datos)[-2:]
+        datos = self._pendiente + datos
+        fin = datos.rfind(b'^XZ')
+        if fin < 0:
+            self._pendiente = datos
+            return 0, 0, consultas
+        fin += 3
+        self._pendiente = datos[fin:]
+        etiquetas = 0
+        formatos = 0
+        for bloque in datos[:fin].split(b'^XZ')[:-1]:
+            if b'^XA' not in bloque:
+                continue
+            if b'^DF' in bloque:
+                formatos += 1
+                continue
+            cantidad = _CANTIDAD.search(bloque)
+            etiquetas += int(cantidad.group(1)) if cantidad else 1
+        return etiquetas, formatos, consultas
+
+
+class ImpresoraSimulada:
+    """Servidor TCP que recibe ZPL como una impresora de red.
+
+    ``ancho_banda`` limita los bytes por segundo que lee cada conexión (None
+    sin límite), ``latencia`` son los segundos que espera cada conexión
+    nueva antes de empezar a leer y ``fallos`` la probabilidad de que una
+    conexión se corte (con RST) después de una cantidad de bytes al azar.
+    Con ``estado`` en False no responde ~HS. Los contadores se pueden leer
+    en cualquier momento; esperar() bloquea hasta que se imprima una
+    cantidad de etiquetas.
+    """
+
+    def __init__(self, host='127.0.0.1', puerto=PUERTO, ancho_banda=None, latencia=0.0, fallos=0.0,
+                 semilla=None, al_imprimir=None, estado=True):
+        self.ancho_banda = ancho_banda
+        self.latencia = latencia
+        self.fallos = fallos
+        self.estado = estado
+        self.al_imprimir = al_imprimir  # Se llama con (etiquetas, formatos) de cada lectura
+        self._azar = random.Random(semilla)
+        self._condicion = threading.Condition()
+        self.reiniciar()
+        self._servidor = socket.create_server((host, puerto))
+        self.direccion = self._servidor.getsockname()[:2]
+        self._hilo = None
+
+    def reiniciar(self):
+        """Pone en cero los contadores"""
+        with self._condicion:
+            self.etiquetas = 0
+            self.formatos = 0
+            self.bytes_recibidos = 0
+            self.conexiones = 0
+            self.cortes = 0
+
+    def iniciar(self):
+        """Empieza a aceptar conexiones en un hilo aparte y devuelve la impresora"""
+        self._hilo = threading.Thread(target=self._aceptar, name='impresora-simulada', daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *excepcion):
+        self.detener()
+
+    def esperar(self, etiquetas, tiempo=None):
+        """Espera a que se hayan impreso al menos esas etiquetas; False si vence el tiempo"""
+        with self._condicion:
+            return self._condicion.wait_for(lambda: self.etiquetas >= etiquetas, tiempo)
+
+    def _aceptar(self):
+        while True:
+            try:
+                conexion, _ = self._servidor.accept()
+            except OSError:
+                return  # Servidor cerrado
+            with self._condicion:
+                self.conexiones += 1
+                corte = self._azar.randrange(1, 1 << 20) if self._azar.random() < self.fallos else None
+            threading.Thread(target=self._leer, args=(conexion, corte), daemon=True).start()
+
+    def _leer(self, conexion, corte):
+        contador = ContadorZPL()
+        siguiente = time.monotonic() + self.latencia
+        tamano = TAMANO_LECTURA if self.ancho_banda is None else max(1, min(TAMANO_LECTURA, int(self.ancho_banda) // 100))
+        with conexion:
+            while True:
+                espera = siguiente - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+                try:
+                    datos = conexion.recv(tamano if corte is None else min(tamano, corte))
+                except OSError:
+                    return
+                if not datos:
+                    return
+                if corte is not None:
+                    corte -= len(datos)
+                    if corte <= 0:
+                        # RST en lugar de FIN: el emisor ve un error como con un corte real
+                        conexion.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                        with self._condicion:
+                            self.bytes_recibidos += len(datos)
+                            self.cortes += 1
+                        return
+                if self.ancho_banda is not None:
+                    siguiente = max(siguiente, time.monotonic()) + len(datos) / self.ancho_banda
+                etiquetas, formatos, consultas = contador.alimentar(datos)
+                with self._condicion:
+                    self.bytes_recibidos += len(datos)
+                    self.etiquetas += etiquetas
+                    self.formatos += formatos
+                    if etiquetas:
+                        self._condicion.notify_all()
+                if consultas and self.estado:
+                    try:
+                        conexion.sendall(ESTADO * consultas)
+                    except OSError:
+                        return
+                if self.al_imprimir is not None and (etiquetas or formatos):
+                    self.al_imprimir(etiquetas, formatos)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Impresora ZPL simulada que cuenta las etiquetas recibidas.')
+    parser.add_argument('--host', default='127.0.0.1', help='Dirección en la que escucha (por omisión, 127.0.0.1)')
+    parser.add_argument('--puerto', type=int, default=PUERTO, help=f'Puerto RAW (por omisión, {PUERTO})')
+    parser.add_argument('--ancho-banda', type=float, help='KB por segundo que lee cada conexión (por omisión, sin límite)')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Milisegundos de espera al empezar cada conexión')
+    parser.add_argument('--fallos', type=float, default=0.0, help='Probabilidad (0 a 1) de cortar cada conexión')
+    parser.add_argument('--sin-estado', action='store_true', help='No responde la consulta de estado ~HS')
+    args = parser.parse_args(argumentos)
+
+    try:
+        impresora = ImpresoraSimulada(
+            args.host, args.puerto,
+            ancho_banda=None if args.ancho_banda is None else args.ancho_banda * 1024,
+            latencia=args.latencia / 1000,
+            fallos=args.fallos,
+            estado=not args.sin_estado,
+        )
+    except OSError as e:
+        print(f"No se pudo abrir el puerto {args.puerto}: {str(e)}")
+        return 1
+
+    print(f"Impresora simulada en {args.host}:{impresora.direccion[1]} (Ctrl+C para terminar)")
+    impresora.iniciar()
+    anterior = None
+    try:
+        while True:
+            time.sleep(1)
+            actual = (impresora.etiquetas, impresora.formatos, impresora.conexiones, impresora.cortes)
+            if actual != anterior:
+                print(f"{actual[0]} etiquetas, {actual[1]} formatos, {impresora.bytes_recibidos} bytes, "
+                      f"{actual[2]} conexiones, {actual[3]} cortes")
+                anterior = actual
+    except KeyboardInterrupt:
+        pass
+    finally:
+        impresora.detener()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
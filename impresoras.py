@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""Registro de impresoras y reparto de trabajos de etiquetas entre ellas."""
+import threading
+import time
+
+import zpl
+from cola_impresion import COMPLETADO, ERROR, TrabajoImpresion
+from impresoras_config import IMPRESORAS
+
+TIPO_PRODUCTO = 'producto'
+MINIMO_POR_IMPRESORA = 50  # Etiquetas mínimas para que convenga sumar otra impresora
+ESPERA_NO_DISPONIBLE = 60.0  # Segundos que se evita una impresora después de fallar
+
+
+class Impresora:
+    """Impresora ZPL configurada en impresoras_config.py"""
+
+    def __init__(self, nombre, host, puerto=9100, etiquetas_por_minuto=60, tipos=None, confirmar=True):
+        self.nombre = nombre
+        self.host = host
+        self.puerto = puerto
+        self.etiquetas_por_minuto = etiquetas_por_minuto
+        self.tipos = list(tipos or [])
+        self.confirmar = confirmar
+        self.no_disponible_hasta = 0.0
+
+    @property
+    def direccion(self):
+        return (self.host, self.puerto)
+
+    def admite(self, tipo):
+        return not self.tipos or tipo in self.tipos
+
+    def disponible(self):
+        return time.monotonic() >= self.no_disponible_hasta
+
+    def marcar_no_disponible(self, segundos=ESPERA_NO_DISPONIBLE):
+        self.no_disponible_hasta = time.monotonic() + segundos
+
+    def __repr__(self):
+        return f"Impresora({self.nombre!r}, {self.host}:{self.puerto})"
+
+
+class RegistroImpresoras:
+    """Conjunto de impresoras conocidas"""
+
+    def __init__(self, impresoras):
+        self.impresoras = list(impresoras)
+
+    @classmethod
+    def desde_config(cls, config=None):
+        """Crea el registro a partir de IMPRESORAS (o de la lista indicada)"""
+        return cls(Impresora(**datos) for datos in (IMPRESORAS if config is None else config))
+
+    def para_tipo(self, tipo):
+        """Impresoras que admiten el tipo de etiqueta, las disponibles primero"""
+        impresoras = [impresora for impresora in self.impresoras if impresora.admite(tipo)]
+        if not impresoras:
+            raise ValueError(f"No hay impresoras configuradas para etiquetas de tipo '{tipo}'")
+        disponibles = [impresora for impresora in impresoras if impresora.disponible()]
+        # Si todas fallaron hace poco se vuelve a intentar con todas
+        return disponibles or impresoras
+
+
+def _numeros(rangos, inicio, fin):
+    # Números de etiqueta de las posiciones inicio..fin (desde 1) dentro de rangos
+    posicion = 1
+    for desde, hasta in rangos:
+        tamano = hasta - desde + 1
+        primera = max(inicio, posicion)
+        ultima = min(fin, posicion + tamano - 1)
+        if primera <= ultima:
+            yield desde + primera - posicion, desde + ultima - posicion
+        posicion += tamano
+
+
+class PlanificadorImpresion:
+    """Reparte trabajos de etiquetas entre las impresoras del registro.
+
+    Un trabajo de ``cantidad`` etiquetas se divide en tramos consecutivos
+    de numeración (i/cantidad se mantiene global) proporcionales a la
+    velocidad de cada impresora y a las etiquetas que ya tiene pendientes,
+    de modo que todas terminen aproximadamente a la vez. Si un tramo falla,
+    la impresora se marca como no disponible y las etiquetas que faltaban
+    se reenvían a otra impresora del mismo tipo.
+
+    El planificador se intercala en ``cola.al_cambiar_estado`` y sigue
+    avisando ahí todos los cambios de estado de los trabajos. Los tramos
+    que fallan sin otra impresora a la cual pasarlos quedan en ``fallidos``
+    como (trabajo, desde, hasta).
+
+    Cada trabajo lleva en ``solicitud`` el diccionario del pedido del que
+    forma parte (el mismo para todos sus tramos y reenvíos), con las
+    etiquetas ya enviadas en 'enviadas' y las que no se pudieron imprimir
+    en 'fallidas': el pedido terminó cuando entre ambas suman 'etiquetas',
+    las que había que imprimir.
+
+    Con un ``diario`` (DiarioImpresion) cada pedido se registra antes de
+    enviarlo, y las etiquetas a medida que la impresora confirma haberlas
+    recibido (ver TrabajoImpresion), para poder reanudarlo si se
+    interrumpe; el número del pedido en el diario queda en 'pedido'.
+    """
+
+    def __init__(self, cola, registro, minimo_por_impresora=MINIMO_POR_IMPRESORA, diario=None):
+        self.cola = cola
+        self.registro = registro
+        self.minimo_por_impresora = minimo_por_impresora
+        self.diario = diario
+        self._tramos = {}
+        self._pendientes = {}
+        self._bloqueo = threading.Lock()
+        self._sin_tramos = threading.Condition(self._bloqueo)
+        self.fallidos = []
+        self._notificar = cola.al_cambiar_estado
+        cola.al_cambiar_estado = self._al_cambiar_estado
+        self._al_confirmar_anterior = cola.al_confirmar
+        cola.al_confirmar = self._al_confirmar
+
+    def imprimir(self, nombre, id_producto, op, sgc, cantidad, tipo=TIPO_PRODUCTO, rangos=None, pedido=None,
+                 reimpresion_de=None):
+        """Envía las etiquetas 1..cantidad y devuelve los trabajos creados.
+
+        ``rangos`` limita el envío a esas etiquetas (desde, hasta), por
+        ejemplo para reimprimir algunas. ``pedido`` es el número en el
+        diario de un pedido interrumpido que se reanuda; si no se indica,
+        el pedido se registra como nuevo (como reimpresión del pedido
+        ``reimpresion_de``, si se indica).
+        """
+        rangos = [(1, cantidad)] if rangos is None else list(rangos)
+        solicitud = {
+            'nombre': nombre,
+            'id_producto': id_producto,
+            'op': op,
+            'sgc': sgc,
+            'cantidad': cantidad,
+            'tipo': tipo,
+            'etiquetas': sum(hasta - desde + 1 for desde, hasta in rangos),
+            'pedido': pedido,
+            'enviadas': 0,
+            'fallidas': 0,
+        }
+        impresoras = self.registro.para_tipo(tipo)
+        if self.diario is not None and pedido is None:
+            solicitud['pedido'] = self.diario.nuevo_pedido(solicitud, rangos, reimpresion_de)
+        with self._bloqueo:
+            reparto = self.repartir(solicitud['etiquetas'], impresoras)
+        varias = len(impresoras) > 1
+        return [
+            self._enviar(solicitud, impresora, desde, hasta, varias)
+            for impresora, inicio, fin in reparto
+            for desde, hasta in _numeros(rangos, inicio, fin)
+        ]
+
+    def avance(self, solicitud):
+        """Devuelve (enviadas, fallidas) de un pedido, leídas a la vez"""
+        with self._bloqueo:
+            return solicitud['enviadas'], solicitud['fallidas']
+
+    def esperar(self, tiempo=None):
+        """Espera a que terminen todos los tramos, incluidos los reenviados"""
+        with self._sin_tramos:
+            return self._sin_tramos.wait_for(lambda: not self._tramos, tiempo)
+
+    def repartir(self, cantidad, impresoras):
+        """Divide 1..cantidad en tramos (impresora, desde, hasta)"""
+        pendientes = {impresora.nombre: self._pendientes.get(impresora.nombre, 0) for impresora in impresoras}
+
+        def fin_estimado(impresora):
+            return pendientes[impresora.nombre] / impresora.etiquetas_por_minuto
+
+        maximo = max(1, cantidad // self.minimo_por_impresora)
+        activas = sorted(impresoras, key=lambda impresora: (fin_estimado(impresora), -impresora.etiquetas_por_minuto))[:maximo]
+
+        # Reparto por "llenado": todas las impresoras activas terminan en el
+        # mismo instante; las que ya tienen más trabajo que eso no reciben
+        while True:
+            velocidad = sum(impresora.etiquetas_por_minuto for impresora in activas)
+            fin = (cantidad + sum(pendientes[impresora.nombre] for impresora in activas)) / velocidad
+            restantes = [impresora for impresora in activas if fin_estimado(impresora) < fin]
+            if len(restantes) == len(activas):
+                break
+            activas = restantes
+
+        cuotas = [fin * impresora.etiquetas_por_minuto - pendientes[impresora.nombre] for impresora in activas]
+        enteras = [int(cuota) for cuota in cuotas]
+        # Las etiquetas que sobran del redondeo van a las mayores fracciones
+        por_fraccion = sorted(range(len(activas)), key=lambda i: enteras[i] - cuotas[i])
+        for i in por_fraccion[:cantidad - sum(enteras)]:
+            enteras[i] += 1
+
+        reparto = []
+        desde = 1
+        for impresora, cuota in zip(activas, enteras):
+            if cuota > 0:
+                reparto.append((impresora, desde, desde + cuota - 1))
+                desde += cuota
+        return reparto
+
+    def _enviar(self, solicitud, impresora, desde, hasta, varias):
+        datos = (solicitud['nombre'], solicitud['id_producto'], solicitud['op'], solicitud['sgc'], solicitud['cantidad'])
+        if hasta > desde:
+            partes = zpl.lote(*datos, desde=desde, hasta=hasta)
+            conteos = [0] + [fin - inicio + 1 for inicio, fin in zpl.bloques_lote(desde, hasta)]
+        else:
+            partes = zpl.etiquetas(*datos, desde=desde, hasta=hasta)
+            conteos = None
+        trabajo = TrabajoImpresion(
+            impresora.direccion,
+            partes,
+            f"{solicitud['id_producto']} {desde}-{hasta}/{solicitud['cantidad']} en {impresora.nombre}",
+            conteos,
+            # Con otras impresoras disponibles, una conexión rechazada pasa el tramo a otra
+            reintentar_rechazo=not varias,
+            solicitud=solicitud,
+            formato=hasta > desde,
+            confirmar=impresora.confirmar,
+        )
+        with self._bloqueo:
+            self._tramos[trabajo.id] = (solicitud, impresora, desde, hasta)
+            self._pendientes[impresora.nombre] = self._pendientes.get(impresora.nombre, 0) + hasta - desde + 1
+        return self.cola.enviar(trabajo)
+
+    def _al_confirmar(self, trabajo):
+        if self._al_confirmar_anterior is not None:
+            self._al_confirmar_anterior(trabajo)
+        if self.diario is None or not trabajo.etiquetas_confirmadas:
+            return
+        with self._bloqueo:
+            tramo = self._tramos.get(trabajo.id)
+        if tramo is not None and tramo[0]['pedido'] is not None:
+            desde = tramo[2]
+            self.diario.enviadas(tramo[0]['pedido'], desde, desde + trabajo.etiquetas_confirmadas - 1)
+
+    def _al_cambiar_estado(self, trabajo):
+        if self._notificar is not None:
+            self._notificar(trabajo)
+        if trabajo.estado not in (COMPLETADO, ERROR):
+            return
+        with self._bloqueo:
+            tramo = self._tramos.get(trabajo.id)
+        if tramo is None:
+            return
+        solicitud, impresora, desde, hasta = tramo
+        # El reenvío se registra antes de quitar el tramo fallido, así
+        # esperar() nunca ve un momento sin tramos pendientes
+        if trabajo.estado == ERROR:
+            self._reenviar(trabajo, solicitud, impresora, desde + trabajo.etiquetas_confirmadas, hasta)
+        with self._bloqueo:
+            solicitud['enviadas'] += hasta - desde + 1 if trabajo.estado == COMPLETADO else trabajo.etiquetas_confirmadas
+            terminado = solicitud['enviadas'] == solicitud['etiquetas']
+            del self._tramos[trabajo.id]
+            self._pendientes[impresora.nombre] -= hasta - desde + 1
+            if not self._tramos:
+                self._sin_tramos.notify_all()
+        if terminado and self.diario is not None and solicitud['pedido'] is not None:
+            self.diario.terminar(solicitud['pedido'])
+
+    def _reenviar(self, trabajo, solicitud, impresora, desde, hasta):
+        # Pasa las etiquetas que no se enviaron a la mejor impresora alternativa
+        impresora.marcar_no_disponible()
+        if desde > hasta:
+            return
+        alternativas = [
+            otra for otra in self.registro.para_tipo(solicitud['tipo'])
+            if otra is not impresora and otra.disponible()
+        ]
+        if not alternativas:
+            with self._bloqueo:
+                self.fallidos.append((trabajo, desde, hasta))
+                solicitud['fallidas'] += hasta - desde + 1
+            return
+        with self._bloqueo:
+            destino = min(alternativas, key=lambda otra: self._pendientes.get(otra.nombre, 0) / otra.etiquetas_por_minuto)
+        print(f"Trabajo {trabajo.id}: {impresora.nombre} falló, se reenvían las etiquetas {desde}-{hasta} a {destino.nombre}")
+        self._enviar(solicitud, destino, desde, hasta, len(alternativas) > 1)
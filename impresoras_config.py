@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+# Impresoras ZPL disponibles para imprimir etiquetas
+IMPRESORAS = [
+    {
+        'nombre': 'Zebra principal',      # Nombre para mostrar en mensajes
+        'host': '10.10.2.34',             # Dirección IP de la impresora
+        'puerto': 9100,                   # Puerto RAW (9100 en impresoras Zebra)
+        'etiquetas_por_minuto': 60,       # Velocidad aproximada, para repartir trabajos
+        'tipos': [],                      # Tipos de etiqueta que imprime ([] = todos)
+        'confirmar': True,                # Pide estado (~HS) para confirmar lo recibido (False si no lo admite)
+    },
+]
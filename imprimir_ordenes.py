@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Imprime sin interfaz gráfica las etiquetas de un archivo de órdenes.
+
+Uso:
+    python imprimir_ordenes.py ordenes.xlsx --catalogo productos.csv
+    python imprimir_ordenes.py ordenes.csv --catalogo productos.csv --salida etiquetas.zpl
+
+El archivo de órdenes (CSV o Excel) debe tener las columnas id_producto,
+op, sgc y cantidad. Con --diario los pedidos se anotan en ese diario y
+los que no terminen se pueden reanudar con diario_impresion.py.
+"""
+import argparse
+import sys
+
+import metricas
+import ordenes_trabajo
+from cache_catalogo import CacheCatalogo, cargar_catalogo
+from cola_impresion import COMPLETADO, ERROR, REINTENTANDO, ColaImpresion
+from diario_impresion import DiarioImpresion
+from impresoras import PlanificadorImpresion, RegistroImpresoras
+
+
+def mostrar_estado(trabajo):
+    if trabajo.estado == COMPLETADO:
+        print(f"Trabajo {trabajo.id} ({trabajo.descripcion}): {trabajo.etiquetas} etiquetas enviadas")
+    elif trabajo.estado == REINTENTANDO:
+        print(f"Trabajo {trabajo.id} ({trabajo.descripcion}): reintentando ({trabajo.intentos}): {trabajo.error}")
+    elif trabajo.estado == ERROR:
+        print(f"Trabajo {trabajo.id} ({trabajo.descripcion}): error: {trabajo.error} "
+              f"({trabajo.etiquetas_enviadas}/{trabajo.etiquetas} etiquetas enviadas)")
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Imprime las etiquetas de un archivo de órdenes de producción.')
+    parser.add_argument('ordenes', help='Archivo CSV o Excel con id_producto, op, sgc y cantidad')
+    parser.add_argument('--catalogo', required=True, help='CSV de productos (id_producto, code_128, nombre) o Excel exportado de Odoo')
+    parser.add_argument('--salida', help='Escribe el ZPL en este archivo en lugar de enviarlo a las impresoras')
+    parser.add_argument('--sin-cache', action='store_true', help='No usa la caché de catálogos')
+    parser.add_argument('--metricas', help='Guarda al terminar las métricas de tiempos y contadores en este JSON')
+    parser.add_argument('--diario', help='Anota los pedidos en este diario de impresión para poder reanudarlos')
+    args = parser.parse_args(argumentos)
+    try:
+        return _imprimir(args)
+    finally:
+        if args.metricas:
+            metricas.METRICAS.exportar(args.metricas)
+            print(f"Métricas guardadas en {args.metricas}")
+
+
+def _imprimir(args):
+    try:
+        catalogo = cargar_catalogo(args.catalogo, None if args.sin_cache else CacheCatalogo())
+    except (OSError, ValueError) as e:
+        print(f"Error al leer el catálogo: {str(e)}")
+        return 1
+    print(f"Catálogo leído con {len(catalogo)} registros.")
+
+    try:
+        resueltas, errores = ordenes_trabajo.resolver(ordenes_trabajo.leer_ordenes(args.ordenes), catalogo)
+    except (OSError, ValueError) as e:
+        print(f"Error al leer las órdenes: {str(e)}")
+        return 1
+    for error in errores:
+        print(error)
+    print(f"{len(resueltas)} órdenes para imprimir, {len(errores)} con errores.")
+
+    if args.salida:
+        try:
+            with open(args.salida, 'wb') as archivo:
+                etiquetas = ordenes_trabajo.escribir_zpl(resueltas, archivo)
+        except OSError as e:
+            print(f"No se pudo escribir {args.salida}: {str(e)}")
+            return 1
+        print(f"Se escribieron {etiquetas} etiquetas en {args.salida}")
+        return 1 if errores else 0
+
+    try:
+        diario = DiarioImpresion(args.diario) if args.diario else None
+    except OSError as e:
+        print(f"No se pudo abrir el diario: {str(e)}")
+        return 1
+    cola = ColaImpresion(al_cambiar_estado=mostrar_estado)
+    planificador = PlanificadorImpresion(cola, RegistroImpresoras.desde_config(), diario=diario)
+    try:
+        ordenes_trabajo.imprimir(resueltas, planificador)
+    finally:
+        # Los tramos reenviados a otra impresora también se esperan
+        planificador.esperar()
+        cola.detener()
+        if diario is not None:
+            diario.cerrar()
+    for trabajo, desde, hasta in planificador.fallidos:
+        print(f"Sin imprimir: etiquetas {desde}-{hasta} de {trabajo.descripcion}")
+    return 1 if errores or planificador.fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Métricas de rendimiento: contadores e histogramas de tiempos.
+
+Los módulos miden tiempos con medir() (o registrar()) y cuentan sucesos
+con contar(); todo se acumula en METRICAS, que se puede consultar con
+resumen() o guardar en un archivo JSON con exportar(). Cada histograma
+acumula todas sus mediciones en cubetas de escala logarítmica y guarda
+además las últimas VENTANA para las estadísticas recientes.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+from archivos import escribir_atomico
+
+VENTANA = 1000  # Mediciones recientes que guarda cada histograma
+# Límite superior de cada cubeta en ms: de 0,01 ms a 100 s, cuatro por década
+LIMITES_MS = tuple(round(10 ** (exponente / 4), 4) for exponente in range(-8, 21))
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class Histograma:
+    """Distribución de los tiempos de una operación"""
+
+    def __init__(self):
+        self.cubetas = [0] * (len(LIMITES_MS) + 1)  # La última cuenta lo que supera el mayor límite
+        self.cantidad = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.recientes = deque(maxlen=VENTANA)
+
+    def agregar(self, segundos):
+        ms = segundos * 1000
+        self.cubetas[bisect_left(LIMITES_MS, ms)] += 1
+        self.cantidad += 1
+        self.total += ms
+        self.maximo = max(self.maximo, ms)
+        self.recientes.append(ms)
+
+    def percentil(self, p):
+        """Percentil aproximado (límite de su cubeta) de todas las mediciones, en ms"""
+        objetivo = self.cantidad * p / 100
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES_MS, self.cubetas):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return limite
+        return self.maximo
+
+    def resumen(self):
+        recientes = sorted(self.recientes)
+        return {
+            'cantidad': self.cantidad,
+            'total_ms': round(self.total, 3),
+            'promedio_ms': round(self.total / self.cantidad, 3) if self.cantidad else 0.0,
+            'maximo_ms': round(self.maximo, 3),
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+            'recientes': {
+                'cantidad': len(recientes),
+                'p50_ms': round(_percentil(recientes, 50), 3) if recientes else 0.0,
+                'p95_ms': round(_percentil(recientes, 95), 3) if recientes else 0.0,
+                'ultimo_ms': round(self.recientes[-1], 3) if recientes else 0.0,
+            },
+            'cubetas': {str(limite): cantidad for limite, cantidad in zip(LIMITES_MS, self.cubetas) if cantidad},
+        }
+
+
+class Metricas:
+    """Contadores e histogramas con nombre, seguros entre hilos"""
+
+    def __init__(self):
+        self._contadores = {}
+        self._histogramas = {}
+        self._bloqueo = threading.Lock()
+        self.desde = time.time()
+
+    def contar(self, nombre, cantidad=1):
+        with self._bloqueo:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def registrar(self, nombre, segundos):
+        """Agrega una medición de tiempo al histograma nombre"""
+        with self._bloqueo:
+            histograma = self._histogramas.get(nombre)
+            if histograma is None:
+                histograma = self._histogramas[nombre] = Histograma()
+            histograma.agregar(segundos)
+
+    @contextmanager
+    def medir(self, nombre):
+        """Registra en nombre el tiempo que tarda el bloque with (aunque falle)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, time.perf_counter() - inicio)
+
+    def contador(self, nombre):
+        with self._bloqueo:
+            return self._contadores.get(nombre, 0)
+
+    def resumen(self):
+        """Diccionario con todos los contadores y el resumen de cada histograma"""
+        with self._bloqueo:
+            return {
+                'desde': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.desde)),
+                'hasta': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'contadores': dict(sorted(self._contadores.items())),
+                'tiempos': {nombre: self._histogramas[nombre].resumen() for nombre in sorted(self._histogramas)},
+            }
+
+    def exportar(self, ruta):
+        """Guarda resumen() como JSON en ruta (reemplaza el archivo de una vez)"""
+        resumen = self.resumen()
+        escribir_atomico(ruta, lambda archivo: json.dump(resumen, archivo, ensure_ascii=False, indent=2),
+                         'w', encoding='utf-8')
+
+    def reiniciar(self):
+        with self._bloqueo:
+            self._contadores.clear()
+            self._histogramas.clear()
+            self.desde = time.time()
+
+
+# Métricas de todo el proceso
+METRICAS = Metricas()
+contar = METRICAS.contar
+registrar = METRICAS.registrar
+medir = METRICAS.medir
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Modelo de Qt para mostrar resultados de búsqueda del catálogo."""
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+# Roles con los datos de cada resultado
+ROL_FILA = Qt.ItemDataRole.UserRole  # Índice de la fila en el catálogo
+ROL_ID_PRODUCTO = Qt.ItemDataRole.UserRole + 1
+ROL_CODE_128 = Qt.ItemDataRole.UserRole + 2
+ROL_NOMBRE = Qt.ItemDataRole.UserRole + 3
+
+_COLUMNAS_ROL = {
+    ROL_ID_PRODUCTO: 'id_producto',
+    ROL_CODE_128: 'code_128',
+    ROL_NOMBRE: 'nombre',
+}
+
+
+class ModeloResultados(QAbstractListModel):
+    """Lista de índices de fila de un Catalogo.
+
+    El modelo sólo guarda los índices: el texto de cada resultado se arma
+    cuando la vista lo pide, es decir, sólo para las filas visibles. En
+    lugar de resultados puede mostrar un único mensaje (sin fila asociada).
+
+    Si la búsqueda se cortó en un límite (``hay_mas``), cuando la vista llega
+    al final se llama a ``pedir_mas()``; quien la atiende agrega las filas
+    siguientes con ampliar().
+    """
+
+    def __init__(self, parent=None, pedir_mas=None):
+        super().__init__(parent)
+        self.pedir_mas = pedir_mas
+        self._catalogo = None
+        self._filas = []
+        self._mensaje = None
+        self._hay_mas = False
+
+    def mostrar(self, catalogo, filas, hay_mas=False):
+        """Reemplaza los resultados por los índices de fila indicados"""
+        self.beginResetModel()
+        self._catalogo = catalogo
+        self._filas = list(filas)
+        self._mensaje = None
+        self._hay_mas = hay_mas
+        self.endResetModel()
+
+    def ampliar(self, filas, hay_mas=False):
+        """Agrega al final las filas que todavía no se muestran"""
+        mostradas = set(self._filas)
+        nuevas = [fila for fila in filas if fila not in mostradas]
+        self._hay_mas = hay_mas
+        if nuevas:
+            self.beginInsertRows(QModelIndex(), len(self._filas), len(self._filas) + len(nuevas) - 1)
+            self._filas.extend(nuevas)
+            self.endInsertRows()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._hay_mas and self.pedir_mas is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        # Se pide una sola vez: ampliar() indica si aún quedan más
+        if self.canFetchMore(parent):
+            self._hay_mas = False
+            self.pedir_mas()
+
+    def mostrar_mensaje(self, texto):
+        """Reemplaza los resultados por un mensaje"""
+        self.beginResetModel()
+        self._catalogo = None
+        self._filas = []
+        self._mensaje = texto
+        self._hay_mas = False
+        self.endResetModel()
+
+    def limpiar(self):
+        self.mostrar(None, [])
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 1 if self._mensaje is not None else len(self._filas)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if self._mensaje is not None:
+            return self._mensaje if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole) else None
+
+        fila = self._filas[index.row()]
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return (
+                f"ID: {self._catalogo.valor(fila, 'id_producto')}, "
+                f"Code: {self._catalogo.valor(fila, 'code_128')}, "
+                f"Nombre: {self._catalogo.valor(fila, 'nombre')}"
+            )
+        if role == ROL_FILA:
+            return fila
+        columna = _COLUMNAS_ROL.get(role)
+        if columna is not None:
+            return self._catalogo.valor(fila, columna)
+        return None
@@ -1,20 +1,152 @@
 # -*- coding: utf-8 -*-
+import threading
 import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor
+
+import metricas
 from odoo_config import ODOO_CONFIG
 
+TAMANO_LOTE = 500  # Registros por llamada a read o search_read
+HILOS = 4  # Llamadas simultáneas a Odoo
+TIEMPO_ESPERA = 30.0  # Segundos máximos por llamada
+CAMPOS_PRODUCTO = ['name', 'default_code', 'description']
+
+
+class _Persistente:
+    # xmlrpc.client reutiliza la conexión HTTP 1.1 del transporte entre
+    # llamadas mientras el servidor no la cierre; se agrega un tiempo de espera
+    def make_connection(self, host):
+        conexion = super().make_connection(host)
+        conexion.timeout = TIEMPO_ESPERA
+        return conexion
+
+
+class _Transporte(_Persistente, xmlrpc.client.Transport):
+    pass
+
+
+class _TransporteSeguro(_Persistente, xmlrpc.client.SafeTransport):
+    pass
+
+
 class OdooClient:
-    def __init__(self):
-        self.url = ODOO_CONFIG['url']
-        self.db = ODOO_CONFIG['db']
-        self.username = ODOO_CONFIG['username']
-        self.password = ODOO_CONFIG['password']
-        
-        # Crear conexiones XML-RPC
-        self.common = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/common')
-        self.models = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/object')
-        
-        # Autenticar y obtener uid
-        self.uid = self.common.authenticate(self.db, self.username, self.password, {})
+    """Cliente XML-RPC de Odoo.
+
+    La autenticación se hace en la primera llamada, no al crear el cliente.
+    Cada hilo usa sus propios ServerProxy con una conexión persistente, así
+    que las lecturas grandes (get_products, search_read_all) se dividen en
+    lotes que se piden en paralelo con ``HILOS`` hilos.
+    """
+
+    def __init__(self, config=None):
+        # Sin config se usa odoo_config.ODOO_CONFIG
+        config = ODOO_CONFIG if config is None else config
+        self.url = config['url']
+        self.db = config['db']
+        self.username = config['username']
+        self.password = config['password']
+
+        self._uid = None
+        self._locales = threading.local()
+        self._hilos = None
+        self._bloqueo = threading.Lock()
+
+    def _proxy(self, servicio):
+        # ServerProxy no se puede compartir entre hilos: uno por hilo y servicio
+        proxies = getattr(self._locales, 'proxies', None)
+        if proxies is None:
+            proxies = self._locales.proxies = {}
+        proxy = proxies.get(servicio)
+        if proxy is None:
+            transporte = _TransporteSeguro() if self.url.startswith('https') else _Transporte()
+            proxy = proxies[servicio] = xmlrpc.client.ServerProxy(
+                f'{self.url}/xmlrpc/2/{servicio}', transport=transporte)
+        return proxy
+
+    @property
+    def common(self):
+        return self._proxy('common')
+
+    @property
+    def models(self):
+        return self._proxy('object')
+
+    @property
+    def uid(self):
+        """uid del usuario; autentica en el primer uso"""
+        if self._uid is None:
+            with self._bloqueo:
+                if self._uid is None:
+                    with metricas.medir('odoo.authenticate'):
+                        self._uid = self.common.authenticate(self.db, self.username, self.password, {})
+        return self._uid
+
+    def _en_paralelo(self, funcion, elementos):
+        # Aplica funcion a cada elemento repartiéndolos entre los hilos
+        elementos = list(elementos)
+        if len(elementos) <= 1:
+            return [funcion(elemento) for elemento in elementos]
+        with self._bloqueo:
+            if self._hilos is None:
+                self._hilos = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix='odoo')
+        return list(self._hilos.map(funcion, elementos))
+
+    def cerrar(self):
+        """Termina los hilos de lectura en paralelo"""
+        with self._bloqueo:
+            hilos, self._hilos = self._hilos, None
+        if hilos is not None:
+            hilos.shutdown()
+
+    def _execute(self, model, method, args, **kwargs):
+        uid = self.uid
+        try:
+            with metricas.medir(f'odoo.{method}'):
+                return self.models.execute_kw(self.db, uid, self.password, model, method, args, kwargs)
+        except Exception:
+            metricas.contar('odoo.errores')
+            raise
+
+    def search(self, model, domain):
+        """IDs de los registros de model que cumplen domain (los errores se propagan)"""
+        return self._execute(model, 'search', [domain])
+
+    def search_read(self, model, domain, fields, offset=0, limit=None, order=None):
+        """Una página de registros de model que cumplen domain (los errores se propagan)"""
+        opciones = {'fields': fields, 'offset': offset}
+        if limit is not None:
+            opciones['limit'] = limit
+        if order is not None:
+            opciones['order'] = order
+        return self._execute(model, 'search_read', [domain], **opciones)
+
+    def search_read_all(self, model, domain, fields, page_size=TAMANO_LOTE, order='id'):
+        """Todos los registros que cumplen domain, en páginas pedidas en paralelo.
+
+        Los errores se propagan. Un registro borrado durante la lectura
+        puede desplazar las páginas siguientes y omitir otro registro.
+        """
+        total = self._execute(model, 'search_count', [domain])
+        paginas = self._en_paralelo(
+            lambda offset: self.search_read(model, domain, fields, offset, page_size, order),
+            range(0, total, page_size))
+        return [registro for pagina in paginas for registro in pagina]
+
+    def get_products(self, ids, fields=None):
+        """Lee productos por ID en lotes de TAMANO_LOTE pedidos en paralelo.
+
+        Devuelve los productos en el orden de ids, sin los que no existen
+        (read fallaría por ellos; search_read con el dominio de los IDs los
+        omite). Incluye los archivados. Los errores se propagan.
+        """
+        fields = CAMPOS_PRODUCTO if fields is None else fields
+        ids = list(ids)
+        lotes = self._en_paralelo(
+            lambda lote: self._execute('product.template', 'search_read', [[('id', 'in', lote)]], fields=fields,
+                                       context={'active_test': False}),
+            (ids[i:i + TAMANO_LOTE] for i in range(0, len(ids), TAMANO_LOTE)))
+        leidos = {producto['id']: producto for lote in lotes for producto in lote}
+        return [leidos[id_producto] for id_producto in ids if id_producto in leidos]
 
     def search_products(self, query):
         """Buscar productos en Odoo"""
@@ -30,12 +162,11 @@ class OdooClient:
             fields = ['id', 'name', 'default_code', 'description']
             
             # Realizar la búsqueda
-            products = self.models.execute_kw(
-                self.db, self.uid, self.password,
+            products = self._execute(
                 'product.template',  # Modelo a consultar
                 'search_read',      # Método
                 [domain],           # Dominio de búsqueda
-                {'fields': fields}  # Campos a retornar
+                fields=fields       # Campos a retornar
             )
             
             return products
@@ -46,14 +177,7 @@ class OdooClient:
     def get_product(self, product_id):
         """Obtener un producto específico por ID"""
         try:
-            fields = ['name', 'default_code', 'description']
-            products = self.models.execute_kw(
-                self.db, self.uid, self.password,
-                'product.template',
-                'read',
-                [product_id],
-                {'fields': fields}
-            )
+            products = self.get_products([product_id])
             return products[0] if products else None
         except Exception as e:
             print(f"Error al obtener producto: {str(e)}")
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Impresión por lotes a partir de un archivo de órdenes de producción (OP)."""
+import csv
+import os
+
+import zpl
+
+# Columnas del archivo de órdenes y los encabezados que se aceptan para cada una
+COLUMNAS_ORDEN = {
+    'id_producto': ('id_producto', 'id', 'producto', 'codigo', 'código'),
+    'op': ('op', 'orden', 'orden_produccion', 'orden de producción'),
+    'sgc': ('sgc', 'version_sgc', 'versión sgc', 'sgc_version', 'version sgc'),
+    'cantidad': ('cantidad', 'cant', 'etiquetas'),
+}
+CANTIDAD_MAXIMA = 100000  # Etiquetas máximas por orden
+
+
+def validar_cantidad(valor):
+    """Devuelve la cantidad de etiquetas de una orden o lanza ValueError.
+
+    Debe ser un entero entre 1 y CANTIDAD_MAXIMA; como texto se acepta
+    "10" y también "10.0", como llegan algunas celdas numéricas de Excel.
+    """
+    cantidad = None
+    if isinstance(valor, str):
+        try:
+            cantidad = int(valor)
+        except ValueError:
+            try:
+                decimal = float(valor)
+            except ValueError:
+                decimal = None
+            # inf y nan tampoco son enteros
+            if decimal is not None and decimal.is_integer():
+                cantidad = int(decimal)
+    elif isinstance(valor, int) and not isinstance(valor, bool):
+        cantidad = valor
+    if cantidad is None or not 1 <= cantidad <= CANTIDAD_MAXIMA:
+        raise ValueError(f"cantidad debe ser un entero entre 1 y {CANTIDAD_MAXIMA}")
+    return cantidad
+
+
+def _columnas(encabezados):
+    # Relaciona cada columna de la orden con su posición en el archivo
+    normalizados = [str(encabezado or '').strip().lower() for encabezado in encabezados]
+    posiciones = {}
+    for columna, alias in COLUMNAS_ORDEN.items():
+        for i, encabezado in enumerate(normalizados):
+            if encabezado in alias:
+                posiciones[columna] = i
+                break
+    faltantes = [columna for columna in ('id_producto', 'cantidad') if columna not in posiciones]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el archivo de órdenes: {', '.join(faltantes)}")
+    return posiciones
+
+
+def _filas_excel(ruta):
+    # Lectura en modo de sólo lectura: las filas se recorren sin cargar la hoja completa
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def _filas_csv(ruta):
+    # utf-8-sig: los CSV guardados desde Excel empiezan con BOM
+    with open(ruta, 'r', encoding='utf-8-sig', newline='') as archivo:
+        yield from csv.reader(archivo)
+
+
+def leer_ordenes(ruta):
+    """Recorre las órdenes de un CSV o Excel como (línea, orden).
+
+    Cada orden es un diccionario con id_producto, op, sgc y cantidad (texto
+    tal como viene en el archivo). Las filas vacías se omiten.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    filas = _filas_excel(ruta) if extension in ('.xlsx', '.xlsm') else _filas_csv(ruta)
+    posiciones = None
+    for linea, fila in enumerate(filas, start=1):
+        if posiciones is None:
+            posiciones = _columnas(fila)
+            continue
+        valores = {
+            columna: ('' if posicion >= len(fila) or fila[posicion] is None else str(fila[posicion]).strip())
+            for columna, posicion in posiciones.items()
+        }
+        if not any(valores.values()):
+            continue
+        yield linea, {columna: valores.get(columna, '') for columna in COLUMNAS_ORDEN}
+
+
+def resolver(ordenes, catalogo):
+    """Busca los productos de las órdenes en el catálogo.
+
+    Devuelve (resueltas, errores): resueltas es una lista de (orden,
+    producto, cantidad) y errores una lista de mensajes por línea.
+    """
+    resueltas = []
+    errores = []
+    for linea, orden in ordenes:
+        try:
+            cantidad = validar_cantidad(orden['cantidad'])
+        except ValueError as e:
+            errores.append(f"Línea {linea}: {str(e)}, no '{orden['cantidad']}'")
+            continue
+        indice = catalogo.buscar_id(orden['id_producto'])
+        if indice is None:
+            errores.append(f"Línea {linea}: producto '{orden['id_producto']}' no encontrado en el catálogo")
+            continue
+        resueltas.append((orden, catalogo.fila(indice), cantidad))
+    return resueltas, errores
+
+
+def imprimir(resueltas, planificador):
+    """Envía las órdenes resueltas al planificador y devuelve los trabajos creados"""
+    trabajos = []
+    for orden, producto, cantidad in resueltas:
+        trabajos.extend(planificador.imprimir(
+            producto['nombre'], producto['id_producto'], orden['op'], orden['sgc'], cantidad
+        ))
+    return trabajos
+
+
+def escribir_zpl(resueltas, archivo):
+    """Escribe el ZPL de las órdenes resueltas en un archivo binario abierto"""
+    etiquetas = 0
+    for orden, producto, cantidad in resueltas:
+        generar = zpl.lote if cantidad > 1 else zpl.etiquetas
+        for parte in generar(producto['nombre'], producto['id_producto'], orden['op'], orden['sgc'], cantidad):
+            archivo.write(parte)
+        etiquetas += cantidad
+    return etiquetas
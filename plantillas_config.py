@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+# Plantillas de etiqueta ZPL (medidas en puntos de la impresora)
+#
+# Cada campo indica el dato que muestra ('nombre', 'id_producto', 'op', 'sgc'
+# o 'numero', la numeración numero/cantidad), su posición y cómo se imprime:
+# con 'fuente' (texto) o con 'codigo_barras'. 'rotacion' es N (normal),
+# R (90°), I (180°) o B (270°). Cada plantilla lleva un solo campo 'numero'.
+PLANTILLAS = {
+    'producto': [
+        {'dato': 'nombre', 'x': 115, 'y': 35,
+         'fuente': '0', 'rotacion': 'N', 'alto': 18, 'ancho': 18},
+        {'dato': 'id_producto', 'x': 115, 'y': 60,
+         'codigo_barras': 'code128', 'rotacion': 'N', 'alto': 75,
+         'texto_abajo': True,       # Imprime el código debajo de las barras
+         'digito_control': False},  # Dígito de control UCC
+        {'dato': 'op', 'x': 115, 'y': 168,
+         'fuente': '0', 'rotacion': 'N', 'alto': 20, 'ancho': 20},
+        {'dato': 'numero', 'x': 115, 'y': 188,
+         'fuente': '0', 'rotacion': 'N', 'alto': 18, 'ancho': 18},
+        {'dato': 'sgc', 'x': 370, 'y': 60,
+         'fuente': '0', 'rotacion': 'R', 'alto': 18, 'ancho': 18},
+    ],
+}
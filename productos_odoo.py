@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Copia local sincronizada de los productos de Odoo."""
+import http.client
+import json
+import os
+import threading
+import xmlrpc.client
+from array import array
+
+from archivos import escribir_atomico
+from catalogo import Catalogo
+
+ARCHIVO_PRODUCTOS = os.path.join(os.path.expanduser('~'), '.sistema-etiquetas', 'odoo_productos.json')
+MODELO = 'product.template'
+CAMPOS = ['id', 'name', 'default_code', 'description', 'write_date']
+TAMANO_PAGINA = 2000  # Productos por llamada a search_read
+PROPORCION_OBSOLETAS = 0.25  # Filas reemplazadas a partir de las que se rehace el índice
+
+
+def _fila(producto):
+    # Odoo devuelve False en los campos vacíos
+    codigo = producto.get('default_code') or ''
+    return {'id_producto': codigo, 'code_128': codigo, 'nombre': producto.get('name') or ''}
+
+
+def _indexar(productos):
+    # Catálogo nuevo con los productos y el ID de Odoo de cada fila
+    catalogo = Catalogo(_fila(producto) for producto in productos)
+    ids_fila = array('I', (producto['id'] for producto in productos))
+    return catalogo, ids_fila, {id_odoo: fila for fila, id_odoo in enumerate(ids_fila)}
+
+
+class ProductosOdoo:
+    """Productos de Odoo guardados en disco e indexados en un Catalogo.
+
+    La primera sincronización descarga todos los productos en páginas
+    pedidas en paralelo (OdooClient.search_read_all); las siguientes sólo
+    piden los modificados desde el último ``write_date`` visto, más la
+    lista de IDs vigentes para quitar los borrados o archivados. Las
+    búsquedas se resuelven con el índice local sin
+    consultar a Odoo; buscar() y producto() devuelven diccionarios con los
+    mismos campos que OdooClient.search_products() y get_product().
+
+    Un producto modificado se agrega como fila nueva y su fila anterior
+    queda oculta; cuando las filas ocultas superan ``PROPORCION_OBSOLETAS``
+    el índice se rehace.
+    """
+
+    def __init__(self, cliente, archivo=ARCHIVO_PRODUCTOS, tamano_pagina=TAMANO_PAGINA):
+        self.cliente = cliente
+        self.archivo = archivo
+        self.tamano_pagina = tamano_pagina
+        self.ultima_modificacion = None
+        self._productos = {}
+        self._catalogo, self._ids_fila, self._filas = _indexar([])
+        self._obsoletas = set()
+        self._bloqueo = threading.Lock()
+        self._sincronizacion = threading.Lock()  # Una sincronización a la vez
+        self._cargar()
+
+    def __len__(self):
+        return len(self._productos)
+
+    def _origen(self):
+        return {'url': self.cliente.url, 'db': self.cliente.db}
+
+    def _cargar(self):
+        try:
+            with open(self.archivo, 'r', encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No se pudo leer la copia local de productos: {str(e)}")
+            return
+        # Una copia de otra base de datos no sirve
+        if datos.get('origen') != self._origen():
+            return
+        productos = datos['productos']
+        self._productos = {producto['id']: producto for producto in productos}
+        self._catalogo, self._ids_fila, self._filas = _indexar(productos)
+        self.ultima_modificacion = datos.get('ultima_modificacion')
+
+    def _guardar(self):
+        directorio = os.path.dirname(self.archivo) or '.'
+        os.makedirs(directorio, exist_ok=True)
+        with self._bloqueo:
+            datos = {
+                'origen': self._origen(),
+                'ultima_modificacion': self.ultima_modificacion,
+                'productos': list(self._productos.values()),
+            }
+        escribir_atomico(self.archivo, lambda archivo: json.dump(datos, archivo, ensure_ascii=False), 'w', encoding='utf-8')
+
+    def sincronizar(self):
+        """Trae de Odoo los productos nuevos, modificados y borrados.
+
+        Devuelve la cantidad de productos agregados o actualizados, o None
+        si no se pudo consultar Odoo (la copia local queda como estaba).
+        """
+        with self._sincronizacion:
+            return self._sincronizar()
+
+    def _sincronizar(self):
+        completa = self.ultima_modificacion is None
+        try:
+            if completa:
+                cambios = self.cliente.search_read_all(MODELO, [], CAMPOS, self.tamano_pagina)
+                vigentes = None
+            else:
+                # >= porque write_date tiene resolución de segundos: un
+                # producto modificado en el mismo segundo no se pierde
+                cambios = self.cliente.search_read_all(
+                    MODELO, [('write_date', '>=', self.ultima_modificacion)], CAMPOS, self.tamano_pagina)
+                vigentes = set(self.cliente.search(MODELO, []))
+                # Un borrado durante la lectura por páginas puede haber hecho
+                # saltear algún producto: los vigentes que faltan se leen por ID
+                faltantes = vigentes - self._productos.keys() - {producto['id'] for producto in cambios}
+                cambios += self.cliente.get_products(sorted(faltantes), CAMPOS)
+        except (OSError, http.client.HTTPException, xmlrpc.client.Error) as e:
+            # HTTPException: el servidor cortó o respondió mal a mitad de la lectura
+            print(f"Error al sincronizar productos: {str(e)}")
+            return None
+
+        ultima = max((p['write_date'] for p in cambios if p.get('write_date')), default=self.ultima_modificacion)
+        if completa:
+            indice = _indexar(cambios)
+            with self._bloqueo:
+                self._productos = {producto['id']: producto for producto in cambios}
+                self._catalogo, self._ids_fila, self._filas = indice
+                self._obsoletas = set()
+                self.ultima_modificacion = ultima
+        else:
+            cambios = self._aplicar(cambios, vigentes, ultima)
+
+        try:
+            self._guardar()
+        except OSError as e:
+            print(f"No se pudo guardar la copia local de productos: {str(e)}")
+        return len(cambios)
+
+    def _aplicar(self, cambios, vigentes, ultima):
+        with self._bloqueo:
+            borrados = [id_odoo for id_odoo in self._productos if id_odoo not in vigentes]
+            for id_odoo in borrados:
+                del self._productos[id_odoo]
+                self._obsoletas.add(self._filas.pop(id_odoo))
+            # Los productos modificados justo en ultima_modificacion vuelven
+            # a llegar en cada sincronización: si no cambiaron se ignoran
+            cambios = [p for p in cambios if p['id'] in vigentes and self._productos.get(p['id']) != p]
+            for producto in cambios:
+                self._productos[producto['id']] = producto
+                fila = self._filas.get(producto['id'])
+                if fila is not None:
+                    self._obsoletas.add(fila)
+                self._filas[producto['id']] = len(self._ids_fila)
+                self._ids_fila.append(producto['id'])
+                self._catalogo.agregar([_fila(producto)])
+            self.ultima_modificacion = ultima
+            rehacer = len(self._obsoletas) > PROPORCION_OBSOLETAS * len(self._ids_fila)
+            productos = list(self._productos.values()) if rehacer else None
+
+        if rehacer:
+            indice = _indexar(productos)
+            with self._bloqueo:
+                self._catalogo, self._ids_fila, self._filas = indice
+                self._obsoletas = set()
+        return cambios
+
+    def buscar(self, texto, limite=None):
+        """Busca productos por código o nombre en la copia local"""
+        with self._bloqueo:
+            obsoletas = self._obsoletas
+            filas = self._catalogo.buscar(texto, None if limite is None else limite + len(obsoletas))
+            productos = [self._productos[self._ids_fila[fila]] for fila in filas if fila not in obsoletas]
+        return productos if limite is None else productos[:limite]
+
+    def producto(self, product_id):
+        """Devuelve el producto con ese ID de Odoo, o None"""
+        with self._bloqueo:
+            return self._productos.get(product_id)
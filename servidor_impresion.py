@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""Servicio de impresión sin interfaz gráfica, con una API HTTP local.
+
+Uso:
+    python servidor_impresion.py --catalogo productos.csv
+    python servidor_impresion.py --catalogo productos.csv --impresora 127.0.0.1:9100
+
+Los pedidos se imprimen con el mismo planificador y las mismas plantillas
+que la aplicación; cada pedido HTTP se atiende en su propio hilo, así que
+varias estaciones (o el MES) pueden enviar trabajos a la vez. La API
+recibe y devuelve JSON:
+
+    POST /trabajos       {"id_producto": "...", "op": "...", "sgc": "...", "cantidad": 10}
+                         o una lista de esos objetos. Responde 202 con el
+                         número y el estado de cada pedido; si alguno no es
+                         válido responde 400 y no se imprime ninguno. Si un
+                         pedido válido no se pudo enviar (por ejemplo, al
+                         anotarlo en el diario), responde 500 con los que sí
+                         se aceptaron en "trabajos" y el motivo de los demás
+                         en "errores". Con "etiquetas": "3-5, 9" sólo se
+                         imprimen esas etiquetas de la cantidad, por
+                         ejemplo para reimprimir las que salieron mal.
+    GET  /trabajos/<n>   Estado del pedido n: pendiente, enviando,
+                         completado o error, con las etiquetas enviadas.
+    GET  /estado         Productos del catálogo, impresoras y pedidos por estado.
+    GET  /metricas       Tiempos y contadores de metricas.py.
+
+--impresora reemplaza las impresoras de impresoras_config.py, por ejemplo
+para probar el servicio contra una impresora simulada en el puerto 9100.
+
+Los pedidos se anotan en un diario (ver diario_impresion.py). Al
+arrancar, el servicio lista los pedidos que quedaron sin terminar; sólo
+los reimprime con --reanudar, porque las etiquetas pendientes pueden ya
+no hacer falta (la orden se canceló o se imprimió desde otro puesto).
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metricas
+from cache_catalogo import CacheCatalogo, cargar_catalogo
+from cola_impresion import ColaImpresion
+from diario_impresion import DiarioImpresion, leer_rangos, reanudar, texto_rangos
+from impresoras import TIPO_PRODUCTO, PlanificadorImpresion, RegistroImpresoras
+from imprimir_ordenes import mostrar_estado
+from ordenes_trabajo import validar_cantidad
+
+PUERTO = 8100
+PEDIDOS_GUARDADOS = 10000  # Pedidos más recientes cuyo estado se puede consultar
+TAMANO_MAXIMO = 1024 * 1024  # Bytes máximos del cuerpo de un POST
+ARCHIVO_DIARIO = os.path.join(os.path.expanduser('~'), '.sistema-etiquetas', 'diario_servicio.log')
+
+
+def estado_pedido(etiquetas, enviadas, fallidas):
+    """Estado de un pedido a partir de sus etiquetas enviadas y fallidas"""
+    if enviadas == etiquetas:
+        return 'completado'
+    if enviadas + fallidas == etiquetas:
+        return 'error'
+    return 'enviando' if enviadas else 'pendiente'
+
+
+def _impresora(texto):
+    # host:puerto de --impresora
+    host, _, puerto = texto.rpartition(':')
+    if not host:
+        return {'nombre': texto, 'host': texto}
+    return {'nombre': texto, 'host': host, 'puerto': int(puerto)}
+
+
+class ServicioImpresion:
+    """Valida los pedidos de la API, los imprime y recuerda su estado"""
+
+    def __init__(self, catalogo, planificador):
+        self.catalogo = catalogo
+        self.planificador = planificador
+        self._pedidos = OrderedDict()
+        self._numero = 0
+        self._bloqueo = threading.Lock()
+
+    def validar(self, datos):
+        """Devuelve (orden, producto) o lanza ValueError con el motivo"""
+        if not isinstance(datos, dict):
+            raise ValueError("cada pedido debe ser un objeto JSON")
+        id_producto = str(datos.get('id_producto') or '').strip()
+        if not id_producto:
+            raise ValueError("falta id_producto")
+        cantidad = validar_cantidad(datos.get('cantidad'))
+        indice = self.catalogo.buscar_id(id_producto)
+        if indice is None:
+            raise ValueError(f"producto '{id_producto}' no encontrado en el catálogo")
+        orden = {
+            'op': str(datos.get('op') or ''),
+            'sgc': str(datos.get('sgc') or ''),
+            'cantidad': cantidad,
+            'tipo': str(datos.get('tipo') or TIPO_PRODUCTO),
+            'rangos': None,
+        }
+        if datos.get('etiquetas') is not None:
+            orden['rangos'] = leer_rangos(str(datos['etiquetas']), cantidad)
+        # Lanza ValueError si ninguna impresora admite el tipo
+        self.planificador.registro.para_tipo(orden['tipo'])
+        return orden, self.catalogo.fila(indice)
+
+    def imprimir(self, pedidos):
+        """Valida todos los pedidos y, si son válidos, los envía a imprimir.
+
+        Devuelve (respuestas, errores): una respuesta por pedido enviado y
+        un mensaje por cada pedido que no se pudo enviar. Si alguno no es
+        válido no se envía ninguno y respuestas es None.
+        """
+        if not pedidos:
+            return None, ["no se recibió ningún pedido"]
+        validados = []
+        errores = []
+        for n, datos in enumerate(pedidos, start=1):
+            try:
+                validados.append(self.validar(datos))
+            except ValueError as e:
+                errores.append(f"Pedido {n}: {str(e)}")
+        if errores:
+            return None, errores
+
+        respuestas = []
+        for n, (orden, producto) in enumerate(validados, start=1):
+            # Un pedido que falla (diario sin espacio, impresora quitada) no
+            # impide enviar los demás; se informa cuál fue
+            try:
+                trabajos = self.planificador.imprimir(
+                    producto['nombre'], producto['id_producto'], orden['op'], orden['sgc'], orden['cantidad'],
+                    orden['tipo'], rangos=orden['rangos'],
+                )
+            except (OSError, ValueError) as e:
+                errores.append(f"Pedido {n}: no se pudo enviar: {str(e)}")
+                continue
+            with self._bloqueo:
+                self._numero += 1
+                numero = self._numero
+                self._pedidos[numero] = trabajos[0].solicitud
+                while len(self._pedidos) > PEDIDOS_GUARDADOS:
+                    self._pedidos.popitem(last=False)
+            respuestas.append(self.respuesta(numero, trabajos[0].solicitud))
+        return respuestas, errores
+
+    def respuesta(self, numero, solicitud):
+        enviadas, fallidas = self.planificador.avance(solicitud)
+        return {
+            'numero': numero,
+            'id_producto': solicitud['id_producto'],
+            'op': solicitud['op'],
+            'sgc': solicitud['sgc'],
+            'cantidad': solicitud['cantidad'],
+            'etiquetas': solicitud['etiquetas'],
+            'enviadas': enviadas,
+            'fallidas': fallidas,
+            'estado': estado_pedido(solicitud['etiquetas'], enviadas, fallidas),
+            'diario': solicitud['pedido'],
+        }
+
+    def pedido(self, numero):
+        """Respuesta con el estado del pedido, o None si no existe"""
+        with self._bloqueo:
+            solicitud = self._pedidos.get(numero)
+        return None if solicitud is None else self.respuesta(numero, solicitud)
+
+    def estado(self):
+        with self._bloqueo:
+            solicitudes = list(self._pedidos.values())
+        pedidos = Counter(
+            estado_pedido(solicitud['etiquetas'], *self.planificador.avance(solicitud)) for solicitud in solicitudes
+        )
+        return {
+            'productos': len(self.catalogo),
+            'impresoras': [
+                {'nombre': impresora.nombre, 'host': impresora.host, 'puerto': impresora.puerto,
+                 'disponible': impresora.disponible()}
+                for impresora in self.planificador.registro.impresoras
+            ],
+            'pedidos': dict(pedidos),
+        }
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    # Atiende un pedido HTTP; self.server.servicio es el ServicioImpresion
+    protocol_version = 'HTTP/1.1'
+
+    def _responder(self, codigo, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        servicio = self.server.servicio
+        ruta = self.path.rstrip('/')
+        if ruta == '/estado':
+            self._responder(200, servicio.estado())
+            return
+        if ruta == '/metricas':
+            self._responder(200, metricas.METRICAS.resumen())
+            return
+        if ruta.startswith('/trabajos/') and ruta[len('/trabajos/'):].isdigit():
+            respuesta = servicio.pedido(int(ruta[len('/trabajos/'):]))
+            if respuesta is not None:
+                self._responder(200, respuesta)
+                return
+        self._responder(404, {'error': 'no encontrado'})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/trabajos':
+            self._responder(404, {'error': 'no encontrado'})
+            return
+        if self.headers.get('Content-Length') is None:
+            self.close_connection = True
+            self._responder(411, {'error': 'falta Content-Length'})
+            return
+        try:
+            largo = int(self.headers['Content-Length'])
+        except ValueError:
+            largo = -1
+        if largo < 0:
+            # Sin un largo válido no se sabe dónde termina el cuerpo
+            self.close_connection = True
+            self._responder(400, {'error': 'Content-Length no válido'})
+            return
+        if largo > TAMANO_MAXIMO:
+            self.close_connection = True
+            self._responder(413, {'error': f'el cuerpo supera los {TAMANO_MAXIMO} bytes'})
+            return
+        try:
+            datos = json.loads(self.rfile.read(largo) or b'null')
+        except ValueError as e:
+            self._responder(400, {'error': f'JSON no válido: {str(e)}'})
+            return
+        pedidos = datos if isinstance(datos, list) else [datos]
+        respuestas, errores = self.server.servicio.imprimir(pedidos)
+        if respuestas is None:
+            self._responder(400, {'errores': errores})
+        elif errores:
+            self._responder(500, {'trabajos': respuestas, 'errores': errores})
+        else:
+            self._responder(202, {'trabajos': respuestas})
+
+    def log_message(self, formato, *args):
+        # Sólo se informan los errores, no cada pedido atendido
+        pass
+
+    def log_error(self, formato, *args):
+        print(f"API {self.address_string()}: {formato % args}")
+
+
+def _terminar(senal, marco):
+    # SIGTERM (por ejemplo, al detener el servicio) termina igual que Ctrl+C
+    raise KeyboardInterrupt
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Servicio de impresión de etiquetas con una API HTTP local.')
+    parser.add_argument('--catalogo', required=True, help='CSV de productos, Excel exportado de Odoo o archivo .cat')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Dirección en la que escucha la API (0.0.0.0 para aceptar otras estaciones)')
+    parser.add_argument('--puerto', type=int, default=PUERTO, help=f'Puerto de la API (por omisión, {PUERTO})')
+    parser.add_argument('--impresora', action='append', metavar='HOST:PUERTO',
+                        help='Impresora a usar en lugar de las de impresoras_config.py (se puede repetir)')
+    parser.add_argument('--sin-cache', action='store_true', help='No usa la caché de catálogos')
+    parser.add_argument('--metricas', help='Guarda al terminar las métricas de tiempos y contadores en este JSON')
+    parser.add_argument('--diario', default=ARCHIVO_DIARIO,
+                        help=f'Diario de los pedidos, para reanudarlos (por omisión, {ARCHIVO_DIARIO})')
+    parser.add_argument('--reanudar', action='store_true',
+                        help='Imprime al arrancar lo que falta de los pedidos interrumpidos (si no, sólo los lista)')
+    args = parser.parse_args(argumentos)
+
+    try:
+        catalogo = cargar_catalogo(args.catalogo, None if args.sin_cache else CacheCatalogo())
+    except (OSError, ValueError) as e:
+        print(f"Error al leer el catálogo: {str(e)}")
+        return 1
+    print(f"Catálogo leído con {len(catalogo)} registros.")
+
+    cola = ColaImpresion(al_cambiar_estado=mostrar_estado)
+    config = None if not args.impresora else [_impresora(impresora) for impresora in args.impresora]
+    try:
+        servidor = ThreadingHTTPServer((args.host, args.puerto), ManejadorAPI)
+    except OSError as e:
+        print(f"No se pudo abrir la API en {args.host}:{args.puerto}: {str(e)}")
+        return 1
+    try:
+        diario = DiarioImpresion(args.diario)
+    except OSError as e:
+        servidor.server_close()
+        print(f"No se pudo abrir el diario: {str(e)}")
+        return 1
+    planificador = PlanificadorImpresion(cola, RegistroImpresoras.desde_config(config), diario=diario)
+    interrumpidos = diario.interrumpidos()
+    for numero, datos, faltantes in interrumpidos:
+        descripcion = (f"pedido {numero} ({datos['id_producto']} OP {datos['op']}): "
+                       f"etiquetas {texto_rangos(faltantes) or 'ninguna'}")
+        if not args.reanudar:
+            print(f"Interrumpido el {descripcion}")
+            continue
+        try:
+            reanudar(diario, planificador, numero)
+        except ValueError as e:
+            print(f"No se pudo reanudar el pedido {numero}: {str(e)}")
+            continue
+        print(f"Se reanuda el {descripcion}")
+    if interrumpidos and not args.reanudar:
+        print("Para imprimir lo que les falta, reinicie el servicio con --reanudar.")
+    servidor.daemon_threads = True
+    servidor.servicio = ServicioImpresion(catalogo, planificador)
+    signal.signal(signal.SIGTERM, _terminar)
+    print(f"API de impresión en http://{args.host}:{servidor.server_address[1]} (Ctrl+C para terminar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("Terminando: se esperan los trabajos pendientes...")
+    finally:
+        servidor.server_close()
+        planificador.esperar()
+        cola.detener()
+        diario.cerrar()
+        if args.metricas:
+            metricas.METRICAS.exportar(args.metricas)
+            print(f"Métricas guardadas en {args.metricas}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
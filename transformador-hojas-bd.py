@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
+import csv
 import sys
-import pandas as pd
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
 from PyQt6.QtWidgets import (
     QApplication,
     QWidget,
@@ -12,7 +13,111 @@ from PyQt6.QtWidgets import (
     QProgressBar
 )
 
+from archivos import escribir_atomico
+
+# Columnas del Excel descargado de Odoo (Inventario -> Productos -> Productos):
+# la A tiene la referencia interna y la C el nombre
+COLUMNA_ID = 0
+COLUMNA_NOMBRE = 2
+COLUMNAS_CSV = ['id_producto', 'code_128', 'nombre']
+FILAS_POR_AVISO = 2000  # Filas leídas entre avisos de progreso
+
+
+def _texto(fila, columna):
+    valor = fila[columna] if columna < len(fila) else None
+    if valor is None:
+        return ''
+    # Excel puede guardar los códigos numéricos como float (123.0)
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def filas_excel(ruta, progreso=None, hoja=None):
+    """Recorre los productos de un Excel exportado de Odoo.
+
+    La hoja se lee en modo de sólo lectura, fila por fila, sin cargarla
+    completa. Cada producto es un diccionario con id_producto, code_128
+    (igual al ID) y nombre; la primera fila es el encabezado y las filas
+    vacías se omiten. progreso(filas, porcentaje) se llama cada
+    FILAS_POR_AVISO filas leídas; el porcentaje es -1 si el archivo no
+    declara cuántas filas tiene. hoja es el nombre de la hoja a leer; por
+    omisión, la hoja activa.
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = libro.active if hoja is None else libro[hoja]
+        total = hoja.max_row  # None si el archivo no declara sus dimensiones
+        for leidas, fila in enumerate(hoja.iter_rows(min_row=2, values_only=True), start=1):
+            id_producto = _texto(fila, COLUMNA_ID)
+            nombre = _texto(fila, COLUMNA_NOMBRE)
+            if id_producto or nombre:
+                yield {'id_producto': id_producto, 'code_128': id_producto, 'nombre': nombre}
+            if progreso is not None and not leidas % FILAS_POR_AVISO:
+                progreso(leidas, min(99, leidas * 100 // total) if total else -1)
+    finally:
+        libro.close()
+
+
+class _Cancelado(Exception):
+    # Interrumpe la escritura del CSV sin reemplazar destino
+    pass
+
+
+def transformar(origen, destino, progreso=None, cancelado=None):
+    """Escribe el CSV id_producto,code_128,nombre a partir de un Excel de Odoo.
+
+    Cada fila se escribe apenas se lee (ver filas_excel), así que la memoria
+    usada no depende del tamaño de la hoja. El CSV se escribe en un archivo
+    temporal que reemplaza a destino al terminar. Devuelve la cantidad de
+    productos escritos, o None si cancelado() devolvió True; en ese caso
+    destino no se modifica.
+    """
+    def escribir(archivo):
+        escritor = csv.DictWriter(archivo, COLUMNAS_CSV)
+        escritor.writeheader()
+        escritas = 0
+        for escritas, fila in enumerate(filas_excel(origen, progreso), start=1):
+            escritor.writerow(fila)
+            if cancelado is not None and not escritas % FILAS_POR_AVISO and cancelado():
+                raise _Cancelado
+        return escritas
+
+    try:
+        return escribir_atomico(destino, escribir, 'w', encoding='utf-8', newline='')
+    except _Cancelado:
+        return None
+
+
+class TransformadorExcel(QObject):
+    """Ejecuta transformar() desde un QThread avisando el progreso"""
+
+    progreso = pyqtSignal(int, int)    # filas leídas, porcentaje de la hoja (-1 si no se sabe)
+    terminado = pyqtSignal(int, bool)  # productos escritos, si se canceló
+    error = pyqtSignal(str)
+
+    def __init__(self, origen, destino):
+        super().__init__()
+        self.origen = origen
+        self.destino = destino
+        self._cancelado = False
+
+    def cancelar(self):
+        self._cancelado = True
+
+    def ejecutar(self):
+        try:
+            escritas = transformar(self.origen, self.destino, self.progreso.emit, lambda: self._cancelado)
+            self.terminado.emit(escritas or 0, escritas is None)
+        except Exception as e:
+            self.error.emit(f'Error al transformar el archivo: {str(e)}')
+
+
 class TransformadorWindow(QWidget):
+    csv_saved = pyqtSignal(str)  # Ruta de cada CSV guardado
+
     def __init__(self):
         super().__init__()
         self.initUI()
@@ -25,12 +130,12 @@ class TransformadorWindow(QWidget):
         # Crear layouts
         main_layout = QVBoxLayout()
         file_layout = QHBoxLayout()
-        
+
         # Botones para archivo Excel
         self.excel_label = QLabel('Archivo Excel: No seleccionado')
         self.excel_button = QPushButton('Seleccionar Excel')
         self.excel_button.clicked.connect(self.select_excel)
-        
+
         file_layout.addWidget(self.excel_label)
         file_layout.addWidget(self.excel_button)
 
@@ -44,6 +149,11 @@ class TransformadorWindow(QWidget):
         self.progress.setMaximum(100)
         self.progress.hide()
 
+        # Cancela la transformación en curso
+        self.cancel_button = QPushButton('Cancelar')
+        self.cancel_button.clicked.connect(self.cancel_transform)
+        self.cancel_button.hide()
+
         # Status label
         self.status_label = QLabel('')
 
@@ -51,43 +161,34 @@ class TransformadorWindow(QWidget):
         main_layout.addLayout(file_layout)
         main_layout.addWidget(self.save_button)
         main_layout.addWidget(self.progress)
+        main_layout.addWidget(self.cancel_button)
         main_layout.addWidget(self.status_label)
 
         self.setLayout(main_layout)
-        
+
         # Variables para almacenar datos
         self.excel_path = None
-        self.df = None
+        self.save_path = None
+        self.transform_thread = None
+        self.transformer = None
 
     def select_excel(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "Seleccionar archivo Excel",
             "",
-            "Archivos Excel (*.xlsx *.xls);;Todos los archivos (*)"
+            "Archivos Excel (*.xlsx *.xlsm);;Todos los archivos (*)"
         )
 
         if file_path:
-            try:
-                self.excel_path = file_path
-                self.excel_label.setText(f'Archivo Excel: {file_path}')
-                
-                # Leer el archivo Excel
-                self.progress.show()
-                self.progress.setValue(20)
-                self.df = pd.read_excel(file_path, usecols=[0, 2])  # Leer solo columnas A y C
-                self.progress.setValue(100)
-                
-                # Habilitar botón de guardar
-                self.save_button.setEnabled(True)
-                self.status_label.setText('Excel cargado correctamente')
-                
-            except Exception as e:
-                self.status_label.setText(f'Error al leer el archivo: {str(e)}')
-                self.progress.hide()
-            
+            # La hoja se lee recién al guardar, mientras se escribe el CSV
+            self.excel_path = file_path
+            self.excel_label.setText(f'Archivo Excel: {file_path}')
+            self.save_button.setEnabled(self.transform_thread is None)
+            self.status_label.setText('Excel seleccionado')
+
     def save_csv(self):
-        if self.df is not None:
+        if self.excel_path is not None:
             save_path, _ = QFileDialog.getSaveFileName(
                 self,
                 "Guardar archivo CSV",
@@ -96,29 +197,67 @@ class TransformadorWindow(QWidget):
             )
 
             if save_path:
-                try:
-                    self.progress.show()
-                    self.progress.setValue(20)
-                    
-                    # Crear el nuevo DataFrame con el formato requerido
-                    col_names = self.df.columns.tolist()
-                    new_df = pd.DataFrame()
-                    new_df['id_producto'] = self.df[col_names[0]]  # Primera columna del Excel
-                    new_df['code_128'] = self.df[col_names[0]]  # Repetir primera columna
-                    new_df['nombre'] = self.df[col_names[1]]  # Tercera columna del Excel
-                    
-                    self.progress.setValue(60)
-                    
-                    # Guardar como CSV
-                    new_df.to_csv(save_path, index=False, encoding='utf-8')
-                    
-                    self.progress.setValue(100)
-                    self.status_label.setText('Archivo CSV guardado correctamente')
-                    
-                except Exception as e:
-                    self.status_label.setText(f'Error al guardar el archivo: {str(e)}')
-                finally:
-                    self.progress.hide()
+                # La transformación corre en un hilo aparte
+                self.transform_thread = QThread(self)
+                self.save_path = save_path
+                self.transformer = TransformadorExcel(self.excel_path, save_path)
+                self.transformer.moveToThread(self.transform_thread)
+                self.transform_thread.started.connect(self.transformer.ejecutar)
+                self.transformer.progreso.connect(self.on_transform_progress)
+                self.transformer.terminado.connect(self.on_transform_finished)
+                self.transformer.error.connect(self.on_transform_error)
+                self.transformer.terminado.connect(self.transform_thread.quit)
+                self.transformer.error.connect(self.transform_thread.quit)
+                self.transform_thread.finished.connect(self.transformer.deleteLater)
+                self.transform_thread.finished.connect(self.transform_thread.deleteLater)
+
+                self.progress.setRange(0, 100)
+                self.progress.setValue(0)
+                self.progress.show()
+                self.cancel_button.show()
+                self.save_button.setEnabled(False)
+                self.excel_button.setEnabled(False)
+                self.status_label.setText('Transformando archivo...')
+                self.transform_thread.start()
+
+    def cancel_transform(self):
+        if self.transformer is not None:
+            self.transformer.cancelar()
+
+    def on_transform_progress(self, filas, porcentaje):
+        # Sin total conocido la barra sólo indica actividad
+        if porcentaje < 0:
+            self.progress.setRange(0, 0)
+        else:
+            self.progress.setRange(0, 100)
+            self.progress.setValue(porcentaje)
+        self.status_label.setText(f'Transformando archivo... {filas} filas leídas')
+
+    def end_transform(self, mensaje):
+        self.transform_thread = None
+        self.transformer = None
+        self.progress.hide()
+        self.cancel_button.hide()
+        self.save_button.setEnabled(True)
+        self.excel_button.setEnabled(True)
+        self.status_label.setText(mensaje)
+
+    def on_transform_finished(self, filas, cancelado):
+        if cancelado:
+            self.end_transform('Transformación cancelada, no se guardó el archivo')
+        else:
+            self.end_transform(f'Archivo CSV guardado correctamente ({filas} productos)')
+            self.csv_saved.emit(self.save_path)
+
+    def on_transform_error(self, mensaje):
+        self.end_transform(mensaje)
+
+    def closeEvent(self, event):
+        # Espera a que el hilo termine antes de cerrar
+        if self.transform_thread is not None:
+            self.transformer.cancelar()
+            self.transform_thread.wait()
+        super().closeEvent(event)
 
 # Solo ejecutar si se llama directamente
 if __name__ == '__main__':
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Generación de etiquetas ZPL.
+
+Las etiquetas se arman con las plantillas de plantillas_config.py. Cada
+plantilla se compila una sola vez a fragmentos de bytes, y los datos de
+cada producto se codifican y ubican en esos fragmentos una sola vez
+(preparar() guarda los PRODUCTOS_EN_CACHE más recientes): generar N
+etiquetas es sólo concatenar bytes con la numeración de cada una.
+"""
+import logging
+import time
+import zlib
+from collections import namedtuple
+from functools import lru_cache
+
+import metricas
+from plantillas_config import PLANTILLAS
+
+log = logging.getLogger(__name__)
+
+FORMATO_LOTE = 'R:%08X.ZPL'  # Formato guardado en la RAM de la impresora, según su contenido
+ETIQUETAS_POR_BLOQUE = 100  # Etiquetas por bloque de bytes en el modo por lote
+PLANTILLA = 'producto'  # Plantilla por omisión
+PRODUCTOS_EN_CACHE = 256  # Productos preparados que se conservan
+
+DATOS = ('nombre', 'id_producto', 'op', 'sgc', 'numero')
+CODIGOS_BARRAS = {'code128': 'BC'}
+
+_FIN_ETIQUETA = b"^PQ1,1,1,Y^XZ\n"
+
+# Etiqueta preparada de un producto: cabeza + b"numero/cantidad" + cola es
+# una etiqueta completa; formato es el bloque ^DF del modo por lote y
+# bloque el comienzo de cada etiqueta que lo invoca (^XF)
+Preparada = namedtuple('Preparada', 'cabeza cola formato bloque')
+
+
+def texto_impresora(texto):
+    """Convierte caracteres especiales a Latin-1 para la impresora"""
+    return texto.encode('latin1', errors='replace').decode('latin1')
+
+
+def _si_no(valor):
+    return 'Y' if valor else 'N'
+
+
+def _comando(campo):
+    # ^FO con la posición, seguido de la fuente o el código de barras
+    comando = f"^FO{campo['x']},{campo['y']}"
+    if 'codigo_barras' in campo:
+        tipo = CODIGOS_BARRAS.get(campo['codigo_barras'])
+        if tipo is None:
+            raise ValueError(f"Código de barras desconocido: {campo['codigo_barras']}")
+        return (f"{comando}^{tipo}{campo.get('rotacion', 'N')},{campo['alto']},"
+                f"{_si_no(campo.get('texto_abajo', True))},N,{_si_no(campo.get('digito_control', False))}")
+    return f"{comando}^A{campo.get('fuente', '0')}{campo.get('rotacion', 'N')},{campo['alto']},{campo['ancho']}"
+
+
+class Plantilla:
+    """Plantilla de plantillas_config.py compilada a fragmentos de bytes"""
+
+    def __init__(self, nombre, campos):
+        self.nombre = nombre
+        self._campos = []
+        for campo in campos:
+            if campo.get('dato') not in DATOS:
+                raise ValueError(f"Plantilla '{nombre}': dato desconocido {campo.get('dato')!r}")
+            self._campos.append((campo['dato'], _comando(campo).encode('latin1')))
+        if [dato for dato, _ in self._campos].count('numero') != 1:
+            raise ValueError(f"Plantilla '{nombre}': debe tener un solo campo 'numero'")
+
+    def preparar(self, valores):
+        """Arma la Preparada de un producto; valores tiene los datos ya en bytes"""
+        partes = [b"^XA\n"]
+        formato = []
+        for dato, comando in self._campos:
+            if dato == 'numero':
+                partes.append(comando + b"^FD")
+                cabeza = b''.join(partes)
+                partes = [b"^FS\n"]
+                formato.append(comando + b"^FN1^FS\n")
+            else:
+                campo = comando + b"^FD" + valores[dato] + b"^FS\n"
+                partes.append(campo)
+                formato.append(campo)
+        partes.append(_FIN_ETIQUETA)
+        formato.append(b"^XZ\n")
+        # El nombre sale de los campos fijos: dos productos (u órdenes) no
+        # comparten formato aunque varios equipos impriman a la vez
+        formato = b''.join(formato)
+        nombre = (FORMATO_LOTE % zlib.crc32(formato)).encode('latin1')
+        return Preparada(cabeza, b''.join(partes), b"^XA\n^DF" + nombre + b"^FS\n" + formato,
+                         b"^XA^XF" + nombre + b"^FS^FN1^FD")
+
+
+@lru_cache(maxsize=None)
+def plantilla(nombre=PLANTILLA):
+    """Devuelve la plantilla compilada con ese nombre"""
+    campos = PLANTILLAS.get(nombre)
+    if campos is None:
+        raise ValueError(f"No hay una plantilla de etiqueta llamada '{nombre}'")
+    return Plantilla(nombre, campos)
+
+
+@lru_cache(maxsize=PRODUCTOS_EN_CACHE)
+def preparar(nombre, id_producto, op, sgc, nombre_plantilla=PLANTILLA):
+    """Devuelve la Preparada de un producto, codificada en Latin-1"""
+    valores = {
+        'nombre': nombre.encode('latin1', errors='replace'),
+        'id_producto': id_producto.encode('latin1', errors='replace'),
+        'op': op.encode('latin1', errors='replace'),
+        'sgc': sgc.encode('latin1', errors='replace'),
+    }
+    return plantilla(nombre_plantilla).preparar(valores)
+
+
+def etiqueta(nombre, id_producto, op, sgc, numero, cantidad, nombre_plantilla=PLANTILLA):
+    """Devuelve el ZPL completo de la etiqueta numero/cantidad"""
+    cabeza, cola = preparar(nombre, id_producto, op, sgc, nombre_plantilla)[:2]
+    return (cabeza + b"%d/%d" % (numero, cantidad) + cola).decode('latin1')
+
+
+def bloques_lote(desde, hasta, por_bloque=ETIQUETAS_POR_BLOQUE):
+    """Rangos (inicio, fin) de numeración de cada bloque que arma lote()"""
+    return [(inicio, min(inicio + por_bloque - 1, hasta)) for inicio in range(desde, hasta + 1, por_bloque)]
+
+
+def etiquetas(nombre, id_producto, op, sgc, cantidad, desde=1, hasta=None, nombre_plantilla=PLANTILLA):
+    """Genera una etiqueta completa por bloque (modo individual).
+
+    desde y hasta limitan la numeración a un tramo del total, por ejemplo
+    cuando el trabajo se reparte entre varias impresoras.
+    """
+    inicio = time.perf_counter()
+    cabeza, cola = preparar(nombre, id_producto, op, sgc, nombre_plantilla)[:2]
+    cola = b"/%d" % cantidad + cola
+    partes = [b"%s%d%s" % (cabeza, i, cola) for i in range(desde, (cantidad if hasta is None else hasta) + 1)]
+    metricas.registrar('zpl.generar', time.perf_counter() - inicio)
+    metricas.contar('zpl.etiquetas', len(partes))
+    if log.isEnabledFor(logging.DEBUG):
+        for i, parte in enumerate(partes, start=desde):
+            log.debug("--- Etiqueta %d/%d ---\n%s", i, cantidad, parte.decode('latin1'))
+    return partes
+
+
+def lote(nombre, id_producto, op, sgc, cantidad, desde=1, hasta=None, por_bloque=ETIQUETAS_POR_BLOQUE,
+         nombre_plantilla=PLANTILLA):
+    """Genera las etiquetas usando un formato guardado en la impresora.
+
+    El primer bloque define el formato (^DF) con los campos fijos del
+    producto; cada etiqueta sólo lo invoca (^XF) con la numeración
+    numero/cantidad. Las etiquetas desde..hasta se agrupan en bloques de
+    ``por_bloque`` (ver bloques_lote) para enviarlas con pocas llamadas.
+    El nombre del formato depende de los campos fijos, así que lotes de
+    productos distintos no se pisan el formato en la impresora.
+    """
+    inicio = time.perf_counter()
+    preparada = preparar(nombre, id_producto, op, sgc, nombre_plantilla)
+    definicion = preparada.formato
+    depurar = log.isEnabledFor(logging.DEBUG)
+    if depurar:
+        log.debug("--- Formato de lote ---\n%s", definicion.decode('latin1'))
+
+    # Entre dos números van el final de una etiqueta y el comienzo de la siguiente
+    fin = b"/%d^FS" % cantidad + _FIN_ETIQUETA
+    separador = fin + preparada.bloque
+    partes = [definicion]
+    for primera, ultima in bloques_lote(desde, cantidad if hasta is None else hasta, por_bloque):
+        bloque = preparada.bloque + separador.join(b"%d" % i for i in range(primera, ultima + 1)) + fin
+        if depurar:
+            log.debug("--- Etiquetas %d a %d/%d ---\n%s", primera, ultima, cantidad, bloque.decode('latin1'))
+        partes.append(bloque)
+    metricas.registrar('zpl.generar', time.perf_counter() - inicio)
+    metricas.contar('zpl.etiquetas', (cantidad if hasta is None else hasta) - desde + 1)
+    return partes